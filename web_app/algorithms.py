@@ -0,0 +1,183 @@
+"""
+Tuning algorithms
+Registry of the tuning-curve algorithms, after modules/core/calculation/algorithmfactory.h
+"""
+
+import importlib
+import math
+import threading
+
+ALGORITHMS = {}  # algorithm id -> Algorithm, in the order of registration
+DEFAULT_ALGORITHM = 'equal_temperament'  # When a request names no algorithm
+RECOMMENDED_ALGORITHM = 'inharmonicity'  # Preselected in the web interface
+
+
+class AlgorithmParameter:
+    """
+    Numeric parameter of an algorithm (AlgorithmParameterDescription).
+    """
+
+    def __init__(self, parameter_id, label, default, minimum=None, maximum=None, description=''):
+        self.id = parameter_id
+        self.label = label
+        self.default = default
+        self.minimum = minimum
+        self.maximum = maximum
+        self.description = description
+
+    def validate(self, value):
+        """
+        Convert a value to the type of the default and check its range.
+
+        Raises:
+            ValueError: If the value is not a finite number, not a whole
+                number for an integer parameter, or out of range
+        """
+        try:
+            if isinstance(value, bool):
+                raise TypeError(value)
+            number = float(value)
+        except (TypeError, ValueError):
+            raise ValueError(f'Parameter {self.id} must be a number')
+        if not math.isfinite(number):
+            raise ValueError(f'Parameter {self.id} must be a finite number')
+        if isinstance(self.default, int):
+            if not number.is_integer():
+                raise ValueError(f'Parameter {self.id} must be a whole number')
+            value = int(number)
+        else:
+            value = number
+        if (self.minimum is not None and value < self.minimum) or \
+                (self.maximum is not None and value > self.maximum):
+            raise ValueError(f'Parameter {self.id} must be between {self.minimum} and {self.maximum}')
+        return value
+
+    def information(self):
+        return {'id': self.id, 'label': self.label, 'default': self.default,
+                'minimum': self.minimum, 'maximum': self.maximum, 'description': self.description}
+
+
+class Algorithm:
+    """
+    Description of a tuning algorithm (AlgorithmFactoryDescription, AlgorithmInformation).
+
+    The engine is named by 'module:function' and imported on the first run,
+    so that its dependencies are not loaded at server start. The function
+    is called as function(tuner, progress, **parameters), where progress is
+    a ProgressReporter, and computes the tuning curve into tuner.piano_data.
+    """
+
+    def __init__(self, algorithm_id, name, description, target, parameters=(), author=None, year=None):
+        self.id = algorithm_id
+        self.name = name
+        self.description = description
+        self.target = target
+        self.parameters = list(parameters)
+        self.author = author
+        self.year = year
+        self._function = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        return self._function is not None
+
+    def load(self):
+        """Import the engine unless it has been imported already"""
+        with self._lock:
+            if self._function is None:
+                module_name, function_name = self.target.split(':')
+                self._function = getattr(importlib.import_module(module_name), function_name)
+            return self._function
+
+    def parameter_values(self, values=None):
+        """
+        Defaults of all parameters, overridden by the validated given values.
+
+        Raises:
+            ValueError: For unknown parameters or invalid values
+        """
+        values = dict(values or {})
+        unknown = set(values) - {parameter.id for parameter in self.parameters}
+        if unknown:
+            raise ValueError(f'Unknown parameter: {", ".join(sorted(unknown))}')
+        return {parameter.id: parameter.validate(values[parameter.id]) if parameter.id in values
+                else parameter.default for parameter in self.parameters}
+
+    def run(self, tuner, progress, parameters=None):
+        """Compute the tuning curve with the given parameter values"""
+        return self.load()(tuner, progress, **self.parameter_values(parameters))
+
+    def information(self):
+        return {'id': self.id, 'name': self.name, 'description': self.description,
+                'author': self.author, 'year': self.year,
+                'parameters': [parameter.information() for parameter in self.parameters]}
+
+
+def register_algorithm(algorithm):
+    """Make an algorithm available to /api/calculate_tuning and /api/algorithms"""
+    ALGORITHMS[algorithm.id] = algorithm
+    return algorithm
+
+
+def get_algorithm(algorithm_id):
+    """
+    The registered algorithm with the given id.
+
+    Raises:
+        ValueError: If no such algorithm is registered
+    """
+    if algorithm_id not in ALGORITHMS:
+        raise ValueError(f'Unknown algorithm: {algorithm_id}')
+    return ALGORITHMS[algorithm_id]
+
+
+def algorithm_information():
+    """Descriptions of all registered algorithms"""
+    return [algorithm.information() for algorithm in ALGORITHMS.values()]
+
+
+register_algorithm(Algorithm(
+    'entropy_minimization', 'Entropie Minimalisatie (EPT)',
+    'Minimaliseert de entropie van het gecombineerde spectrum van alle toetsen, zodat hun partialen samenvallen.',
+    'tuningcurves:entropy_minimization',
+    [AlgorithmParameter('max_iterations', 'Iteraties', 50, 1, 1000,
+                        'Maximaal aantal generaties van de differential evolution')],
+    author='Haye Hinrichsen', year=2015))
+
+register_algorithm(Algorithm(
+    'inharmonicity', 'Inharmonicity Tuning (Aanbevolen)',
+    'Rekt de stemming op naar de gemeten inharmoniciteit van de snaren.',
+    'tuningcurves:inharmonicity_tuning',
+    [AlgorithmParameter('scale', 'Schaalfactor', 5000.0, 0.0, 50000.0,
+                        'Cents per octaaf per eenheid inharmoniciteit')]))
+
+register_algorithm(Algorithm(
+    'equal_temperament', 'Equal Temperament',
+    'Gelijkzwevende stemming zonder oprekking.',
+    'tuningcurves:equal_temperament'))
+
+register_algorithm(Algorithm(
+    'copy_recording', 'Kopieer Opname',
+    'Neemt de opgenomen frequenties over, om de bestaande stemming te reproduceren.',
+    'tuningcurves:copy_recording',
+    author='Christoph Wick', year=2015))
+
+register_algorithm(Algorithm(
+    'stretch_tuning', 'Stretch Tuning',
+    'Eenvoudige lineaire oprekking vanaf A4.',
+    'tuningcurves:stretch_tuning',
+    [AlgorithmParameter('stretch', 'Oprekking', 0.0001, 0.0, 0.01,
+                        'Relatieve frequentieverhoging per toets afstand tot A4')]))
+
+register_algorithm(Algorithm(
+    'pitch_raise', 'Pitch Raise (Benaderde Stemkromme)',
+    'Benaderde stemkromme voor een piano die ver onder de toonhoogte staat.',
+    'tuningcurves:pitch_raise',
+    author='Haye Hinrichsen', year=2015))
+
+register_algorithm(Algorithm(
+    'overpull', 'Overpull (Toonhoogte Verhogen)',
+    'Stemt hoger dan het doel om de daling door het ophalen van de andere toetsen te compenseren.',
+    'tuningcurves:overpull_tuning',
+    author='Haye Hinrichsen', year=2016))
@@ -7,21 +7,59 @@ from flask import Flask, render_template, request, jsonify, session
 from flask_socketio import SocketIO, emit
 import numpy as np
 import sounddevice as sd
-from scipy import signal
-from scipy.fft import rfft, rfftfreq
-from scipy.optimize import minimize, differential_evolution
-from scipy.ndimage import gaussian_filter1d
+from scipy.fft import rfft
 import json
 import os
 from datetime import datetime
 import threading
 import queue
+import time
 import webbrowser
+from collections import Counter
+
+from keyrecognizer import KeyRecognizer
+from stroboscope import Stroboscope
+from spectrum import refine_peaks, decimate_for_key, hann_window
+from inharmonicity import (fit_inharmonicity, extrapolate_inharmonicity, synthetic_partial_ratios,
+                           expected_inharmonicity)
+from onset import detect_onset, sustain_window, min_sustain_duration
+from logspectrum import SpectrumAverage, log_binned_spectrum, extract_peaks, noise_floor, frequency_to_index
+from auditory import preprocess_spectrum
+from quality import spectral_snr, recording_quality
+from audioinput import AudioInput
+from synthesizer import Synthesizer, partial_amplitudes, piano_envelope
+from overpull import DEFAULT_KEYS_ON_BASS_BRIDGE, interaction_matrix, overpull
+from pitchraise import regression_inharmonicity, pitch_raise_curve
+from algorithms import DEFAULT_ALGORITHM, RECOMMENDED_ALGORITHM, get_algorithm, algorithm_information
+from progress import ProgressReporter
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'entropy-piano-tuner-2025'
 socketio = SocketIO(app, cors_allowed_origins="*", async_mode='threading')
 
+# Time interval for at most one FFT while listening to the live input stream
+MINIMAL_FFT_INTERVAL_IN_MILLISECONDS = 150
+
+# Maximal latency from sound to tuning indicator in tuning mode
+TUNING_LATENCY_BUDGET_IN_MILLISECONDS = 200
+
+# Shortest analysis window of the tuning mode, in periods of the target frequency
+TUNING_MIN_PERIODS = 8
+SUPPORTED_SAMPLE_RATES = (44100, 48000, 88200, 96000)
+
+# Limits of /api/play_interval: seconds of sound, seconds between the keys, number of keys
+MAX_INTERVAL_DURATION = 10.0
+MAX_INTERVAL_ARPEGGIO = 2.0
+MAX_INTERVAL_KEYS = 10
+
+def native_sample_rate():
+    """Default sample rate of the input device, 44100 Hz if it cannot be queried"""
+    try:
+        rate = int(sd.query_devices(kind='input')['default_samplerate'])
+    except Exception:
+        return 44100
+    return rate if rate in SUPPORTED_SAMPLE_RATES else 44100
+
 # Global state
 class PianoTuner:
     def __init__(self):
@@ -29,8 +67,21 @@ class PianoTuner:
         self.piano_data = self.initialize_piano()
         self.audio_buffer = queue.Queue()
         self.recording = False
+        self.auto_recording = False
+        self.tuning_loop_running = False
+        self.tuning_indicator = 'spectrum'  # spectrum, stroboscope
+        self.zoom_analysis = True  # refine recorded peaks with zoomed spectra
+        self.attack_duration = 0.05  # seconds skipped after the hammer strike
+        self.sustain_duration = 2.0  # seconds analyzed after the attack
+        self.spectrum_averages = {}  # key number -> SpectrumAverage of all strikes
+        self.auditory_spectra = {}  # key number -> preprocessed log spectrum
+        self.min_quality = 0.3  # recordings below this quality are left out of the entropy minimization
         self.selected_key = None
-        self.sample_rate = 44100
+        self.sample_rate = native_sample_rate()  # capture and analysis run at the device rate
+        self.audio_input = AudioInput(self.sample_rate)  # persistent input stream with ring buffer
+        self.synthesizer = Synthesizer(self.sample_rate)  # persistent output stream mixing all tones
+        self.reference_drone = False  # sustained reference tone of the selected key in tuning mode
+        self.overpull_enabled = False  # recompute the overpull of a pitch raise after every recording
         self.concert_pitch = 440.0
         
     def initialize_piano(self):
@@ -39,6 +90,8 @@ class PianoTuner:
             'num_keys': 88,
             'key_of_a4': 48,  # A4 is key 49 (0-indexed = 48)
             'concert_pitch': 440.0,
+            'piano_type': 'grand',  # grand or upright, for the overpull model
+            'num_bass_keys': DEFAULT_KEYS_ON_BASS_BRIDGE,
             'keys': []
         }
         
@@ -82,7 +135,7 @@ class PianoTuner:
             return self.piano_data['keys'][key_number]
         return None
     
-    def calculate_entropy_tuning_curve(self, socketio_emit=None):
+    def calculate_entropy_tuning_curve(self, socketio_emit=None, max_iterations=50, progress=None):
         """
         Calculate optimal tuning curve using Entropy Minimization Algorithm.
         
@@ -97,25 +150,29 @@ class PianoTuner:
         
         Args:
             socketio_emit: Function to emit progress updates (optional)
+            max_iterations: Maximum number of generations of the differential evolution
+            progress: ProgressReporter to use instead of one on socketio_emit (optional)
         """
+        from scipy.optimize import differential_evolution
+        from scipy.ndimage import gaussian_filter1d
         
-        def emit_progress(progress, message=""):
-            """Helper to emit progress updates"""
-            if socketio_emit:
-                socketio_emit('calculation_progress', {
-                    'progress': progress,
-                    'message': message
-                })
+        emit_progress = progress or ProgressReporter(socketio_emit or (lambda event, data: None))
         
         emit_progress(0, "Initializing entropy calculation...")
         
-        # Step 1: Collect all recorded keys with spectral data
+        # Step 1: Collect all recorded keys with spectral data, leaving out
+        # recordings of low quality
         recorded_keys = []
+        rejected_keys = []
         for i, key in enumerate(self.piano_data['keys']):
             if key['recorded'] and key['peaks'] and len(key['peaks']) > 0:
-                recorded_keys.append(i)
+                if key['recorded_frequency'] and key['recorded_frequency'] > 0:
+                    if key.get('quality', 1.0) < self.min_quality:
+                        rejected_keys.append(i)
+                    else:
+                        recorded_keys.append(i)
         
-        if len(recorded_keys) < 5:
+        if len(recorded_keys) < 2:
             # Not enough data for entropy minimization, fall back to theoretical
             emit_progress(100, "Insufficient data - using equal temperament")
             for key in self.piano_data['keys']:
@@ -123,27 +180,65 @@ class PianoTuner:
                 key['tuning_deviation'] = 0.0
             return
         
-        emit_progress(5, f"Found {len(recorded_keys)} recorded keys")
+        emit_progress(5, f"Found {len(recorded_keys)} recorded keys"
+                         + (f", {len(rejected_keys)} left out for low quality" if rejected_keys else ""))
         
-        # Step 2: Extract inharmonicity coefficients from peaks
-        inharmonicity_coefficients = self._estimate_inharmonicity_coefficients()
+        # Step 2: Extract inharmonicity coefficients from peaks and
+        # extrapolate them to the keys that have not been recorded
+        self._estimate_inharmonicity_coefficients()
+        inharmonicity = self._extrapolate_inharmonicity()
         emit_progress(10, "Estimated inharmonicity coefficients")
         
+        # Spectral lines of all keys: recorded peaks as partial ratios relative
+        # to the recorded fundamental, synthetic partials for the other keys
+        # The lines are weighted with their power after auditory preprocessing
+        # if it is available for all keys, else with the raw magnitudes
+        num_keys = len(self.piano_data['keys'])
+        unrecorded_keys = [i for i in range(num_keys) if i not in recorded_keys]
+        weight = 'spla' if all('spla' in peak for i in recorded_keys
+                               for peak in self.piano_data['keys'][i]['peaks']) else 'magnitude'
+        reference_magnitude = np.median([max(peak[weight] for peak in self.piano_data['keys'][i]['peaks'])
+                                         for i in recorded_keys])
+        line_keys, line_ratios, line_magnitudes = [], [], []
+        for key_idx in recorded_keys:
+            key = self.piano_data['keys'][key_idx]
+            for peak in key['peaks']:
+                line_keys.append(key_idx)
+                line_ratios.append(peak['frequency'] / key['recorded_frequency'])
+                line_magnitudes.append(peak[weight])
+        synthetic_ratios = synthetic_partial_ratios(inharmonicity[unrecorded_keys])
+        synthetic_magnitudes = reference_magnitude * np.arange(1, synthetic_ratios.shape[1] + 1) ** -1.5
+        line_keys = np.concatenate([line_keys, np.repeat(unrecorded_keys, synthetic_ratios.shape[1])]).astype(int)
+        line_ratios = np.concatenate([line_ratios, synthetic_ratios.ravel()])
+        line_magnitudes = np.concatenate([line_magnitudes, np.tile(synthetic_magnitudes, len(unrecorded_keys))])
+        theoretical_frequencies = np.array([key['theoretical_frequency'] for key in self.piano_data['keys']])
+        
         # Step 3: Set up optimization problem
         # We'll optimize the tuning offset (in cents) for each key
         # Constraint: A4 stays fixed, smooth curve, stay close to equal temperament
         
         a4_index = self.piano_data['key_of_a4']
         
-        # Initial guess: all keys at equal temperament (offset = 0 cents)
-        initial_offsets = np.zeros(88)
-        
         # Bounds: limit deviations to ±50 cents from equal temperament
-        bounds = [(-50, 50) for _ in range(88)]
+        bounds = [(-50, 50) for _ in range(num_keys)]
         
         # A4 must stay at 0 cents (fixed at concert pitch)
         bounds[a4_index] = (0, 0)
         
+        # Combined spectrum on a frequency grid from 20 Hz to 10 kHz
+        freq_min, freq_max = 20.0, 10000.0
+        freq_resolution = 0.1  # Hz
+        freq_grid = np.arange(freq_min, freq_max, freq_resolution)
+        
+        # Each line is added as a narrow Gaussian, wider for higher partials
+        sigmas = (0.5 + 0.1 * line_ratios) / freq_resolution
+        gaussian_ranges = (5 * sigmas).astype(int)
+        offsets = np.arange(-gaussian_ranges.max(), gaussian_ranges.max())
+        in_range = (offsets[None, :] >= -gaussian_ranges[:, None]) & (offsets[None, :] < gaussian_ranges[:, None])
+        gaussians = np.where(in_range,
+                             line_magnitudes[:, None] * np.exp(-0.5 * (offsets[None, :] / sigmas[:, None]) ** 2),
+                             0.0)
+        
         emit_progress(15, "Setting up optimization problem...")
         
         # Step 4: Define the objective function (entropy calculation)
@@ -160,56 +255,16 @@ class PianoTuner:
             # Convert offsets to frequency multipliers
             frequency_multipliers = 2.0 ** (offsets_cents / 1200.0)
             
-            # Create combined spectrum with all partials
-            # Use a frequency grid from 20 Hz to 10 kHz
-            freq_min, freq_max = 20.0, 10000.0
-            freq_resolution = 0.1  # Hz
-            freq_grid = np.arange(freq_min, freq_max, freq_resolution)
+            # Apply the tuning offset to all spectral lines
+            base_freqs = theoretical_frequencies[line_keys] * frequency_multipliers[line_keys]
+            freq_idx = np.searchsorted(freq_grid, base_freqs * line_ratios)
             
-            # Accumulate power spectrum
-            total_spectrum = np.zeros_like(freq_grid)
-            
-            for key_idx in recorded_keys:
-                key = self.piano_data['keys'][key_idx]
-                base_freq = key['theoretical_frequency'] * frequency_multipliers[key_idx]
-                
-                # Get peaks (partials)
-                peaks = key['peaks']
-                if not peaks:
-                    continue
-                
-                # Estimate fundamental and partial ratios from recorded data
-                recorded_fund = key['recorded_frequency']
-                if recorded_fund is None or recorded_fund <= 0:
-                    continue
-                
-                # Add each partial to the spectrum
-                for peak in peaks:
-                    peak_freq_recorded = peak['frequency']
-                    peak_magnitude = peak['magnitude']
-                    
-                    # Calculate partial number and inharmonicity shift
-                    partial_ratio = peak_freq_recorded / recorded_fund
-                    
-                    # Apply the tuning offset to this partial
-                    adjusted_peak_freq = base_freq * partial_ratio
-                    
-                    # Add this partial as a narrow peak (Gaussian) to the spectrum
-                    # Width depends on the partial number (higher partials have more width)
-                    peak_width = 0.5 + 0.1 * partial_ratio  # Hz
-                    
-                    # Find the nearest grid point
-                    freq_idx = np.searchsorted(freq_grid, adjusted_peak_freq)
-                    if 0 < freq_idx < len(freq_grid):
-                        # Add Gaussian-shaped peak
-                        sigma = peak_width / freq_resolution
-                        gaussian_range = int(5 * sigma)
-                        start_idx = max(0, freq_idx - gaussian_range)
-                        end_idx = min(len(freq_grid), freq_idx + gaussian_range)
-                        
-                        x = np.arange(start_idx, end_idx)
-                        gaussian = peak_magnitude * np.exp(-0.5 * ((x - freq_idx) / sigma) ** 2)
-                        total_spectrum[start_idx:end_idx] += gaussian
+            # Accumulate power spectrum of all lines on the grid
+            indices = freq_idx[:, None] + offsets[None, :]
+            valid = ((freq_idx > 0) & (freq_idx < len(freq_grid)))[:, None] & \
+                    (indices >= 0) & (indices < len(freq_grid))
+            total_spectrum = np.bincount(indices[valid], weights=gaussians[valid],
+                                         minlength=len(freq_grid))
             
             # Normalize spectrum to create a probability distribution
             spectrum_sum = np.sum(total_spectrum)
@@ -241,19 +296,24 @@ class PianoTuner:
         # Use differential_evolution for global optimization
         # This is more robust than local minimizers for this type of problem
         
+        generations = [0]
+        
+        def report_generation(xk, convergence):
+            """Progress after every generation: iterations done or population convergence, whichever is further"""
+            generations[0] += 1
+            fraction = min(1.0, max(generations[0] / max_iterations, convergence))
+            emit_progress(20 + 60 * fraction, "Optimizing tuning curve...")
+        
         try:
             result = differential_evolution(
                 objective_function,
                 bounds,
-                maxiter=50,  # Limit iterations for reasonable runtime
+                maxiter=max_iterations,  # Limit iterations for reasonable runtime
                 popsize=10,
                 tol=0.01,
                 workers=1,
                 updating='deferred',
-                callback=lambda xk, convergence: emit_progress(
-                    20 + int(60 * min(1.0, convergence)),
-                    "Optimizing tuning curve..."
-                )
+                callback=report_generation
             )
             
             optimal_offsets = result.x
@@ -298,50 +358,160 @@ class PianoTuner:
         Inharmonicity coefficient B relates to how much partials deviate from
         perfect harmonics: f_n = n·f_0·√(1 + B·n²)
         
+        f_0 and B are fitted jointly by least squares over all stored peaks,
+        for all recorded keys in one pass. The RMS deviation of the partials
+        from the fit is stored as 'inharmonicity_residual' (cents) and serves
+        as a quality signal for the recording.
+        
         Returns:
             dict: {key_index: inharmonicity_coefficient}
         """
-        inharmonicity = {}
+        keys = self.piano_data['keys']
+        max_peaks = max([len(key['peaks']) for key in keys if key['peaks']] + [1])
+        peak_frequencies = np.full((len(keys), max_peaks), np.nan)
+        reference_frequencies = np.full(len(keys), np.nan)
         
-        for i, key in enumerate(self.piano_data['keys']):
+        for i, key in enumerate(keys):
             if not key['recorded'] or not key['peaks'] or len(key['peaks']) < 2:
-                inharmonicity[i] = 0.0
                 continue
-            
-            recorded_fund = key['recorded_frequency']
-            if recorded_fund is None or recorded_fund <= 0:
+            if key['recorded_frequency'] is None or key['recorded_frequency'] <= 0:
+                continue
+            reference_frequencies[i] = key['recorded_frequency']
+            peak_frequencies[i, :len(key['peaks'])] = [peak['frequency'] for peak in key['peaks']]
+        
+        fit = fit_inharmonicity(peak_frequencies, reference_frequencies)
+        B = fit['B'].filled(np.nan)
+        residual = fit['residual'].filled(np.nan)
+        usable = ~np.isnan(reference_frequencies)
+        # Reasonable range for piano inharmonicity, small default value otherwise
+        fitted = (B > 0) & (B < 0.01)
+        coefficients = np.where(fitted, B, 0.0001)
+        
+        inharmonicity = {}
+        for i, key in enumerate(keys):
+            if not usable[i]:
                 inharmonicity[i] = 0.0
                 continue
             
-            # Analyze peaks to estimate inharmonicity
-            # For each peak, calculate what partial number it likely represents
-            B_estimates = []
-            
-            for peak in key['peaks'][:5]:  # Use up to 5 strongest peaks
-                peak_freq = peak['frequency']
-                # Estimate partial number (approximate)
-                n = round(peak_freq / recorded_fund)
-                
-                if n >= 2 and n <= 10:  # Only use reasonable partial numbers
-                    # Solve for B: peak_freq = n·fund·√(1 + B·n²)
-                    # B = (1/n²)·[(peak_freq/(n·fund))² - 1]
-                    ratio = peak_freq / (n * recorded_fund)
-                    if ratio > 1.0:  # Inharmonicity makes partials sharp
-                        B = (1.0 / n**2) * (ratio**2 - 1.0)
-                        if 0 < B < 0.01:  # Reasonable range for piano inharmonicity
-                            B_estimates.append(B)
-            
-            # Average the estimates
-            if B_estimates:
-                inharmonicity[i] = np.median(B_estimates)
-            else:
-                inharmonicity[i] = 0.0001  # Small default value
+            inharmonicity[i] = float(coefficients[i])
             
             # Store in key data
             key['inharmonicity'] = inharmonicity[i]
+            key['inharmonicity_residual'] = round(float(residual[i]), 3) if fitted[i] else None
         
         return inharmonicity
     
+    def _preprocess_key_spectrum(self, key_number):
+        """
+        Apply the auditory preprocessing to the averaged spectrum of a key.
+        
+        The preprocessed spectrum is kept in auditory_spectra and the power
+        it assigns to each recorded peak is stored as the peak's 'spla', which
+        the entropy minimization uses as the weight of the line.
+        """
+        key = self.get_key(key_number)
+        average = self.spectrum_averages.get(key_number)
+        if not key or average is None or not key['recorded_frequency']:
+            return
+        
+        a4_index = self.piano_data['key_of_a4']
+        num_keys = len(self.piano_data['keys'])
+        treble_weight = max(0, key_number - a4_index) / (num_keys - a4_index)
+        spectrum = preprocess_spectrum(average.spectrum, key['recorded_frequency'],
+                                       key.get('inharmonicity') or 0.0, treble_weight)
+        self.auditory_spectra[key_number] = spectrum
+        
+        for peak in key['peaks']:
+            m = int(round(frequency_to_index(peak['frequency'])))
+            peak['spla'] = float(spectrum[m]) if 0 <= m < len(spectrum) else 0.0
+    
+    def _extrapolate_inharmonicity(self):
+        """
+        Complete the inharmonicity coefficients for the keys that have not
+        been recorded (see inharmonicity.extrapolate_inharmonicity).
+        
+        Only fitted coefficients (those with an inharmonicity_residual) count
+        as measured. Extrapolated values are stored as 'inharmonicity' of the
+        unrecorded keys.
+        
+        Returns:
+            np.array: Inharmonicity coefficients of all keys
+        """
+        keys = self.piano_data['keys']
+        measured = np.array([key['inharmonicity'] if key.get('inharmonicity_residual') is not None else np.nan
+                             for key in keys])
+        B = extrapolate_inharmonicity(measured, self.piano_data['key_of_a4'], self.concert_pitch)
+        
+        for key, B_key in zip(keys, B):
+            if not key['recorded']:
+                key['inharmonicity'] = float(B_key)
+        
+        return B
+    
+    def compute_overpull(self):
+        """
+        Overpull targets for a pitch raise (OverpullEstimator).
+        
+        The computed frequency of every key, or the theoretical one if none
+        has been computed, is the tuning the piano should end up with. The
+        deviation of the recorded frequencies from it predicts how far the
+        keys will fall while the others are raised. All keys are updated in
+        one product with the interaction matrix, which is computed once per
+        piano configuration.
+        
+        Stores 'overpull' (cents) and raises 'tuning_frequency' of every key
+        by it. 'tuning_deviation' is the deviation of the recording from that
+        frequency.
+        
+        Returns:
+            np.array: Overpull of all keys in cents
+        """
+        keys = self.piano_data['keys']
+        R = interaction_matrix(len(keys), self.piano_data.get('num_bass_keys', DEFAULT_KEYS_ON_BASS_BRIDGE),
+                               self.piano_data.get('piano_type', 'grand'))
+        target = np.array([key['computed_frequency'] or key['theoretical_frequency'] for key in keys])
+        recorded = np.array([key['recorded_frequency'] or np.nan for key in keys], dtype=float)
+        cents = overpull(R, recorded, target)
+        tuning = target * 2 ** (cents / 1200)
+        deviation = np.where(np.isnan(recorded), 0.0, 1200 * np.log2(recorded / tuning))
+        
+        for key, key_target, key_cents, key_tuning, key_deviation in zip(keys, target, cents, tuning, deviation):
+            key['computed_frequency'] = float(key_target)
+            key['overpull'] = round(float(key_cents), 2)
+            key['tuning_frequency'] = round(float(key_tuning), 2)
+            key['tuning_deviation'] = round(float(key_deviation), 2)
+        
+        return cents
+    
+    def calculate_pitch_raise_curve(self):
+        """
+        Approximate tuning curve for a pitch raise (PitchRaise algorithm).
+        
+        The fitted inharmonicity of the recorded keys is extended to all keys
+        by a regression on each bridge, and the curve is built from it in one
+        pass over all keys (see pitchraise.pitch_raise_curve).
+        
+        Returns:
+            np.array: Deviation of the curve from equal temperament in cents
+        """
+        keys = self.piano_data['keys']
+        measured = np.array([key['inharmonicity'] if key.get('inharmonicity_residual') is not None else np.nan
+                             for key in keys])
+        B = regression_inharmonicity(measured, self.piano_data.get('num_bass_keys', DEFAULT_KEYS_ON_BASS_BRIDGE))
+        cents = pitch_raise_curve(B, self.piano_data['key_of_a4'])
+        
+        theoretical = np.array([key['theoretical_frequency'] for key in keys])
+        recorded = np.array([key['recorded_frequency'] or np.nan for key in keys], dtype=float)
+        computed = theoretical * 2 ** (cents / 1200)
+        deviation = np.where(np.isnan(recorded), 0.0, 1200 * np.log2(recorded / computed))
+        
+        for key, key_computed, key_deviation in zip(keys, computed, deviation):
+            key['computed_frequency'] = round(float(key_computed), 2)
+            key['tuning_frequency'] = round(float(key_computed), 2)
+            key['tuning_deviation'] = round(float(key_deviation), 2)
+        
+        return cents
+    
     def _fallback_smooth_tuning(self, recorded_keys):
         """
         Fallback method: create smooth tuning curve by interpolating recorded deviations.
@@ -352,6 +522,8 @@ class PianoTuner:
         Returns:
             np.array: Tuning offsets in cents for all 88 keys
         """
+        from scipy.ndimage import gaussian_filter1d
+        
         # Get recorded deviations
         recorded_deviations = []
         recorded_indices = []
@@ -405,6 +577,11 @@ def mode_control():
         new_mode = request.json.get('mode')
         if new_mode in ['idle', 'recording', 'calculating', 'tuning']:
             tuner.mode = new_mode
+            if new_mode in ['recording', 'tuning']:
+                tuner.audio_input.start()
+            if new_mode == 'tuning' and not tuner.tuning_loop_running:
+                tuner.tuning_loop_running = True
+                threading.Thread(target=tuning_loop, daemon=True).start()
             socketio.emit('mode_changed', {'mode': new_mode})
             return jsonify({'success': True, 'mode': new_mode})
         return jsonify({'success': False, 'error': 'Invalid mode'}), 400
@@ -429,44 +606,32 @@ def start_recording():
         return jsonify({'success': False, 'error': 'No key selected'}), 400
     
     # Start recording in a separate thread
-    threading.Thread(target=record_audio, args=(tuner.selected_key,), daemon=True).start()
+    # A reset discards the strikes recorded so far for this key
+    if (request.get_json(silent=True) or {}).get('reset', False):
+        tuner.spectrum_averages.pop(tuner.selected_key, None)
+    
+    # The recording starts at the stream position of the button press
+    pressed = time.perf_counter()
+    try:
+        tuner.audio_input.start()
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+    start = tuner.audio_input.position
+    
+    threading.Thread(target=record_audio, args=(tuner.selected_key, 3.0, start, pressed), daemon=True).start()
     
     return jsonify({'success': True, 'message': 'Recording started'})
 
-def record_audio(key_number, duration=3.0):
-    """Record audio and analyze frequency"""
+def record_audio(key_number, duration=3.0, start=None, pressed=None):
+    """Record audio from the persistent input stream and analyze frequency"""
     tuner.recording = True
     socketio.emit('recording_started', {'key_number': key_number})
     
     try:
-        # Record audio
-        recording = sd.rec(int(duration * tuner.sample_rate), 
-                          samplerate=tuner.sample_rate, 
-                          channels=1, 
-                          dtype='float32')
-        sd.wait()
-        
-        # Analyze frequency
-        audio_data = recording.flatten()
-        frequency, peaks = analyze_frequency(audio_data, tuner.sample_rate)
-        
-        # Update key data
-        key = tuner.get_key(key_number)
-        if key:
-            key['recorded_frequency'] = frequency
-            key['recorded'] = True
-            key['peaks'] = peaks
-            
-            # Calculate deviation from theoretical
-            if frequency:
-                cents = 1200 * np.log2(frequency / key['theoretical_frequency'])
-                key['tuning_deviation'] = cents
+        # Slice the recording from the ring buffer
+        recording, latency_ms = tuner.audio_input.record(duration, start, pressed)
         
-        socketio.emit('recording_completed', {
-            'key_number': key_number,
-            'frequency': frequency,
-            'deviation': key['tuning_deviation'] if key else 0
-        })
+        store_recording(key_number, recording, input_latency_ms=latency_ms)
         
     except Exception as e:
         socketio.emit('recording_error', {'error': str(e)})
@@ -474,142 +639,441 @@ def record_audio(key_number, duration=3.0):
     finally:
         tuner.recording = False
 
-def analyze_frequency(audio_data, sample_rate):
-    """Analyze audio to detect fundamental frequency"""
+def store_recording(key_number, audio_data, auto_detected=False, input_latency_ms=None):
+    """
+    Analyze a recorded key stroke and store the result in the key data
+    
+    input_latency_ms, the time from the button press to the first analyzed
+    sample, is passed on in recording_completed.
+    """
+    # Only the sustain after the hammer strike is analyzed, if it is long
+    # enough to resolve the partials of the key
+    key = tuner.get_key(key_number)
+    onset, onset_db = detect_onset(audio_data, tuner.sample_rate)
+    if onset is None:
+        socketio.emit('recording_error', {'key_number': key_number, 'error': 'No key stroke detected'})
+        return
+    audio_data = sustain_window(audio_data, tuner.sample_rate, onset,
+                                tuner.attack_duration, tuner.sustain_duration,
+                                min_sustain_duration(key['theoretical_frequency'] if key else None))
+    if audio_data is None:
+        socketio.emit('recording_error', {'key_number': key_number,
+                                          'error': 'Key stroke too late in the recording, strike the key again'})
+        return
+    
+    average = tuner.spectrum_averages.setdefault(key_number, SpectrumAverage())
+    frequency, peaks = analyze_frequency(audio_data, tuner.sample_rate, zoom=tuner.zoom_analysis,
+                                         average=average,
+                                         key_frequency=key['theoretical_frequency'] if key else None)
+    
+    # Update key data
+    if key:
+        key['recorded_frequency'] = frequency
+        key['recorded'] = frequency is not None
+        key['peaks'] = peaks
+        key['strikes'] = average.count
+        
+        # Calculate deviation from theoretical
+        if frequency:
+            cents = 1200 * np.log2(frequency / key['theoretical_frequency'])
+            key['tuning_deviation'] = cents
+        
+        # Refit the inharmonicity of all keys with the new partials
+        tuner._estimate_inharmonicity_coefficients()
+        tuner._preprocess_key_spectrum(key_number)
+        
+        if frequency is None:
+            key['quality'] = 0.0
+        else:
+            key['quality'] = recording_quality(spectral_snr(average.spectrum),
+                                               key.get('inharmonicity_residual'), onset_db)
+        
+        # A strike that is struck again is not averaged with this bad one
+        if key['quality'] < tuner.min_quality:
+            tuner.spectrum_averages.pop(key_number, None)
+        
+        # The new recording changes the expected fall of all other keys
+        if tuner.overpull_enabled:
+            tuner.compute_overpull()
+            socketio.emit('overpull_updated', {
+                'overpull': [k['overpull'] for k in tuner.piano_data['keys']],
+                'tuning_frequency': [k['tuning_frequency'] for k in tuner.piano_data['keys']],
+                'tuning_deviation': [k['tuning_deviation'] for k in tuner.piano_data['keys']]
+            })
+    
+    socketio.emit('recording_completed', {
+        'key_number': key_number,
+        'frequency': frequency,
+        'deviation': key['tuning_deviation'] if key else 0,
+        'inharmonicity': key.get('inharmonicity') if key else None,
+        'strikes': average.count,
+        'quality': key.get('quality') if key else None,
+        'input_latency_ms': round(input_latency_ms, 1) if input_latency_ms is not None else None,
+        'auto_detected': auto_detected
+    })
+
+@app.route('/api/auto_recording', methods=['POST'])
+def auto_recording():
+    """Enable or disable recording with automatic key recognition"""
+    enabled = bool(request.json.get('enabled', True))
+    
+    if enabled and not tuner.auto_recording:
+        tuner.auto_recording = True
+        threading.Thread(target=auto_record_loop, daemon=True).start()
+    elif not enabled:
+        tuner.auto_recording = False
+    
+    socketio.emit('auto_recording_changed', {'enabled': tuner.auto_recording})
+    return jsonify({'success': True, 'enabled': tuner.auto_recording})
+
+def auto_record_loop(duration=3.0, block_duration=0.05, trigger_ratio=8.0, min_level=1e-3, preroll_duration=0.5):
+    """
+    Listen to the input stream, detect key strokes and analyze each stroke
+    for the key recognized by the KeyRecognizer.
+    
+    A stroke is detected when the block level rises trigger_ratio times above
+    the background level. During the stroke a key estimate is made every
+    MINIMAL_FFT_INTERVAL_IN_MILLISECONDS and the most frequent one wins,
+    like the key count statistics of the SignalAnalyzer. The analyzed audio
+    starts preroll_duration seconds before the stroke.
+    """
+    block_size = int(block_duration * tuner.sample_rate)
+    preroll = int(preroll_duration * tuner.sample_rate)
+    stroke_blocks = int(duration / block_duration)
+    fft_interval = max(1, int(MINIMAL_FFT_INTERVAL_IN_MILLISECONDS / 1000 / block_duration))
+    recognizer = KeyRecognizer(num_keys=tuner.piano_data['num_keys'],
+                               key_of_a4=tuner.piano_data['key_of_a4'],
+                               concert_pitch=tuner.concert_pitch)
+    background = None
+    
+    try:
+        stream = tuner.audio_input.blocks(block_size)
+        while tuner.auto_recording:
+            position, block = next(stream)
+            level = np.sqrt(np.mean(block ** 2))
+            
+            if background is None or level < trigger_ratio * background or level < min_level:
+                # No stroke, track the background level
+                background = level if background is None else 0.9 * background + 0.1 * level
+                continue
+            
+            tuner.recording = True
+            socketio.emit('recording_started', {'key_number': None})
+            blocks = [block]
+            votes = Counter()
+            
+            for i in range(1, stroke_blocks):
+                _, block = next(stream)
+                blocks.append(block)
+                if i % fft_interval == 0:
+                    audio_data = np.concatenate(blocks)
+                    power_spectrum = np.abs(rfft(audio_data * hann_window(len(audio_data)))) ** 2
+                    key_number, frequency = recognizer.recognize_key(
+                        power_spectrum, tuner.sample_rate, tuner.selected_key)
+                    if key_number >= 0:
+                        votes[key_number] += 1
+                        socketio.emit('key_recognized', {'key_number': key_number,
+                                                         'frequency': frequency})
+            
+            # The decaying tone must not trigger the next stroke
+            background = np.sqrt(np.mean(blocks[-1] ** 2))
+            tuner.recording = False
+            
+            if not votes:
+                socketio.emit('recording_error', {'error': 'Key could not be recognized'})
+                continue
+            
+            key_number = votes.most_common(1)[0][0]
+            tuner.selected_key = key_number
+            socketio.emit('key_selected', {'key_number': key_number,
+                                           'key_data': tuner.get_key(key_number)})
+            # Analyze the stroke together with the background before it, which
+            # is still in the ring buffer, so that the onset can be detected
+            start = max(0, position - preroll)
+            audio_data = tuner.audio_input.read(start, position - start + len(blocks) * block_size)
+            store_recording(key_number, audio_data, auto_detected=True)
+    
+    except Exception as e:
+        socketio.emit('recording_error', {'error': str(e)})
+    
+    finally:
+        tuner.recording = False
+        tuner.auto_recording = False
+        socketio.emit('auto_recording_changed', {'enabled': False})
+
+def analyze_frequency(audio_data, sample_rate, zoom=False, zoom_factor=16, average=None, key_frequency=None):
+    """
+    Analyze audio to detect fundamental frequency
+    
+    If the approximate frequency of the key is given, the recording is first
+    decimated to the band that is needed for the key, which shrinks the FFT
+    for the bass keys at the same frequency resolution.
+    
+    The power spectrum is binned logarithmically. If the SpectrumAverage of
+    earlier strikes of the same key is given, the spectrum is added to it and
+    the peaks are extracted from the averaged spectrum, so that repeated
+    strikes suppress noise and spurious lines. A strike whose lines miss the
+    fundamental of the average, because the key has been retuned, starts a
+    new average.
+    
+    With zoom=True the peaks are refined by zoomed spectra of this recording
+    around each of them, sampled zoom_factor times denser than the FFT bins.
+    """
+    audio_data, sample_rate = decimate_for_key(audio_data, sample_rate, key_frequency)
+    
     # Apply window to reduce spectral leakage
-    window = signal.windows.hann(len(audio_data))
-    audio_windowed = audio_data * window
+    audio_windowed = audio_data * hann_window(len(audio_data))
     
-    # Compute FFT
-    fft_data = rfft(audio_windowed)
-    freqs = rfftfreq(len(audio_windowed), 1/sample_rate)
-    magnitude = np.abs(fft_data)
+    # Compute FFT and the log-binned power spectrum
+    power_spectrum = np.abs(rfft(audio_windowed))**2
+    spectrum = log_binned_spectrum(power_spectrum, sample_rate, len(audio_windowed))
+    if average is not None:
+        if not average.matches(spectrum):
+            average.reset()
+        spectrum = average.add(spectrum)
     
-    # Find peaks
-    peak_indices, properties = signal.find_peaks(magnitude, height=np.max(magnitude)*0.1)
+    # Find peaks standing out of the local noise floor, within 60 dB of the
+    # strongest one; the 10 lowest are candidates
+    frequencies, powers = extract_peaks(spectrum, threshold=1e-6, floor=noise_floor(spectrum))
+    frequencies, powers = frequencies[:10], powers[:10]
     
-    if len(peak_indices) == 0:
+    if len(frequencies) == 0:
         return None, []
     
-    # Get the fundamental (lowest strong peak)
-    peaks = []
-    for idx in peak_indices[:10]:  # Top 10 peaks
-        if freqs[idx] > 20:  # Ignore very low frequencies
-            peaks.append({
-                'frequency': float(freqs[idx]),
-                'magnitude': float(magnitude[idx])
-            })
+    if zoom:
+        frequencies, _ = refine_peaks(audio_windowed, sample_rate, frequencies, zoom_factor)
+    
+    peaks = [{'frequency': float(f), 'magnitude': float(np.sqrt(p))}
+             for f, p in zip(frequencies, powers)]
     
     # Sort by magnitude
     peaks.sort(key=lambda x: x['magnitude'], reverse=True)
     
     # Fundamental is usually the strongest peak or lowest significant peak
-    if peaks:
-        fundamental = peaks[0]['frequency']
-        return fundamental, peaks[:5]
+    fundamental = peaks[0]['frequency']
+    if average is not None:
+        average.frequency = fundamental
+    return fundamental, peaks[:5]
+
+def detect_frequency_of_known_key(power_spectrum, sample_rate, fft_size, target_frequency):
+    """
+    Detect the frequency of a key whose approximate frequency is known.
+    
+    Searches the strongest line within a bit less than a half tone of the
+    target and refines it by parabolic interpolation of the log spectrum.
+    
+    Returns:
+        float: Detected frequency in Hz, or None if nothing was found
+    """
+    bin_width = sample_rate / fft_size
+    q1 = max(1, int(target_frequency / 1.04 / bin_width))
+    q2 = min(len(power_spectrum) - 2, int(target_frequency * 1.04 / bin_width) + 1)
+    if q2 <= q1:
+        return None
     
-    return None, []
+    q = q1 + int(np.argmax(power_spectrum[q1:q2 + 1]))
+    if power_spectrum[q] <= 0:
+        return None
+    
+    a, b, c = np.log(power_spectrum[q - 1:q + 2] + 1e-30)
+    denominator = a - 2 * b + c
+    shift = 0.5 * (a - c) / denominator if denominator < 0 else 0.0
+    return float((q + shift) * bin_width)
+
+def partial_frequencies(frequency, inharmonicity=0.0, num_partials=8):
+    """Frequencies of the first partials of a key tuned to the given frequency"""
+    n = np.arange(1, num_partials + 1)
+    B = inharmonicity or 0.0
+    return n * frequency * np.sqrt((1 + B * n**2) / (1 + B))
+
+@app.route('/api/tuning_indicator', methods=['POST'])
+def tuning_indicator():
+    """Choose the live tuning indicator (spectrum or stroboscope)"""
+    indicator = request.json.get('indicator')
+    if indicator in ['spectrum', 'stroboscope']:
+        tuner.tuning_indicator = indicator
+        return jsonify({'success': True, 'indicator': indicator})
+    return jsonify({'success': False, 'error': 'Invalid indicator'}), 400
+
+@app.route('/api/drone', methods=['POST'])
+def drone_control():
+    """Switch the sustained reference tone of the tuning mode on or off"""
+    tuner.reference_drone = bool(request.json.get('enabled'))
+    if not tuner.reference_drone:
+        tuner.synthesizer.stop_drone()
+    return jsonify({'success': True, 'enabled': tuner.reference_drone})
+
+@app.route('/api/sample_rate', methods=['GET', 'POST'])
+def sample_rate_control():
+    """Get or set the sample rate of capture and analysis"""
+    if request.method == 'POST':
+        rate = request.json.get('sample_rate')
+        rate = native_sample_rate() if rate == 'native' else rate
+        if rate not in SUPPORTED_SAMPLE_RATES:
+            return jsonify({'success': False, 'error': 'Unsupported sample rate'}), 400
+        if tuner.recording or tuner.auto_recording or tuner.tuning_loop_running:
+            return jsonify({'success': False, 'error': 'Audio stream is running'}), 400
+        tuner.sample_rate = rate
+        tuner.audio_input.set_sample_rate(rate)
+        tuner.synthesizer.set_sample_rate(rate)
+    
+    return jsonify({'success': True, 'sample_rate': tuner.sample_rate,
+                    'native_sample_rate': native_sample_rate(),
+                    'supported': list(SUPPORTED_SAMPLE_RATES)})
+
+def tuning_window_size(sample_rate, target, overhead, max_size):
+    """
+    Length of the analysis window of the tuning mode in samples.
+    
+    A frame describes the sound at the centre of its window, so the window
+    adds half its length to the latency. The window is made as long as the
+    latency budget allows after the overhead (analysis time and device
+    latency, in seconds), for the best frequency resolution, but never
+    shorter than TUNING_MIN_PERIODS periods of the target. It is rounded
+    down to whole 10 ms so that windows can be reused between frames.
+    
+    Returns:
+        int: Window length in samples, at most max_size
+    """
+    step = sample_rate // 100
+    allowed = int(2 * (TUNING_LATENCY_BUDGET_IN_MILLISECONDS / 1000 - overhead) * sample_rate)
+    minimum = -(-int(TUNING_MIN_PERIODS * sample_rate / target) // step) * step
+    return min(max_size, max(minimum, allowed // step * step))
+
+def tuning_loop(window_duration=1.0):
+    """
+    Continuous measurement loop of the tuning mode.
+    
+    Reads the input stream in blocks of MINIMAL_FFT_INTERVAL_IN_MILLISECONDS,
+    performs an FFT over the last samples and emits the deviation of the
+    selected key from its tuning frequency as a tuning_frame.
+    
+    The latency of a frame is the age of the centre of its window when it is
+    emitted: half the window, the analysis time and the input latency of the
+    device. The window, at most window_duration seconds, is sized for every
+    frame to keep this within TUNING_LATENCY_BUDGET_IN_MILLISECONDS (see
+    tuning_window_size), and zero-padded for the frequency interpolation.
+    Crossing the budget is logged. Every frame reports its latency and
+    window length.
+    
+    With the stroboscope indicator the FFT is skipped: the stream is only
+    demodulated at the partials of the selected key and the per-partial phase
+    drift is emitted as a stroboscope_frame.
+    
+    If the reference drone is on, it follows the target of the selected key
+    and glides to the new target when the key or its tuning changes.
+    """
+    hop_size = int(tuner.sample_rate * MINIMAL_FFT_INTERVAL_IN_MILLISECONDS / 1000)
+    buffer_size = int(tuner.sample_rate * window_duration)
+    buffer = np.zeros(buffer_size, dtype=np.float32)
+    windows = {}
+    analysis_time = 0.02  # Decaying peak of the time from capture to emit in seconds
+    within_budget = True
+    stroboscope = Stroboscope(tuner.sample_rate)
+    stroboscope.set_frames_per_second(1000 / MINIMAL_FFT_INTERVAL_IN_MILLISECONDS)
+    stroboscope.start()
+    stroboscope_target = None
+    
+    try:
+        stream = tuner.audio_input.blocks(hop_size)
+        while tuner.mode == 'tuning':
+            _, block = next(stream)
+            captured = time.perf_counter()
+            buffer = np.roll(buffer, -hop_size)
+            buffer[-hop_size:] = block
+            
+            key = tuner.get_key(tuner.selected_key) if tuner.selected_key is not None else None
+            if not key:
+                tuner.synthesizer.stop_drone()
+                continue
+            target = (key.get('tuning_frequency') or key.get('computed_frequency')
+                      or key['theoretical_frequency'])
+            if tuner.reference_drone:
+                tuner.synthesizer.set_drone(target, key.get('inharmonicity') or 0.0)
+            
+            if tuner.tuning_indicator == 'stroboscope':
+                if stroboscope_target != (key['number'], target):
+                    stroboscope_target = (key['number'], target)
+                    stroboscope.set_frequencies(partial_frequencies(target, key.get('inharmonicity', 0.0)))
+                for frame in stroboscope.push_raw_data(block):
+                    latency_ms = (time.perf_counter() - captured + tuner.audio_input.latency) * 1000
+                    socketio.emit('stroboscope_frame', {
+                        'key_number': key['number'],
+                        'partials': stroboscope.readout(frame),
+                        'latency_ms': round(latency_ms, 1)
+                    })
+                continue
+            
+            window_size = tuning_window_size(tuner.sample_rate, target,
+                                             analysis_time + tuner.audio_input.latency, buffer_size)
+            if window_size not in windows:
+                windows[window_size] = hann_window(window_size).astype(np.float32)
+            fft_size = 1 << int(np.ceil(np.log2(4 * window_size)))
+            power_spectrum = np.abs(rfft(buffer[-window_size:] * windows[window_size], fft_size)) ** 2
+            frequency = detect_frequency_of_known_key(
+                power_spectrum, tuner.sample_rate, fft_size, target)
+            if frequency is None:
+                continue
+            
+            deviation = 1200 * np.log2(frequency / target)
+            elapsed = time.perf_counter() - captured
+            analysis_time = max(elapsed, 0.9 * analysis_time)
+            window_ms = window_size / tuner.sample_rate * 1000
+            latency_ms = (elapsed + tuner.audio_input.latency) * 1000 + window_ms / 2
+            if (latency_ms <= TUNING_LATENCY_BUDGET_IN_MILLISECONDS) != within_budget:
+                within_budget = not within_budget
+                if within_budget:
+                    app.logger.info(f'Tuning latency back within budget: {latency_ms:.0f} ms')
+                else:
+                    app.logger.warning(f'Tuning latency {latency_ms:.0f} ms exceeds the budget of '
+                                       f'{TUNING_LATENCY_BUDGET_IN_MILLISECONDS} ms '
+                                       f'({window_ms:.0f} ms window for {key["name"]})')
+            socketio.emit('tuning_frame', {
+                'key_number': key['number'],
+                'frequency': round(float(frequency), 3),
+                'deviation': round(float(deviation), 2),
+                'latency_ms': round(float(latency_ms), 1),
+                'window_ms': round(float(window_ms), 1),
+                'within_budget': within_budget
+            })
+    
+    except Exception as e:
+        socketio.emit('tuning_error', {'error': str(e)})
+    
+    finally:
+        tuner.synthesizer.stop_drone()
+        tuner.tuning_loop_running = False
+
+@app.route('/api/algorithms')
+def list_algorithms():
+    """Get the registered tuning algorithms with their parameters"""
+    return jsonify({'algorithms': algorithm_information(), 'default': DEFAULT_ALGORITHM,
+                    'recommended': RECOMMENDED_ALGORITHM})
 
 @app.route('/api/calculate_tuning', methods=['POST'])
 def calculate_tuning():
     """Calculate optimal tuning curve"""
-    algorithm = request.json.get('algorithm', 'equal_temperament')
+    algorithm_id = request.json.get('algorithm', DEFAULT_ALGORITHM)
+    try:
+        algorithm = get_algorithm(algorithm_id)
+        parameters = algorithm.parameter_values(request.json.get('parameters'))
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     
     # Start calculation in background
-    threading.Thread(target=calculate_tuning_curve, args=(algorithm,), daemon=True).start()
+    threading.Thread(target=calculate_tuning_curve, args=(algorithm, parameters), daemon=True).start()
     
     return jsonify({'success': True, 'message': 'Calculation started'})
 
-def calculate_tuning_curve(algorithm='equal_temperament'):
-    """Calculate tuning curve using specified algorithm"""
-    socketio.emit('calculation_started', {'algorithm': algorithm})
+def calculate_tuning_curve(algorithm, parameters=None):
+    """Calculate tuning curve using the specified registered algorithm"""
+    socketio.emit('calculation_started', {'algorithm': algorithm.id})
+    tuner.overpull_enabled = algorithm.id == 'overpull'
+    progress = ProgressReporter(socketio.emit)
     
     try:
-        if algorithm == 'entropy_minimization':
-            # Entropy Minimization Algorithm (EPT method)
-            tuner.calculate_entropy_tuning_curve(socketio_emit=socketio.emit)
-        
-        elif algorithm == 'equal_temperament':
-            # Equal temperament: use theoretical frequencies
-            total_keys = len(tuner.piano_data['keys'])
-            for i, key in enumerate(tuner.piano_data['keys']):
-                key['computed_frequency'] = key['theoretical_frequency']
-                key['tuning_frequency'] = key['theoretical_frequency']
-                # Calculate deviation from theoretical
-                if key['recorded_frequency']:
-                    cents = 1200 * np.log2(key['recorded_frequency'] / key['theoretical_frequency'])
-                    key['tuning_deviation'] = round(cents, 2)
-                progress = (i + 1) / total_keys * 100
-                socketio.emit('calculation_progress', {'progress': progress})
-        
-        elif algorithm == 'copy_recording':
-            # Copy recorded frequencies
-            total_keys = len(tuner.piano_data['keys'])
-            for i, key in enumerate(tuner.piano_data['keys']):
-                if key['recorded_frequency']:
-                    key['computed_frequency'] = key['recorded_frequency']
-                    key['tuning_frequency'] = key['recorded_frequency']
-                    # Deviation is 0 since we're using recorded as target
-                    key['tuning_deviation'] = 0.0
-                else:
-                    key['computed_frequency'] = key['theoretical_frequency']
-                    key['tuning_frequency'] = key['theoretical_frequency']
-                    key['tuning_deviation'] = 0.0
-                progress = (i + 1) / total_keys * 100
-                socketio.emit('calculation_progress', {'progress': progress})
-        
-        elif algorithm == 'stretch_tuning':
-            # Simple stretch tuning (exaggerates deviations slightly)
-            total_keys = len(tuner.piano_data['keys'])
-            for i, key in enumerate(tuner.piano_data['keys']):
-                if key['recorded_frequency']:
-                    stretch_factor = 1.0 + (abs(i - 48) * 0.0001)  # Slight stretch
-                    key['computed_frequency'] = key['theoretical_frequency'] * stretch_factor
-                    key['tuning_frequency'] = key['theoretical_frequency'] * stretch_factor
-                    # Calculate deviation from recorded
-                    cents = 1200 * np.log2(key['computed_frequency'] / key['recorded_frequency'])
-                    key['tuning_deviation'] = round(cents, 2)
-                else:
-                    key['computed_frequency'] = key['theoretical_frequency']
-                    key['tuning_frequency'] = key['theoretical_frequency']
-                    key['tuning_deviation'] = 0.0
-                progress = (i + 1) / total_keys * 100
-                socketio.emit('calculation_progress', {'progress': progress})
-        
-        elif algorithm == 'inharmonicity':
-            # Inharmonicity-based tuning: optimal stretch based on measured inharmonicity
-            total_keys = len(tuner.piano_data['keys'])
-            for i, key in enumerate(tuner.piano_data['keys']):
-                inh = key.get('inharmonicity', 0.0)
-                
-                # Calculate stretch based on inharmonicity coefficient
-                # Formula based on Railsback curve and inharmonicity physics
-                # Higher inharmonicity requires more stretch
-                octaves_from_a4 = (i - 48) / 12.0
-                
-                if inh > 0:
-                    # Stretch increases with distance from A4 and inharmonicity
-                    # This is a simplified model - professional tuners use more complex formulas
-                    stretch_cents = octaves_from_a4 * (inh * 5000)  # Scale factor based on typical piano values
-                    stretch_ratio = 2 ** (stretch_cents / 1200)
-                    tuning_freq = key['theoretical_frequency'] * stretch_ratio
-                else:
-                    # No inharmonicity data, use theoretical
-                    tuning_freq = key['theoretical_frequency']
-                
-                key['computed_frequency'] = round(tuning_freq, 2)
-                key['tuning_frequency'] = round(tuning_freq, 2)
-                
-                # Calculate deviation from recorded (if available)
-                if key['recorded_frequency']:
-                    cents = 1200 * np.log2(key['recorded_frequency'] / tuning_freq)
-                    key['tuning_deviation'] = round(cents, 2)
-                else:
-                    key['tuning_deviation'] = 0.0
-                    
-                progress = (i + 1) / total_keys * 100
-                socketio.emit('calculation_progress', {'progress': progress})
-        
+        algorithm.run(tuner, progress, parameters)
+        progress.finish()
         socketio.emit('calculation_completed', {'success': True, 'data': tuner.piano_data})
         
     except Exception as e:
@@ -627,30 +1091,66 @@ def play_tone():
     
     frequency = key['computed_frequency'] if use_computed else key['theoretical_frequency']
     if frequency:
-        threading.Thread(target=play_synthesized_tone, args=(frequency,), daemon=True).start()
+        tuner.synthesizer.play_tone(key_number, frequency, **piano_tone_parameters(key, frequency))
         return jsonify({'success': True, 'frequency': frequency})
     
     return jsonify({'success': False, 'error': 'No frequency available'}), 400
 
-def play_synthesized_tone(frequency, duration=2.0):
-    """Generate and play a sine wave at the given frequency"""
-    t = np.linspace(0, duration, int(tuner.sample_rate * duration))
+@app.route('/api/play_interval', methods=['POST'])
+def play_interval():
+    """
+    Play several keys together, e.g. an octave, a fifth or a chord.
     
-    # Create a more pleasant sound with overtones
-    wave = np.sin(2 * np.pi * frequency * t)  # Fundamental
-    wave += 0.3 * np.sin(2 * np.pi * 2 * frequency * t)  # 2nd harmonic
-    wave += 0.15 * np.sin(2 * np.pi * 3 * frequency * t)  # 3rd harmonic
+    The keys start together, or one after the other spaced by 'arpeggio'
+    seconds. All voices are scheduled in one step, so that the spacing is
+    exact to the sample.
+    """
+    data = request.get_json(silent=True) or {}
+    key_numbers = data.get('key_numbers') or []
+    use_computed = data.get('use_computed', True)
+    try:
+        arpeggio = float(data.get('arpeggio', 0.0))
+        duration = float(data.get('duration', 2.0))
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'error': 'Invalid arpeggio or duration'}), 400
+    if not 0.0 < duration <= MAX_INTERVAL_DURATION:
+        return jsonify({'success': False, 'error': f'Duration must be above 0 and at most {MAX_INTERVAL_DURATION} seconds'}), 400
+    if not 0.0 <= arpeggio <= MAX_INTERVAL_ARPEGGIO:
+        return jsonify({'success': False, 'error': f'Arpeggio must be from 0 to {MAX_INTERVAL_ARPEGGIO} seconds'}), 400
     
-    # Apply envelope (fade in/out)
-    envelope = np.ones_like(t)
-    fade_samples = int(0.05 * tuner.sample_rate)
-    envelope[:fade_samples] = np.linspace(0, 1, fade_samples)
-    envelope[-fade_samples:] = np.linspace(1, 0, fade_samples)
+    num_keys = len(tuner.piano_data['keys'])
+    if not isinstance(key_numbers, list) or not all(
+            type(key_number) is int and 0 <= key_number < num_keys for key_number in key_numbers):
+        return jsonify({'success': False, 'error': f'Key numbers must be integers from 0 to {num_keys - 1}'}), 400
+    key_numbers = list(dict.fromkeys(key_numbers))  # Each key once, in the given order
+    if len(key_numbers) > MAX_INTERVAL_KEYS:
+        return jsonify({'success': False, 'error': f'At most {MAX_INTERVAL_KEYS} keys can be played together'}), 400
     
-    wave = wave * envelope * 0.3  # Scale volume
+    tones = []
+    for i, key_number in enumerate(key_numbers):
+        key = tuner.get_key(key_number)
+        if not key:
+            return jsonify({'success': False, 'error': 'Invalid key'}), 400
+        frequency = key['computed_frequency'] if use_computed else key['theoretical_frequency']
+        if not frequency:
+            return jsonify({'success': False, 'error': 'No frequency available'}), 400
+        parameters = piano_tone_parameters(key, frequency)
+        parameters.update(delay=i * arpeggio, duration=duration + (len(key_numbers) - 1 - i) * arpeggio)
+        tones.append((key_number, frequency, parameters))
     
-    sd.play(wave, tuner.sample_rate)
-    sd.wait()
+    if not tones:
+        return jsonify({'success': False, 'error': 'No keys given'}), 400
+    tuner.synthesizer.play_tones(tones)
+    return jsonify({'success': True, 'frequencies': [frequency for _, frequency, _ in tones]})
+
+def piano_tone_parameters(key, frequency):
+    """Synthesizer parameters of a key in piano timbre: measured (or typical) inharmonicity and the recorded partial amplitudes"""
+    B = key.get('inharmonicity') or float(expected_inharmonicity(frequency))
+    return {
+        'amplitudes': partial_amplitudes(key['peaks'], key['recorded_frequency'], B),
+        'B': B,
+        'envelope': piano_envelope(key['number'], tuner.piano_data['key_of_a4'])
+    }
 
 @app.route('/api/save_session', methods=['POST'])
 def save_session():
@@ -676,6 +1176,8 @@ def load_session():
     
     with open(filepath, 'r') as f:
         tuner.piano_data = json.load(f)
+    tuner.spectrum_averages = {}
+    tuner.auditory_spectra = {}
     
     socketio.emit('session_loaded', tuner.piano_data)
     return jsonify({'success': True, 'data': tuner.piano_data})
@@ -689,13 +1191,16 @@ def load_session_data():
         return jsonify({'success': False, 'error': 'No data provided'}), 400
     
     tuner.piano_data = data
+    tuner.spectrum_averages = {}
+    tuner.auditory_spectra = {}
     socketio.emit('session_loaded', tuner.piano_data)
     return jsonify({'success': True, 'data': tuner.piano_data})
 
 @socketio.on('connect')
 def handle_connect():
     """Handle client connection"""
-    emit('connected', {'mode': tuner.mode, 'piano_data': tuner.piano_data})
+    emit('connected', {'mode': tuner.mode, 'piano_data': tuner.piano_data,
+                       'sample_rate': tuner.sample_rate})
 
 def open_browser(port):
     """Open browser after a short delay"""
@@ -0,0 +1,117 @@
+"""
+Audio input
+One long-lived input stream feeding a ring buffer, shared by all recordings
+"""
+
+import threading
+import time
+
+import sounddevice as sd
+
+from ringbuffer import RingBuffer
+
+
+class AudioInput:
+    """
+    Persistent audio input.
+
+    The PortAudio stream is opened once and kept running, its callback
+    appends every block to a ring buffer. Recordings, key recognition and
+    the tuning loop slice the samples they need from the buffer instead of
+    opening a stream of their own, which avoids the start-up latency of the
+    device and dropouts in the first buffer.
+    """
+
+    def __init__(self, sample_rate, buffer_duration=10.0, block_duration=0.01):
+        self.sample_rate = sample_rate
+        self.buffer_duration = buffer_duration
+        self.block_duration = block_duration
+        self.buffer = RingBuffer(int(buffer_duration * sample_rate))
+        self.stream = None
+        self.dropouts = 0
+        self.lock = threading.Lock()
+
+    @property
+    def running(self):
+        return self.stream is not None
+
+    @property
+    def position(self):
+        """Absolute position of the next sample in the stream"""
+        return self.buffer.position
+
+    @property
+    def latency(self):
+        """Input latency of the device in seconds"""
+        return self.stream.latency if self.stream is not None else 0.0
+
+    def start(self):
+        """Open and start the stream unless it is running already"""
+        with self.lock:
+            if self.stream is not None:
+                return
+            self.buffer = RingBuffer(int(self.buffer_duration * self.sample_rate))
+            self.stream = sd.InputStream(samplerate=self.sample_rate, channels=1, dtype='float32',
+                                         blocksize=int(self.block_duration * self.sample_rate),
+                                         latency='low', callback=self._callback)
+            self.stream.start()
+
+    def stop(self):
+        """Stop and close the stream"""
+        with self.lock:
+            if self.stream is None:
+                return
+            self.stream.stop()
+            self.stream.close()
+            self.stream = None
+
+    def set_sample_rate(self, sample_rate):
+        """Change the sample rate, reopening the stream if it is running"""
+        running = self.running
+        self.stop()
+        self.sample_rate = sample_rate
+        if running:
+            self.start()
+
+    def _callback(self, indata, frames, time_info, status):
+        """Audio callback: append the block to the ring buffer"""
+        if status:
+            self.dropouts += 1
+        self.buffer.write(indata[:, 0])
+
+    def read(self, start, count, timeout=None):
+        """Samples start ... start + count - 1 of the stream, waiting for them if necessary"""
+        return self.buffer.read(start, count, timeout)
+
+    def blocks(self, block_size, timeout=1.0):
+        """Generator of (position, block) for successive blocks of block_size samples from the current position on"""
+        self.start()
+        position = self.position
+        while True:
+            yield position, self.read(position, block_size, timeout)
+            position += block_size
+
+    def record(self, duration, start=None, pressed=None):
+        """
+        Record from the stream.
+
+        Args:
+            duration: Length of the recording in seconds
+            start: Stream position of the first sample, default the current position
+            pressed: time.perf_counter() of the button press that requested the recording
+
+        Returns:
+            tuple: (audio_data, latency_ms), where latency_ms is the time from
+                   the press until the first sample of the recording was
+                   available for analysis, including the input latency of the
+                   device
+        """
+        self.start()
+        start = self.position if start is None else start
+        pressed = time.perf_counter() if pressed is None else pressed
+        count = int(duration * self.sample_rate)
+
+        if not self.buffer.wait_for(start + 1, timeout=duration + 1.0):
+            raise TimeoutError('No audio data from the input stream')
+        latency_ms = (max(self.buffer.write_time, pressed) - pressed + self.latency) * 1000
+        return self.read(start, count, timeout=duration + 1.0), latency_ms
@@ -0,0 +1,152 @@
+"""
+Auditory preprocessing
+Python port of modules/algorithms/entropyminimizer/auditorypreprocessing.cpp
+on the log-binned spectra, with the weighting curves precomputed once
+"""
+
+from functools import lru_cache
+
+import numpy as np
+from scipy import sparse
+
+from logspectrum import NUMBER_OF_BINS, index_to_frequency, frequency_to_index
+
+AUDITORY_THRESHOLD = 1e-7  # Auditory threshold intensity I0
+
+
+@lru_cache(maxsize=1)
+def dba_filter():
+    """
+    A-weighting in dB on the log bins (AuditoryPreprocessing::initializeSPLAFilter).
+
+    R_A(f) = 12200²·f⁴ / ((f² + 20.6²)·√((f² + 107.7²)(f² + 737.9²))·(f² + 12200²))
+    """
+    f2 = index_to_frequency(np.arange(NUMBER_OF_BINS)) ** 2
+    Ra = 12200.0**2 * f2**2 / (f2 + 20.6**2) / np.sqrt((f2 + 107.7**2) * (f2 + 737.9**2)) / (f2 + 12200.0**2)
+    return 2.0 + 20 * np.log10(Ra)
+
+
+@lru_cache(maxsize=1)
+def mollifier_matrix():
+    """
+    Gaussian smoothing of the log bins (AuditoryPreprocessing::applyMollifier).
+
+    Bin m is averaged over ±3·dm bins with weights exp(-(m' - m)²/dm²), where
+    dm is the width of df = 55 Hz/f + f/2000 in bins, i.e. broad in the bass
+    and about one cent in the treble. Bin 0 is left out as in the C++ code.
+
+    Returns:
+        scipy.sparse.csr_matrix: (NUMBER_OF_BINS, NUMBER_OF_BINS) row-normalized matrix
+    """
+    m = np.arange(NUMBER_OF_BINS)
+    f = index_to_frequency(m)
+    dm = np.maximum(np.round(frequency_to_index(f + 55.0 / f + f / 2000.0)).astype(int) - m, 1)
+    first = np.maximum(1, m - 3 * dm)
+    counts = np.minimum(m + 3 * dm, NUMBER_OF_BINS - 1) - first + 1
+
+    rows = np.repeat(m, counts)
+    cols = np.arange(counts.sum()) + np.repeat(first - (np.cumsum(counts) - counts), counts)
+    weights = np.exp(-((cols - rows) / dm[rows]) ** 2)
+    weights /= np.bincount(rows, weights=weights, minlength=NUMBER_OF_BINS)[rows]
+    return sparse.csr_matrix((weights, (rows, cols)), shape=(NUMBER_OF_BINS, NUMBER_OF_BINS))
+
+
+def inharmonic_partial_index(f, f1, B):
+    """Fractional partial number of the frequency f (AuditoryPreprocessing::getInharmonicPartialIndex)"""
+    x = np.asarray(f, dtype=float) / f1
+    if B <= 0:
+        return x
+    return np.sqrt(0.5 * (np.sqrt(1 + 4 * B * (1 + B) * x * x) - 1) / B)
+
+
+def clean_spectrum(spectrum, f1, B):
+    """
+    Suppress everything that is not close to an expected partial (AuditoryPreprocessing::cleanSpectrum).
+
+    The envelope |cos(π·n(f))|^(200/(f/f1)^1.5) is one at the partials and has
+    sharp peaks at the low and broader peaks at the high partials.
+    """
+    f = index_to_frequency(np.arange(len(spectrum)))
+    wave = np.abs(np.cos(np.pi * inharmonic_partial_index(f, f1, B)))
+    return spectrum * wave ** (200.0 / (f / f1) ** 1.5)
+
+
+def cut_low_frequencies(spectrum, f1):
+    """Zero all bins below 5/6 of the bin of f1 (AuditoryPreprocessing::cutLowFrequencies)"""
+    spectrum = spectrum.copy()
+    spectrum[:min(int(5 * frequency_to_index(f1)) // 6, len(spectrum))] = 0
+    return spectrum
+
+
+def convert_to_spla(spectrum):
+    """
+    A-weight the spectrum (AuditoryPreprocessing::convertToSPLA).
+
+    Lines whose A-weighted level is below the auditory threshold are removed.
+    """
+    with np.errstate(divide='ignore'):
+        spla = 10 * np.log10(spectrum / AUDITORY_THRESHOLD) + dba_filter()
+    return np.where(spla < 0, 0.0, AUDITORY_THRESHOLD * 10 ** (spla / 10))
+
+
+def convert_to_loudness(spectrum, exponent=0.3):
+    """
+    Loudness of every bin relative to the auditory threshold by Stevens' power law.
+
+    AuditoryPreprocessing::convertToLoudness is only declared in the C++ code.
+    """
+    return (np.maximum(spectrum, 0) / AUDITORY_THRESHOLD) ** exponent
+
+
+def improve_high_frequency_peaks(spectrum, f1, B, weight):
+    """
+    Replace the weak partials 2..6 of treble keys by synthetic lines
+    (AuditoryPreprocessing::improveHighFrequencyPeaks).
+
+    Args:
+        weight: Position of the key between A4 (0) and the top key (1)
+    """
+    m1 = int(np.round(frequency_to_index(f1)))
+    if f1 <= 0 or B <= 0 or weight <= 0 or not 0 <= m1 < len(spectrum):
+        return spectrum
+    spectrum = spectrum.copy()
+    intensity = spectrum[m1] * weight
+    for n in range(2, 7):
+        fn = f1 * n * np.sqrt((1 + B * n * n) / (1 + B))
+        if fn < 20 or fn > 10000:
+            continue
+        mn = int(np.round(frequency_to_index(fn)))
+        i = np.arange(max(0, mn - 10), min(mn + 11, len(spectrum)))
+        spectrum[i] = intensity * 4.0 ** -n * np.exp(-0.1 * (i - mn) ** 2)
+    return spectrum
+
+
+def preprocess_spectrum(spectrum, f1, B, treble_weight=0.0, loudness=False):
+    """
+    Auditory preprocessing of the log-binned spectrum of one key.
+
+    The stages of EntropyMinimizer::performAuditoryPreprocessing in order:
+    normalize, clean, cut low frequencies, A-weight, amend high-frequency
+    peaks and mollify. Optionally the result is converted to loudness.
+
+    Args:
+        spectrum: Log-binned power spectrum
+        f1: Recorded frequency of the key
+        B: Inharmonicity coefficient of the key
+        treble_weight: Position of the key between A4 (0) and the top key (1),
+                       zero for keys below A4
+        loudness: Convert the result to loudness
+
+    Returns:
+        np.array: Preprocessed spectrum
+    """
+    spectrum = np.asarray(spectrum, dtype=float)
+    total = np.sum(spectrum)
+    if total <= 0 or not f1 or f1 <= 0:
+        return np.zeros_like(spectrum)
+    spectrum = clean_spectrum(spectrum / total, f1, B)
+    spectrum = cut_low_frequencies(spectrum, f1)
+    spectrum = convert_to_spla(spectrum)
+    spectrum = improve_high_frequency_peaks(spectrum, f1, B, treble_weight)
+    spectrum = mollifier_matrix() @ spectrum
+    return convert_to_loudness(spectrum) if loudness else spectrum
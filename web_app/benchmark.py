@@ -0,0 +1,263 @@
+"""
+Benchmark suite for the analysis and tuning engines
+Run all benchmarks with `python benchmark.py` or a selection by name,
+e.g. `python benchmark.py zoom_spectrum`
+"""
+
+import numpy as np
+import sys
+import time
+sys.path.insert(0, '.')
+
+SAMPLE_RATE = 44100
+BENCHMARKS = {}
+
+def benchmark(func):
+    """Register a benchmark function under its name without the bench_ prefix"""
+    BENCHMARKS[func.__name__[len('bench_'):]] = func
+    return func
+
+def measure(func, repeat=5):
+    """Best wall time of repeated calls in milliseconds"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+def synthesize_key(f0, B=0.0005, duration=3.0, num_partials=10, sample_rate=SAMPLE_RATE):
+    """Decaying piano-like tone with inharmonic partials f_n = n·f_0·√(1 + B·n²)"""
+    t = np.arange(int(duration * sample_rate)) / sample_rate
+    partials = np.arange(1, num_partials + 1) * f0 * np.sqrt(1 + B * np.arange(1, num_partials + 1)**2)
+    wave = np.sum(np.sin(2 * np.pi * np.outer(partials, t)) / np.arange(1, num_partials + 1)[:, None], axis=0)
+    return wave * np.exp(-t), partials
+
+@benchmark
+def bench_zoom_spectrum(zoom_factor=16):
+    """Zoomed spectra around the partials versus a zero-padded FFT of equal resolution"""
+    from scipy.fft import rfft, rfftfreq
+    from spectrum import refine_peaks
+
+    wave, partials = synthesize_key(55.0)
+    audio_windowed = wave * np.hanning(len(wave))
+    N = len(audio_windowed)
+    bin_width = SAMPLE_RATE / N
+    coarse = np.round(partials / bin_width) * bin_width
+
+    def padded_fft():
+        magnitude = np.abs(rfft(audio_windowed, n=zoom_factor * N))
+        freqs = rfftfreq(zoom_factor * N, 1 / SAMPLE_RATE)
+        result = []
+        for f in coarse:
+            lo, hi = np.searchsorted(freqs, [f - 2 * bin_width, f + 2 * bin_width])
+            result.append(freqs[lo + np.argmax(magnitude[lo:hi])])
+        return np.array(result)
+
+    def zoomed():
+        return refine_peaks(audio_windowed, SAMPLE_RATE, coarse, zoom_factor)[0]
+
+    def error_cents(estimate):
+        return np.max(np.abs(1200 * np.log2(estimate / partials)))
+
+    print(f"   {len(partials)} partials of A1, {N / SAMPLE_RATE:.0f} s capture, "
+          f"resolution {bin_width / zoom_factor * 1000:.1f} mHz")
+    print(f"   {'Method':<28} {'Time (ms)':>10} {'Max error (cents)':>18}")
+    print(f"   {'FFT bins':<28} {'-':>10} {error_cents(coarse):>18.3f}")
+    print(f"   {'Zero-padded FFT x%d' % zoom_factor:<28} {measure(padded_fft):>10.2f} "
+          f"{error_cents(padded_fft()):>18.3f}")
+    print(f"   {'Zoomed spectrum':<28} {measure(zoomed):>10.2f} {error_cents(zoomed()):>18.3f}")
+
+@benchmark
+def bench_inharmonicity_fit(num_peaks=10):
+    """Joint f_0/B fit for all 88 keys, as rerun after every recording"""
+    from inharmonicity import fit_inharmonicity
+
+    rng = np.random.default_rng(0)
+    f0 = 440.0 * 2 ** ((np.arange(88) - 48) / 12)
+    B = 10 ** np.linspace(-3.3, -2.0, 88)
+    n = np.arange(1, num_peaks + 1)
+    peaks = n[None, :] * f0[:, None] * np.sqrt(1 + B[:, None] * n[None, :]**2)
+    peaks *= 2 ** (rng.normal(0, 0.5, peaks.shape) / 1200)
+    peaks[peaks > SAMPLE_RATE / 2] = np.nan
+
+    fit = fit_inharmonicity(peaks, f0)
+    error = np.ma.abs(fit['B'] / B - 1)
+    print(f"   88 keys x {num_peaks} peaks: {measure(lambda: fit_inharmonicity(peaks, f0)):.2f} ms, "
+          f"median relative error of B {np.ma.median(error):.1%}")
+
+@benchmark
+def bench_log_binning(duration=2.0):
+    """Log-binned spectrum of one recording: sparse matrix versus coarse graining"""
+    from keyrecognizer import coarse_grain_spectrum
+    from logspectrum import NUMBER_OF_BINS, index_to_frequency, log_binning_matrix, log_binned_spectrum
+
+    wave, _ = synthesize_key(110.0, duration=duration)
+    N = len(wave)
+    power = np.abs(np.fft.rfft(wave * np.hanning(N)))**2
+    b = N / SAMPLE_RATE
+
+    def coarse_grained():
+        return coarse_grain_spectrum(power, NUMBER_OF_BINS, lambda m: b * index_to_frequency(m))
+
+    log_binning_matrix.cache_clear()
+    start = time.perf_counter()
+    matrix = log_binning_matrix(N, SAMPLE_RATE)
+    build = (time.perf_counter() - start) * 1000
+
+    print(f"   {N} samples to {NUMBER_OF_BINS} log bins, matrix with {matrix.nnz} entries "
+          f"built in {build:.2f} ms")
+    print(f"   {'Coarse graining':<28} {measure(coarse_grained):>10.3f} ms")
+    print(f"   {'Sparse mat-vec':<28} {measure(lambda: log_binned_spectrum(power, SAMPLE_RATE, N)):>10.3f} ms")
+
+@benchmark
+def bench_noise_floor(noise=0.01):
+    """Noise floor of a 3 s capture: strided block quantile versus running median filter"""
+    from scipy import ndimage
+    from logspectrum import extract_peaks, log_binned_spectrum, noise_floor
+
+    rng = np.random.default_rng(0)
+    t = np.arange(3 * SAMPLE_RATE) / SAMPLE_RATE
+    n = np.arange(1, 21)
+    partials = n * 110.0 * np.sqrt(1 + 0.0004 * n**2)
+    wave = np.sum(np.sin(2 * np.pi * np.outer(partials, t)) / n[:, None]**2, axis=0) * np.exp(-t)
+    audio = wave + noise * rng.standard_normal(len(t))
+    spectrum = log_binned_spectrum(np.abs(np.fft.rfft(audio * np.hanning(len(audio))))**2,
+                                   SAMPLE_RATE, len(audio))
+
+    def median_filtered():
+        return np.exp(ndimage.median_filter(np.log(np.maximum(spectrum, 1e-300)), size=201, mode='nearest'))
+
+    def found(frequencies):
+        true = sum(np.any(np.abs(1200 * np.log2(frequencies / p)) < 5) for p in partials)
+        return f"{true:>3} of {len(partials)} partials, {len(frequencies) - true} spurious"
+
+    print(f"   A2 with partial amplitudes 1/n², noise {noise}")
+    print(f"   {'Method':<28} {'Time (ms)':>10}   Peaks")
+    print(f"   {'0.1 x max magnitude':<28} {'-':>10}   {found(extract_peaks(spectrum)[0])}")
+    for name, floor in [('Strided block quantile', lambda: noise_floor(spectrum)),
+                        ('Running median filter', median_filtered)]:
+        frequencies = extract_peaks(spectrum, threshold=1e-6, floor=floor())[0]
+        print(f"   {name:<28} {measure(floor):>10.3f}   {found(frequencies)}")
+
+@benchmark
+def bench_decimation(duration=2.0):
+    """Analysis of all 88 keys at the full sample rate versus decimated per register"""
+    from logspectrum import extract_peaks, log_binned_spectrum, noise_floor
+    from spectrum import decimate_for_key, decimation_factor, refine_peaks
+
+    def analyze(audio, sample_rate):
+        audio_windowed = audio * np.hanning(len(audio))
+        spectrum = log_binned_spectrum(np.abs(np.fft.rfft(audio_windowed))**2, sample_rate, len(audio))
+        frequencies, _ = extract_peaks(spectrum, threshold=1e-6, floor=noise_floor(spectrum))
+        return refine_peaks(audio_windowed, sample_rate, frequencies[:10])[0]
+
+    def decimated(audio, f0):
+        return analyze(*decimate_for_key(audio, SAMPLE_RATE, f0))
+
+    print(f"   {'Keys':<10} {'Factor':>7} {'Full (ms)':>10} {'Decimated (ms)':>15} {'f1 change (cents)':>18}")
+    totals = np.zeros(2)
+    for first in range(0, 88, 12):
+        keys = range(first, min(first + 12, 88))
+        times, errors = np.zeros(2), []
+        for key in keys:
+            f0 = 440.0 * 2 ** ((key - 48) / 12)
+            audio, partials = synthesize_key(f0, duration=duration, num_partials=int(min(20, 10000 // f0)))
+            times += [measure(lambda: analyze(audio, SAMPLE_RATE), repeat=3),
+                      measure(lambda: decimated(audio, f0), repeat=3)]
+            full, reduced = analyze(audio, SAMPLE_RATE), decimated(audio, f0)
+            f1 = [f[np.argmin(np.abs(f - partials[0]))] for f in (full, reduced)]
+            errors.append(abs(1200 * np.log2(f1[1] / f1[0])))
+        totals += times
+        factors = [decimation_factor(440.0 * 2 ** ((key - 48) / 12), SAMPLE_RATE) for key in keys]
+        print(f"   {f'{keys[0]}-{keys[-1]}':<10} {f'{max(factors)}-{min(factors)}':>7} {times[0]:>10.2f} "
+              f"{times[1]:>15.2f} {max(errors):>18.4f}")
+    print(f"   {'All':<10} {'':>7} {totals[0]:>10.2f} {totals[1]:>15.2f}")
+
+@benchmark
+def bench_reference_tone(block_size=256):
+    """Preparing and mixing a piano reference tone with and without the wavetable cache"""
+    from synthesizer import Synthesizer, piano_envelope
+
+    synth = Synthesizer(SAMPLE_RATE, block_size=block_size)
+    amplitudes = 1.0 / np.arange(1, 17)
+
+    def prepare():
+        return synth.make_voice(30, 130.8, amplitudes=amplitudes, B=4e-4, envelope=piano_envelope(30))
+
+    def first_play(repeat=5):
+        """Best time of make_voice on a cache miss, excluding the rendering in the background"""
+        best = float('inf')
+        for _ in range(repeat):
+            synth.wavetables.clear()
+            start = time.perf_counter()
+            prepare()
+            best = min(best, time.perf_counter() - start)
+            synth.wavetables.wait()
+        return best * 1000
+
+    def mix(voice, blocks=100):
+        voice.clock = 0
+        out = np.zeros(block_size)
+        for _ in range(blocks):
+            voice.render(out, synth.work, SAMPLE_RATE)
+
+    oscillator = prepare()
+    synth.wavetables.wait()
+    voice = prepare()
+    table = voice.wavetable.base
+    print(f"   C3 with 16 partials, {len(voice.wavetable) / SAMPLE_RATE:.2f} s of a "
+          f"{len(table) / SAMPLE_RATE:.2f} s table ({table.nbytes / 1024:.0f} kB)")
+    print(f"   {'Step':<34} {'Time (ms)':>10}")
+    print(f"   {'Prepare, first play':<34} {first_play():>10.3f}")
+    print(f"   {'Render table (background)':<34} {measure(lambda: voice.tabulate(len(table), SAMPLE_RATE)):>10.3f}")
+    print(f"   {'Prepare, repeated play':<34} {measure(prepare):>10.3f}")
+    print(f"   {'Mix 100 blocks, oscillators':<34} {measure(lambda: mix(oscillator)):>10.3f}")
+    print(f"   {'Mix 100 blocks, wavetable':<34} {measure(lambda: mix(voice)):>10.3f}")
+
+@benchmark
+def bench_pitch_raise():
+    """Pitch-raise curve as cumulative sums over octaves versus the per-key recurrence of PitchRaise"""
+    from pitchraise import pitch_raise_curve, regression_inharmonicity
+
+    K, a4 = 88, 48
+    measured = np.full(K, np.nan)
+    measured[::6] = 10 ** np.interp(np.arange(K)[::6], [0, 27, 28, 87], [-3.3, -3.8, -3.9, -2.0])
+
+    def per_key():
+        B = regression_inharmonicity(measured)
+        cents = lambda k, n: 600.0 / np.log(2) * np.log((1 + n * n * B[k]) / (1 + B[k]))
+        pitch = np.zeros(K)
+        a3, a5 = a4 - 12, a4 + 12
+        pitch_a5 = 0.5 * cents(a4, 3) + 0.5 * cents(a4, 2)
+        pitch_a3 = cents(a4, 2) - cents(a3, 4)
+        for k in range(a3, a4):
+            pitch[k] = pitch_a3 * (a4 - k) / 12.0
+        for k in range(a4 + 1, a5 + 1):
+            pitch[k] = pitch_a5 * (k - a4) / 12.0
+        for k in range(a5 + 1, K):
+            pitch[k] = (0.3 * (pitch[k - 12] + cents(k - 12, 4) - cents(k, 2))
+                        + 0.7 * (pitch[k - 12] + cents(k - 12, 2)))
+        for k in range(a3 - 1, -1, -1):
+            fraction = k / a3
+            pitch[k] = (fraction * (pitch[k + 12] + cents(k + 12, 2) - cents(k, 4))
+                        + (1 - fraction) * (pitch[k + 12] + cents(k + 12, 5) - cents(k, 10)))
+        return pitch
+
+    def vectorized():
+        return pitch_raise_curve(regression_inharmonicity(measured), a4)
+
+    difference = np.max(np.abs(per_key() - vectorized()))
+    print(f"   88 keys, every sixth recorded, curve from {vectorized()[0]:.1f} to {vectorized()[-1]:.1f} cents")
+    print(f"   {'Method':<28} {'Time (ms)':>10}")
+    print(f"   {'Per-key recurrence':<28} {measure(per_key):>10.3f}")
+    print(f"   {'Cumulative sums':<28} {measure(vectorized):>10.3f}")
+    print(f"   Max difference {difference:.2e} cents")
+
+if __name__ == '__main__':
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        print("=" * 70)
+        print(f"Benchmark: {name}")
+        print("=" * 70)
+        BENCHMARKS[name]()
@@ -0,0 +1,170 @@
+"""
+Inharmonicity
+Batched least-squares fit of the inharmonic partial series of piano strings
+"""
+
+import numpy as np
+
+
+def _solve(frequencies, partials):
+    """
+    Linear least-squares fit of (f_n/n)² = f_0² + f_0²·B·n² for every row.
+
+    Returns:
+        tuple: (f0, B) as masked arrays, masked where the fit is undetermined
+    """
+    x = partials ** 2
+    y = (frequencies / partials) ** 2
+    x = np.ma.masked_where(np.ma.getmaskarray(y), x)
+    y = np.ma.masked_where(np.ma.getmaskarray(x), y)
+
+    mean_x = x.mean(axis=1)
+    mean_y = y.mean(axis=1)
+    dx = x - mean_x[:, None]
+    Sxx = (dx * dx).sum(axis=1)
+    Sxy = (dx * (y - mean_y[:, None])).sum(axis=1)
+
+    slope = Sxy / np.ma.masked_less_equal(Sxx, 0)
+    intercept = np.ma.masked_less_equal(mean_y - slope * mean_x, 0)
+    return np.ma.sqrt(intercept), slope / intercept
+
+
+def fit_inharmonicity(peak_frequencies, reference_frequencies, max_partial=20):
+    """
+    Fit f_n = n·f_0·√(1 + B·n²) jointly for f_0 and B, for all keys at once.
+
+    Partial numbers are first estimated relative to the reference frequency,
+    where only the low partials (n <= 10) are trusted. They are then
+    reassigned with the fitted model, so that strongly inharmonic high
+    partials are not attributed to the wrong n.
+
+    Args:
+        peak_frequencies: (keys, peaks) array of partial frequencies; missing
+                          peaks are masked, NaN or <= 0
+        reference_frequencies: (keys,) approximate fundamental of each key
+        max_partial: Highest partial number taken into account
+
+    Returns:
+        dict of (keys,) masked arrays:
+            'f0': fitted fundamental,
+            'B': inharmonicity coefficient,
+            'residual': RMS deviation of the partials from the fit in cents,
+            'partials': number of partials used in the fit
+        Keys whose partials do not determine a fit are masked.
+    """
+    f = np.ma.masked_invalid(np.ma.array(peak_frequencies, dtype=float, ndmin=2))
+    f = np.ma.masked_less_equal(f, 0)
+    reference = np.ma.masked_less_equal(np.ma.masked_invalid(
+        np.ma.array(reference_frequencies, dtype=float, ndmin=1)), 0)
+
+    n = np.ma.masked_outside(np.ma.round(f / reference[:, None]), 1, max_partial)
+    f0, B = _solve(f, np.ma.masked_greater(n, 10))
+    f0_all, B_all = _solve(f, n)
+    undetermined = np.ma.getmaskarray(B)
+    f0 = np.ma.where(undetermined, f0_all, f0)
+    B = np.ma.where(undetermined, B_all, B)
+
+    for _ in range(2):
+        # Reassign partial numbers: n² = 2r / (1 + √(1 + 4·B·r)) with r = (f/f_0)²
+        r = (f / f0[:, None]) ** 2
+        n_squared = 2 * r / (1 + np.ma.sqrt(1 + 4 * np.ma.maximum(B, 0)[:, None] * r))
+        refined = np.ma.masked_outside(np.ma.round(np.ma.sqrt(n_squared)), 1, max_partial)
+        n = np.ma.where(np.ma.getmaskarray(refined), n, refined)
+        f0, B = _solve(f, n)
+
+    model = n * f0[:, None] * np.ma.sqrt(1 + B[:, None] * n ** 2)
+    deviation = 1200 * np.ma.log2(f / model)
+    residual = np.ma.sqrt((deviation ** 2).mean(axis=1))
+    residual = np.ma.masked_where(np.ma.getmaskarray(B), residual)
+
+    return {
+        'f0': f0,
+        'B': B,
+        'residual': residual,
+        'partials': np.ma.masked_where(np.ma.getmaskarray(B), deviation.count(axis=1)),
+    }
+
+
+def expected_inharmonicity(frequency):
+    """Typical inharmonicity of a piano string of the given frequency (Piano::getExpectedInharmonicity)"""
+    f = np.asarray(frequency, dtype=float)
+    return np.where(f > 100, np.exp(-15.45 + 1.354 * np.log(f)), np.exp(-2.622 - 1.431 * np.log(f)))
+
+
+def extrapolate_inharmonicity(measured, key_of_a4=48, concert_pitch=440.0):
+    """
+    Complete a set of measured inharmonicity coefficients for all keys.
+
+    From eight keys below A4 upwards the strings are of the same kind, so that
+    log(B) grows linearly with the key index. As in
+    AuditoryPreprocessing::extrapolateInharmonicity this line is fitted
+    progressively from the measured keys; missing values, and measured values
+    deviating by more than 20% from the line once it is established, are
+    replaced by the fit. Below that, where the wound bass strings break the
+    linear law, the expected inharmonicity curve is scaled to the measured
+    keys, with the scale factor interpolated logarithmically between them.
+
+    Args:
+        measured: (keys,) measured B, NaN or <= 0 where unknown
+        key_of_a4: Index of A4
+        concert_pitch: Frequency of A4 in Hz
+
+    Returns:
+        np.array: Inharmonicity coefficient of every key
+    """
+    measured = np.nan_to_num(np.asarray(measured, dtype=float), nan=0.0)
+    num_keys = len(measured)
+    keys = np.arange(num_keys)
+    expected = expected_inharmonicity(concert_pitch * 2 ** ((keys - key_of_a4) / 12))
+    B = measured.copy()
+
+    firstkey = max(0, key_of_a4 - 8)
+    K = Y = KK = KY = N = BE = 0.0
+    for k in range(firstkey, num_keys):
+        if N > 1:
+            a = (N * KY - K * Y) / (N * KK - K * K)
+            b = (KK * Y - K * KY) / (N * KK - K * K)
+            BE = np.exp(a * k + b)
+        valid = measured[k] > 0
+        if valid and BE > 0 and N > 5 and abs(np.log(measured[k] / BE)) > 0.2:
+            valid = False
+        if valid:
+            y = np.log(measured[k])
+            K += k
+            Y += y
+            KK += k * k
+            KY += k * y
+            N += 1
+        else:
+            if BE == 0:
+                BE = expected[k]
+            B[k] = BE
+
+    # Bass section: scale the expected curve to the measured keys
+    anchors = [k for k in range(firstkey) if measured[k] > 0]
+    if firstkey < num_keys:
+        anchors.append(firstkey)
+    bass = keys[:firstkey]
+    if anchors:
+        log_ratio = np.log(B[anchors] / expected[anchors])
+        B[:firstkey] = expected[:firstkey] * np.exp(np.interp(bass, anchors, log_ratio))
+    else:
+        B[:firstkey] = expected[:firstkey]
+    B[:firstkey][measured[:firstkey] > 0] = measured[:firstkey][measured[:firstkey] > 0]
+
+    return B
+
+
+def synthetic_partial_ratios(B, num_partials=5):
+    """
+    Frequency ratios f_n/f_1 = n·√((1 + B·n²)/(1 + B)) of the first partials.
+
+    Args:
+        B: (keys,) inharmonicity coefficients
+
+    Returns:
+        np.array: (keys, num_partials) partial ratios
+    """
+    B = np.asarray(B, dtype=float)[:, None]
+    n = np.arange(1, num_partials + 1)[None, :]
+    return n * np.sqrt((1 + B * n**2) / (1 + B))
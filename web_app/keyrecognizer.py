@@ -0,0 +1,221 @@
+"""
+Key Recognizer
+Python port of modules/core/analyzers/keyrecognizer.cpp: recognizes the
+struck piano key from a power spectrum without a prior key selection
+"""
+
+import numpy as np
+from scipy.fft import rfft, irfft
+
+
+def coarse_grain_spectrum(X, M, f):
+    """
+    Map a distribution X[x] onto M bins Y[y] by means of a (possibly nonlinear)
+    index function x = f(y), preserving the sum over all components.
+
+    Vectorized version of MathTools::coarseGrainSpectrum. Bin y collects the
+    content of X between the fractional indices f(y - 0.5) and f(y + 0.5).
+
+    Args:
+        X: Linearly binned spectrum
+        M: Number of target bins
+        f: Vectorized function mapping target index to source index
+
+    Returns:
+        np.array: Coarse grained spectrum of length M
+    """
+    X = np.asarray(X, dtype=float)
+    edges = f(np.arange(M + 1) - 0.5)
+    x = np.floor(edges + 0.5).astype(int)
+    x[0] = max(0, x[0])
+    x[1:] = np.minimum(x[1:], len(X) - 1)
+
+    cumulative = np.cumsum(X)
+    areas = (x - edges + 0.5) * X[x]
+    inner = np.where(x[1:] > x[:-1], cumulative[x[1:]] - cumulative[x[:-1]], 0.0)
+    return inner + areas[:-1] - areas[1:]
+
+
+class KeyRecognizer:
+    """
+    Fast recognition of the pressed key.
+
+    The power spectrum is binned logarithmically (constructLogSpec), converted
+    to decibels and flattened (signalPreprocessing), and then convolved with a
+    kernel that has positive peaks at the expected partials and negative peaks
+    at the partials of wrong keys (defineKernel). The position of the maximal
+    response gives the frequency estimate (estimateFrequency).
+    """
+
+    M = 1024          # Number of logarithmic bins
+    FMIN = 20.0       # Frequency of bin 0
+    FMAX = 10000.0    # Frequency of bin M-1
+
+    _kernel_fft = None  # FFT of the kernel, shared by all instances
+
+    def __init__(self, num_keys=88, key_of_a4=48, concert_pitch=440.0):
+        self.num_keys = num_keys
+        self.key_of_a4 = key_of_a4
+        self.concert_pitch = concert_pitch
+        if KeyRecognizer._kernel_fft is None:
+            KeyRecognizer._kernel_fft = self.define_kernel()
+
+    def ftom(self, f):
+        """Convert frequency to log spectrum index"""
+        return (0.5 + self.M * np.log(np.asarray(f) / self.FMIN)
+                / np.log(self.FMAX / self.FMIN)).astype(int)
+
+    def mtof(self, m):
+        """Convert log spectrum index to frequency (inverse of ftom)"""
+        return self.FMIN * (self.FMAX / self.FMIN) ** (np.asarray(m) / self.M)
+
+    def equal_temperament_frequency(self, key_number):
+        """Equal temperament frequency of a key at the current concert pitch"""
+        return self.concert_pitch * 2 ** ((key_number - self.key_of_a4) / 12)
+
+    def recognize_key(self, power_spectrum, sample_rate, selected_key=None, key_forced=False):
+        """
+        Recognize the key from a power spectrum.
+
+        Args:
+            power_spectrum: |rfft|² of the recorded signal
+            sample_rate: Sampling rate of the signal in Hz
+            selected_key: Currently selected key, used as a hint (optional)
+            key_forced: If True, only search in the vicinity of selected_key
+
+        Returns:
+            tuple: (key_index, frequency), key_index is -1 if no key was found
+        """
+        power_spectrum = np.asarray(power_spectrum, dtype=float)
+        if len(power_spectrum) < 2 or not np.any(power_spectrum > 0):
+            return -1, 0.0
+
+        if key_forced and selected_key is not None:
+            f = self.detect_forced_frequency(power_spectrum, sample_rate, selected_key)
+        else:
+            f = self.detect_frequency_in_treble(power_spectrum, sample_rate)
+
+        if f == 0:
+            log_spec = self.construct_log_spec(power_spectrum, sample_rate)
+            flat_spectrum = self.signal_preprocessing(log_spec, selected_key, key_forced)
+            f = self.estimate_frequency(flat_spectrum)
+
+        return self.find_nearest_key(f), float(f)
+
+    def detect_forced_frequency(self, fft, sample_rate, selected_key):
+        """Search the maximum of the spectrum within a bit less than a half tone of a forced key"""
+        n = len(fft)
+        f = self.equal_temperament_frequency(selected_key)
+        q1 = max(0, int(round(2 * n * f / 1.04 / sample_rate)))
+        q2 = min(int(round(2 * n * f * 1.04 / sample_rate)), n - 1)
+        if q2 < q1:
+            return f
+        q = q1 + int(np.argmax(fft[q1:q2 + 1]))
+        return sample_rate * q / (2 * n)
+
+    def detect_frequency_in_treble(self, fft, sample_rate):
+        """
+        Detect keys in the very high treble, where the kernel method fails.
+
+        A high key is recognized by the ratio of the second and first moment of
+        the spectrum. In that case the frequency is the maximal peak between
+        1 and 4.5 kHz, otherwise 0 is returned.
+        """
+        threshold = 0.09
+        n = len(fft)
+        q1, q2, q3 = (int(round(2 * n * f / sample_rate)) for f in (20, 1000, 4500))
+        if n <= 0 or q1 < 0 or q3 >= n:
+            return 0
+        q = np.arange(q1, q3 + 1)
+        m1 = np.dot(fft[q1:q3 + 1], q)
+        m2 = np.dot(fft[q1:q3 + 1], q * q)
+        if m1 <= 0 or m2 / m1 / n <= threshold:
+            return 0
+        return sample_rate * (q2 + int(np.argmax(fft[q2:q3]))) / (2 * n)
+
+    def construct_log_spec(self, fft, sample_rate):
+        """Map the linear power spectrum to M logarithmic bins"""
+        Q = len(fft)
+        scale = 2 * self.FMIN * Q / sample_rate
+        ratio = self.FMAX / self.FMIN
+        return coarse_grain_spectrum(fft, self.M, lambda m: scale * ratio ** (m / self.M))
+
+    def signal_preprocessing(self, log_spec, selected_key=None, key_forced=False):
+        """
+        Convert the log spectrum to decibels and flatten the noise background
+        by adding a gliding RMS average, centering the spectrum around zero.
+        A selected (but not forced) key slightly boosts its own spectral line.
+        """
+        norm = np.sum(log_spec)
+        if norm <= 0:
+            return np.zeros(self.M)
+        dB = 10 * np.log10(np.maximum(log_spec / norm, 1e-30))
+
+        # Gliding RMS over the window [i-w, i]
+        w = 30
+        cumulative = np.concatenate(([0.0], np.cumsum(dB * dB)))
+        i = np.arange(self.M)
+        a = np.maximum(0, i - w)
+        rms = np.sqrt((cumulative[i + 1] - cumulative[a]) / (i + 1 - a))
+        flat_spectrum = np.maximum(0.0, dB + rms - 5)
+
+        if selected_key is not None and selected_key >= 0 and not key_forced:
+            f = self.equal_temperament_frequency(selected_key)
+            m1, m2 = int(self.ftom(f * 0.93)), int(self.ftom(f * 1.07))
+            if 0 <= m1 <= m2 <= self.M:
+                flat_spectrum[:m1] *= 0.75
+                flat_spectrum[m1:m2] *= 1.2
+
+        return flat_spectrum
+
+    def define_kernel(self):
+        """
+        Define the recognition kernel and return its Fourier transform.
+
+        The kernel has positive peaks where the partials of a key are expected
+        and negative peaks at the partials of keys an octave, a fifth or a
+        fourth below, which would otherwise produce false matches.
+        """
+        M = self.M
+        width = M // 300
+        partials = 20
+        B = 0.0
+        kernel = np.zeros(M)
+        offsets = np.arange(-width, width + 1)
+
+        def setpeak(m, amplitude):
+            kernel[(m + offsets + M) % M] = amplitude * (width - np.abs(offsets))
+
+        def partial(n):
+            return n * np.sqrt((1 + B * n * n) / (1 + B))
+
+        def partialindex(n, div):
+            return int(self.ftom(self.FMIN * partial(n) / partial(div)))
+
+        def intensity(n):
+            return n ** -0.3
+
+        for div in range(2, 5):
+            for n in range(1, 31):
+                if n % div > 0 and n > div - 2:
+                    setpeak(partialindex(n, div), -0.3 * intensity(n))
+
+        for n in range(1, partials + 1):
+            setpeak(partialindex(n, 1), intensity(n))
+
+        return rfft(kernel)
+
+    def estimate_frequency(self, flat_spectrum):
+        """Correlate the flattened spectrum with the kernel and return the best matching frequency"""
+        convolution = irfft(rfft(flat_spectrum) * np.conj(self._kernel_fft), self.M)
+        return float(self.mtof(int(np.argmax(convolution))))
+
+    def find_nearest_key(self, f):
+        """Most likely key for a frequency, assuming an average stretch; -1 if none"""
+        if self.concert_pitch <= 390 or self.concert_pitch > 500 or f <= 0:
+            return -1
+        d = 17.3123 * np.log(f / self.concert_pitch)
+        c = (0.000019394 + 0.079694594 * d - 0.003718646 * d * d
+             + 0.000450934 * d ** 3 + 0.000003724 * d ** 4)
+        k = int(self.key_of_a4 + d - c / 100 + 0.5)
+        return k if 0 <= k < self.num_keys else -1
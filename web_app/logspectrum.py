@@ -0,0 +1,169 @@
+"""
+Logarithmically binned spectra
+The 1-cent spectrum grid of the EPT (Key::NumberOfBins) and averaging of repeated strikes
+"""
+
+from functools import lru_cache
+
+import numpy as np
+from scipy import signal, sparse
+
+NUMBER_OF_BINS = 10800   # 9 octaves of 1200 cents (Key::NumberOfBins)
+BINS_PER_OCTAVE = 1200
+FMIN = 20.601722         # Frequency of bin 0 in Hz (Key::fmin)
+MAX_STRIKE_DEVIATION = 5.0  # Cents a strike may deviate from the mean of the earlier ones
+
+
+def index_to_frequency(m):
+    """Frequency of the (fractional) log bin m (Key::IndexToFrequency)"""
+    return FMIN * 2 ** (np.asarray(m, dtype=float) / BINS_PER_OCTAVE)
+
+
+def frequency_to_index(f):
+    """Fractional log bin of the frequency f (Key::FrequencyToRealIndex)"""
+    return BINS_PER_OCTAVE * np.log2(np.asarray(f, dtype=float) / FMIN)
+
+
+@lru_cache(maxsize=32)
+def log_binning_matrix(fft_size, sample_rate, exponent=0.25):
+    """
+    Sparse matrix mapping a linear power spectrum onto the logarithmic bins.
+
+    Row m collects the linear bins between the fractional band edges
+    q = fft_size / sample_rate · f(m ± 1/2), with the partially covered bins
+    at both edges weighted by their overlap, as in
+    MathTools::coarseGrainSpectrum. The row is weighted with (q₁·q₂)^exponent.
+    The matrix is built once per FFT length and sample rate.
+
+    Returns:
+        scipy.sparse.csr_matrix: (NUMBER_OF_BINS, fft_size // 2 + 1) matrix
+    """
+    num_linear = fft_size // 2 + 1
+    edges = fft_size / sample_rate * index_to_frequency(np.arange(NUMBER_OF_BINS + 1) - 0.5)
+    x = np.clip(np.floor(edges + 0.5).astype(int), 0, num_linear - 1)
+    x1, x2 = x[:-1], x[1:]
+    areas = (x - edges + 0.5)
+    rows = np.arange(NUMBER_OF_BINS)
+
+    # Bins x1 + 1 ... x2 are covered completely
+    counts = x2 - x1
+    inner_rows = np.repeat(rows, counts)
+    inner_cols = np.arange(counts.sum()) + np.repeat(x1 + 1 - (np.cumsum(counts) - counts), counts)
+
+    matrix = sparse.coo_matrix(
+        (np.concatenate([np.ones(len(inner_rows)), areas[:-1], -areas[1:]]),
+         (np.concatenate([inner_rows, rows, rows]), np.concatenate([inner_cols, x1, x2]))),
+        shape=(NUMBER_OF_BINS, num_linear)).tocsr()
+    return sparse.diags((edges[:-1] * edges[1:]) ** exponent) @ matrix
+
+
+def log_binned_spectrum(power_spectrum, sample_rate, fft_size, exponent=0.25):
+    """
+    Map a linear power spectrum onto the logarithmic bins.
+
+    Python version of FFTAnalyzer::constructLogBinnedSpectrum, computed as
+    one sparse matrix-vector product with the cached log_binning_matrix and
+    normalized to unit sum.
+
+    Args:
+        power_spectrum: |X|² of an rfft of length fft_size
+        sample_rate: Sampling rate in Hz
+        fft_size: Number of samples of the transformed signal
+        exponent: Exponent of the frequency weighting
+
+    Returns:
+        np.array: Normalized spectrum of NUMBER_OF_BINS log bins
+    """
+    spectrum = log_binning_matrix(fft_size, sample_rate, exponent) @ np.asarray(power_spectrum, dtype=float)
+    total = np.sum(spectrum)
+    return spectrum / total if total > 0 else spectrum
+
+
+def noise_floor(spectrum, block_size=200, quantile=0.5):
+    """
+    Estimate the local noise floor of a log-binned spectrum.
+
+    The spectrum is split into blocks of block_size bins (one sixth of an
+    octave by default) in a single strided pass. The quantile of the log
+    power in each block is taken as the floor at the block center, and the
+    floor is interpolated linearly in between. Spectral lines cover only a
+    small part of a block, so they hardly shift the quantile.
+
+    Returns:
+        np.array: Noise floor for every bin, in the units of the spectrum
+    """
+    spectrum = np.asarray(spectrum, dtype=float)
+    num_blocks = max(1, len(spectrum) // block_size)
+    block_size = len(spectrum) // num_blocks
+    log_power = np.log(np.maximum(spectrum[:num_blocks * block_size], 1e-300))
+    levels = np.quantile(log_power.reshape(num_blocks, block_size), quantile, axis=1)
+    centers = (np.arange(num_blocks) + 0.5) * block_size - 0.5
+    return np.exp(np.interp(np.arange(len(spectrum)), centers, levels))
+
+
+def extract_peaks(spectrum, threshold=0.01, floor=None, snr_db=15.0):
+    """
+    Find the spectral lines in a log-binned spectrum.
+
+    Local maxima above threshold times the maximum and, if a noise floor is
+    given, also snr_db above the local floor, are located with
+    sub-bin accuracy by a parabola through the logarithm of the peak bin and
+    its neighbours. Where a linear FFT bin spans several log bins its content
+    forms a step; maxima rising less than half their height above such a
+    step are not counted as separate lines.
+
+    Returns:
+        tuple: (frequencies, powers) of the peaks in ascending frequency
+    """
+    spectrum = np.asarray(spectrum, dtype=float)
+    if len(spectrum) < 3 or np.max(spectrum) <= 0:
+        return np.zeros(0), np.zeros(0)
+
+    height = np.max(spectrum) * threshold
+    if floor is not None:
+        height = np.maximum(height, np.asarray(floor, dtype=float) * 10 ** (snr_db / 10))
+    m, properties = signal.find_peaks(spectrum, height=height, prominence=0)
+    m = m[(properties['prominences'] > 0.5 * properties['peak_heights'])
+          & (m > 0) & (m < len(spectrum) - 1)]
+    y0, y1, y2 = (np.log(np.maximum(spectrum[m + i], 1e-300)) for i in (-1, 0, 1))
+    curvature = y0 - 2 * y1 + y2
+    offset = np.where(curvature < 0, 0.5 * (y0 - y2) / np.where(curvature < 0, curvature, 1), 0.0)
+    return index_to_frequency(m + np.clip(offset, -0.5, 0.5)), spectrum[m]
+
+
+class SpectrumAverage:
+    """
+    Running mean of the log-binned spectra of repeated strikes of one key.
+
+    The mean is updated incrementally, mean_k = mean_(k-1) + (x_k - mean_(k-1)) / k,
+    so that neither the audio nor the individual spectra have to be kept.
+    frequency is the fundamental found in the mean, set by the caller; a
+    strike that does not match it belongs to a new tuning of the key.
+    """
+
+    def __init__(self):
+        self.spectrum = None
+        self.count = 0
+        self.frequency = None
+
+    def reset(self):
+        """Discard the strikes averaged so far"""
+        self.spectrum = None
+        self.count = 0
+        self.frequency = None
+
+    def matches(self, spectrum, max_deviation=MAX_STRIKE_DEVIATION):
+        """Whether the spectrum of a strike has a line within max_deviation cents of the fundamental of the mean"""
+        if self.frequency is None:
+            return True
+        frequencies, _ = extract_peaks(spectrum, threshold=1e-6, floor=noise_floor(spectrum))
+        return len(frequencies) > 0 and np.min(np.abs(1200 * np.log2(frequencies / self.frequency))) <= max_deviation
+
+    def add(self, spectrum):
+        """Add the spectrum of one strike and return the updated mean"""
+        self.count += 1
+        if self.spectrum is None:
+            self.spectrum = np.array(spectrum, dtype=float)
+        else:
+            self.spectrum += (spectrum - self.spectrum) / self.count
+        return self.spectrum
@@ -0,0 +1,85 @@
+"""
+Onset detection
+Finds the hammer strike in a recording and selects the sustain window for analysis
+"""
+
+import numpy as np
+
+MIN_SUSTAIN_DURATION = 0.2  # Shortest sustain window that is analyzed, in seconds
+MIN_SUSTAIN_PERIODS = 20    # ... and in periods of the fundamental of the key
+
+
+def detect_onset(audio_data, sample_rate, frame_duration=0.01, rise_db=20.0, min_level=1e-3):
+    """
+    Detect the hammer strike in a recording.
+
+    The signal energy is computed in short frames. A strike is present if the
+    loudest frame rises at least rise_db above the background (the quietest
+    10% of the frames) and above min_level RMS. The onset is the start of
+    the rise, i.e. the first frame after the last frame before the peak that
+    is still within rise_db / 2 of the background.
+
+    Args:
+        audio_data: Recorded signal
+        sample_rate: Sampling rate in Hz
+        frame_duration: Length of the energy frames in seconds
+        rise_db: Minimal rise of the peak above the background in dB
+        min_level: Minimal RMS level of the peak
+
+    Returns:
+        tuple: (onset_sample, strength_db) where onset_sample is None if no
+               strike was found and strength_db is the rise of the peak
+               above the background in dB
+    """
+    audio_data = np.asarray(audio_data, dtype=float).ravel()
+    frame_size = max(1, int(frame_duration * sample_rate))
+    num_frames = len(audio_data) // frame_size
+    if num_frames < 2:
+        return None, 0.0
+
+    energy = np.mean(audio_data[:num_frames * frame_size].reshape(num_frames, frame_size) ** 2, axis=1)
+    background = max(np.percentile(energy, 10), 1e-20)
+    peak = int(np.argmax(energy))
+    strength_db = 10 * np.log10(max(energy[peak], 1e-20) / background)
+
+    if strength_db < rise_db or energy[peak] < min_level ** 2:
+        return None, float(strength_db)
+
+    quiet = np.flatnonzero(energy[:peak] < background * 10 ** (rise_db / 20))
+    onset_frame = quiet[-1] + 1 if len(quiet) else 0
+    return onset_frame * frame_size, float(strength_db)
+
+
+def min_sustain_duration(key_frequency=None):
+    """
+    Shortest sustain window in seconds that resolves the partials of a key:
+    MIN_SUSTAIN_PERIODS periods of its fundamental, at least MIN_SUSTAIN_DURATION.
+    """
+    if not key_frequency:
+        return MIN_SUSTAIN_DURATION
+    return max(MIN_SUSTAIN_DURATION, MIN_SUSTAIN_PERIODS / key_frequency)
+
+
+def sustain_window(audio_data, sample_rate, onset_sample, attack_duration=0.05, sustain_duration=2.0,
+                   min_duration=0.0):
+    """
+    Cut the sustain part of a key stroke out of a recording.
+
+    Args:
+        audio_data: Recorded signal
+        sample_rate: Sampling rate in Hz
+        onset_sample: Sample index of the hammer strike
+        attack_duration: Length of the attack transient skipped after the onset, in seconds
+        sustain_duration: Maximal length of the window in seconds
+        min_duration: Minimal length of the window in seconds
+
+    Returns:
+        np.array: The samples of the sustain window, None if the strike is too
+                  late in the recording for min_duration seconds of sustain
+    """
+    start = onset_sample + int(attack_duration * sample_rate)
+    end = start + int(sustain_duration * sample_rate)
+    window = audio_data[start:end]
+    if len(window) < max(1, int(min_duration * sample_rate)):
+        return None
+    return window
@@ -0,0 +1,123 @@
+"""
+Overpull
+Python port of modules/core/analyzers/overpull.cpp: soundboard response to a pitch raise as one matrix
+"""
+
+from functools import lru_cache
+
+import numpy as np
+
+DEFAULT_KEYS_ON_BASS_BRIDGE = 28  # Piano::DEFAULT_KEYS_ON_BASS_BRIDGE
+MAX_GAP = 7                       # Most consecutive unmeasured keys for an overpull estimate
+MIN_AVERAGE_DEVIATION = 5.0       # Overpull only for pianos this many cents off on average
+
+# Geometry in mm: speaking length of the treble strings at the left and right
+# end, of the bass strings, non-speaking length, distances from the bridge to
+# the frame at the left and right end, and shift between bass and treble bridge
+PIANO_GEOMETRY = {
+    'grand': dict(SL=1200, SR=50, SB=1250, SN=100, DL=500, DR=30, shift=3),
+    'upright': dict(SL=1200, SR=50, SB=1200, SN=100, DL=450, DR=50, shift=10),
+}
+
+
+@lru_cache(maxsize=8)
+def interaction_matrix(num_keys=88, num_bass_keys=DEFAULT_KEYS_ON_BASS_BRIDGE, piano_type='grand',
+                       average_pull=0.22):
+    """
+    Response of every string to the raise of every other string
+    (OverpullEstimator::computeInteractionMatrix).
+
+    R[j, k] is the number of cents string j falls if string k is raised by
+    one cent. 80% of the response stems from the deflection of the
+    soundboard, modelled as a bar loaded along the bridge, weighted with the
+    number of strings per key and divided by the string length. The other
+    20% is a Gaussian bridge tilt. The matrix is computed once per piano
+    configuration.
+
+    Returns:
+        np.array: Read-only (num_keys, num_keys) response matrix
+    """
+    if piano_type not in PIANO_GEOMETRY:
+        raise ValueError(f'Unknown piano type: {piano_type}')
+    K, B = num_keys, num_bass_keys
+    if K <= 0 or B <= 0 or B >= K:
+        raise ValueError('Invalid number of keys')
+    g = PIANO_GEOMETRY[piano_type]
+    SL, SR, SB, SN, DL, DR, shift = (g[name] for name in ('SL', 'SR', 'SB', 'SN', 'DL', 'DR', 'shift'))
+
+    # Approximate speaking length of the treble strings
+    G = -(2 ** (-1 / 12) * (-(SL * 2 ** (1 / 12 + B / 12)) + K * SL * 2 ** (1 / 12 + B / 12)
+                            - B * SR * 2 ** (K / 12)) / (1 + B - K))
+    H = (SL * 2 ** (1 + B / 12) - SR * 2 ** (11 / 12 + K / 12)) / (1 + B - K) / 2
+    keys = np.arange(K)
+    string_length = (G + H * keys) * 2 ** (-keys / 12)
+
+    # Approximate arc length along the treble bridge, unison distance 13.6 mm
+    arc = np.zeros(K)
+    arc[B] = DL
+    arc[B + 1:] = DL + np.cumsum(np.sqrt(13.6 ** 2 + np.diff(string_length[B:]) ** 2))
+    L = arc[-1] + DR
+
+    # Symmetric deflection of a bar, the bass section copied onto the treble bridge
+    position = np.where(keys < B, keys + B + int(shift), keys)
+    x = arc[np.minimum.outer(position, position)]
+    b = L - arc[np.maximum.outer(position, position)]
+    epsilon = b / L * x * (L * L - x * x - b * b)
+
+    # Number of strings and their length
+    unison = np.where(keys < 8, 1, np.where(keys < B, 2, 3))
+    length = np.where(keys < B, SB, string_length) + SN
+    R = unison[None, :] * epsilon / length[:, None]
+
+    p = 0.8  # weight of the soundboard deformation
+    R *= p * average_pull / (R.sum() / K)
+
+    # Bridge tilt
+    sigma = 20.0
+    average_string = (B / SB + np.sum(1.0 / string_length[B:])) / K
+    prefactor = average_pull * (1 - p) / np.sqrt(2 * 3.141) / sigma / average_string / 0.7
+    same_bridge = (keys[:, None] < B) == (keys[None, :] < B)
+    tilt = prefactor * np.exp(-0.5 * np.subtract.outer(keys, keys) ** 2 / sigma ** 2)
+    R += np.where(same_bridge, tilt / np.where(keys < B, SB, string_length)[:, None], 0.0)
+
+    R.setflags(write=False)
+    return R
+
+
+def overpull(R, current, target):
+    """
+    Overpull of all keys in one matrix-vector product (OverpullEstimator::getOverpull).
+
+    The deviation of every measured key from its target in cents is weighted
+    with the number of keys it represents: itself and the unmeasured keys
+    below it, the highest measured key also those above it. The overpull is
+    the fall these deviations cause, with opposite sign.
+
+    Args:
+        R: Interaction matrix
+        current: Measured frequencies, NaN or 0 for unmeasured keys
+        target: Target frequencies
+
+    Returns:
+        np.array: Overpull in cents for every key, zero if more than MAX_GAP
+                  consecutive keys are unmeasured or the piano is on average
+                  less than MIN_AVERAGE_DEVIATION cents off
+    """
+    current = np.asarray(current, dtype=float)
+    target = np.asarray(target, dtype=float)
+    K = len(current)
+    with np.errstate(invalid='ignore'):
+        measured = np.flatnonzero((current > 20) & (current < 20000) & (target > 20) & (target < 20000))
+    if len(measured) == 0:
+        return np.zeros(K)
+    gaps = np.diff(measured, prepend=-1) - 1
+    trailing = K - 1 - measured[-1]
+    if np.max(gaps) > MAX_GAP or trailing > MAX_GAP:
+        return np.zeros(K)
+
+    deviation = 1200 * np.log2(current[measured] / target[measured])
+    weights = deviation * (gaps + 1)
+    weights[-1] += deviation[-1] * trailing
+    if abs(np.sum(weights) / K) <= MIN_AVERAGE_DEVIATION:
+        return np.zeros(K)
+    return -R[:, measured] @ weights
@@ -0,0 +1,100 @@
+"""
+Pitch raise
+Python port of modules/algorithms/pitchraise: approximate tuning curve for a piano far below pitch
+"""
+
+import numpy as np
+
+from overpull import DEFAULT_KEYS_ON_BASS_BRIDGE
+
+
+def regression_inharmonicity(measured, num_bass_keys=DEFAULT_KEYS_ON_BASS_BRIDGE):
+    """
+    Inharmonicity of all keys by linear regression of -log(B) over the key
+    index, separately on the bass and the treble bridge.
+
+    Args:
+        measured: Measured inharmonicity of every key, NaN or 0 if unmeasured
+
+    Returns:
+        np.array: Estimated inharmonicity of every key
+
+    Raises:
+        ValueError: If fewer than two keys are measured on one of the bridges
+    """
+    measured = np.asarray(measured, dtype=float)
+    keys = np.arange(len(measured))
+    bass = keys < num_bass_keys
+    with np.errstate(invalid='ignore'):
+        valid = measured > 1e-10
+    estimated = np.empty(len(measured))
+    for section, name in ((bass, 'bass'), (~bass, 'treble')):
+        fit = valid & section
+        if np.count_nonzero(fit) < 2:
+            raise ValueError(f'At least two keys on the {name} bridge have to be recorded')
+        slope, intercept = np.polyfit(keys[fit], -np.log(measured[fit]), 1)
+        estimated[section] = np.exp(-(intercept + slope * keys[section]))
+    return estimated
+
+
+def _extend(pitch, increments, start):
+    """Fill pitch[start:] by pitch[k] = pitch[k - 12] + increments[k], one cumulative sum per octave column"""
+    count = len(pitch) - start
+    if count <= 0:
+        return
+    rows = -(-count // 12)
+    steps = np.zeros(rows * 12)
+    steps[:count] = increments[start:]
+    pitch[start:] = (pitch[start - 12:start] + np.cumsum(steps.reshape(rows, 12), axis=0)).ravel()[:count]
+
+
+def pitch_raise_curve(inharmonicity, key_of_a4=48):
+    """
+    Tuning curve of the pitch raise in cents from equal temperament
+    (PitchRaise::algorithmWorkerFunction).
+
+    The curve is linear between A3 and A5, with A3 chosen for a pure 4:2
+    octave to A4 and A5 for a mixed 2:1/3:2 octave. Above A5 every key is
+    tuned 30% to the 4:2 and 70% to the 2:1 octave of the key below it,
+    below A3 the weight moves from the 4:2 to the 10:5 octave towards the
+    bass. Both extensions are linear recurrences over octaves, evaluated as
+    cumulative sums over all keys at once.
+
+    Args:
+        inharmonicity: Inharmonicity coefficient of every key
+
+    Returns:
+        np.array: Deviation of every key from equal temperament in cents
+    """
+    B = np.asarray(inharmonicity, dtype=float)
+    K = len(B)
+    if key_of_a4 <= 13 or K - key_of_a4 <= 13:
+        raise ValueError('The pitch raise needs two octaves on both sides of A4')
+
+    def cents(keys, n):
+        """Stretch of the n-th partial of the keys in cents"""
+        return 600.0 / np.log(2) * np.log((1 + n * n * B[keys]) / (1 + B[keys]))
+
+    a3, a4, a5 = key_of_a4 - 12, key_of_a4, key_of_a4 + 12
+    pitch_a5 = 0.5 * cents(a4, 3) + 0.5 * cents(a4, 2)
+    pitch_a3 = cents(a4, 2) - cents(a3, 4)
+
+    pitch = np.zeros(K)
+    pitch[a3:a4] = pitch_a3 * (a4 - np.arange(a3, a4)) / 12.0
+    pitch[a4 + 1:a5 + 1] = pitch_a5 * (np.arange(a4 + 1, a5 + 1) - a4) / 12.0
+
+    # Treble: pitch[k] = pitch[k - 12] + 0.3·(4:2 octave) + 0.7·(2:1 octave)
+    k = np.arange(a5 + 1, K)
+    increments = np.zeros(K)
+    increments[k] = 0.3 * (cents(k - 12, 4) - cents(k, 2)) + 0.7 * cents(k - 12, 2)
+    _extend(pitch, increments, a5 + 1)
+
+    # Bass, extended downwards on the reversed curve: 4:2 near A3, 10:5 at the bottom
+    k = np.arange(a3)
+    fraction = k / a3
+    increments = np.zeros(K)
+    increments[k] = (fraction * (cents(k + 12, 2) - cents(k, 4))
+                     + (1 - fraction) * (cents(k + 12, 5) - cents(k, 10)))
+    reversed_pitch = pitch[::-1].copy()
+    _extend(reversed_pitch, increments[::-1], K - a3)
+    return reversed_pitch[::-1]
@@ -0,0 +1,91 @@
+"""
+Progress reporter
+Rate-limited calculation progress, after Algorithm::showCalculationProgress in modules/core/calculation
+"""
+
+import threading
+import time
+
+MAX_PROGRESS_RATE = 10.0  # Progress events per second
+
+
+class ProgressReporter:
+    """
+    Reports the progress of a calculation as 'calculation_progress' events.
+
+    Updates arriving faster than max_rate are coalesced: the latest one is
+    kept and delivered by a timer when the next update is due, so that a
+    callback per key or per optimizer generation costs at most max_rate
+    messages per second, and the last update of a burst arrives even if
+    the calculation then stays silent for a long step. Completion (100%)
+    is always delivered at once, and only once. Events are emitted under
+    the lock, so that they arrive in order.
+    Every event carries the estimated remaining time in seconds, from the
+    rate observed since the reporter was created.
+    """
+
+    def __init__(self, emit, max_rate=MAX_PROGRESS_RATE, event='calculation_progress', clock=time.monotonic):
+        self.emit = emit
+        self.interval = 1.0 / max_rate if max_rate > 0 else 0.0
+        self.event = event
+        self.clock = clock
+        self.start_time = clock()
+        self.last_time = None     # Time of the latest delivered event
+        self.pending = None       # Latest coalesced, undelivered update
+        self.finished = False
+        self.timer = None         # Delivers the pending update on the trailing edge
+        self.lock = threading.RLock()
+
+    def eta(self, progress, now=None):
+        """Remaining seconds extrapolated from the observed rate, None before any progress"""
+        if progress >= 100.0:
+            return 0.0
+        elapsed = (self.clock() if now is None else now) - self.start_time
+        if progress <= 0 or elapsed <= 0:
+            return None
+        return round(elapsed * (100.0 - progress) / progress, 1)
+
+    def __call__(self, progress, message=''):
+        """Report progress in percent; returns True if an event was emitted"""
+        progress = min(max(float(progress), 0.0), 100.0)
+        with self.lock:
+            if self.finished:
+                return False
+            now = self.clock()
+            self.pending = {'progress': progress, 'message': message, 'eta': self.eta(progress, now)}
+            if progress < 100.0 and self.last_time is not None and now - self.last_time < self.interval:
+                if self.timer is None:
+                    self.timer = threading.Timer(self.last_time + self.interval - now, self._trailing_edge)
+                    self.timer.daemon = True
+                    self.timer.start()
+                return False
+            self.finished = progress >= 100.0
+            self._deliver(now)
+        return True
+
+    def flush(self):
+        """Deliver a coalesced update regardless of the rate"""
+        with self.lock:
+            if self.pending is None or self.finished:
+                return False
+            self._deliver(self.clock())
+        return True
+
+    def _trailing_edge(self):
+        with self.lock:
+            # A timer that was cancelled while waiting for the lock must not deliver early
+            if self.timer is threading.current_thread():
+                self.timer = None
+                self.flush()
+
+    def _deliver(self, now):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        self.last_time = now
+        data, self.pending = self.pending, None
+        self.emit(self.event, data)
+
+    def finish(self, message=''):
+        """Report completion unless it has been reported already"""
+        return self(100.0, message)
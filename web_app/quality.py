@@ -0,0 +1,42 @@
+"""
+Recording quality
+Scores a recording from its spectral SNR, partial-fit residual and onset clarity
+"""
+
+import numpy as np
+
+from logspectrum import noise_floor
+
+
+def spectral_snr(spectrum):
+    """Level of the strongest line above the local noise floor in dB"""
+    spectrum = np.asarray(spectrum, dtype=float)
+    if len(spectrum) == 0 or np.max(spectrum) <= 0:
+        return 0.0
+    floor = np.maximum(noise_floor(spectrum), 1e-300)
+    return float(10 * np.log10(np.max(spectrum / floor)))
+
+
+def recording_quality(snr_db, residual_cents, onset_db):
+    """
+    Quality of a recording between 0 and 1.
+
+    Plays the role of FFTAnalyzer::estimateQuality. Three partial scores are
+    combined by their geometric mean, so that a single bad one pulls the
+    quality down:
+        SNR: 0 at 10 dB, 1 from 40 dB on
+        fit: 1 / (1 + (residual / 2 cents)²), 0.5 if the partials could not be fitted
+        onset: 0 at a rise of 20 dB, 1 from 40 dB on
+
+    Args:
+        snr_db: Level of the strongest line above the noise floor
+        residual_cents: RMS deviation of the partials from the inharmonicity fit, or None
+        onset_db: Rise of the key stroke above the background
+
+    Returns:
+        float: Quality between 0 (unusable) and 1 (clean)
+    """
+    snr_score = np.clip((snr_db - 10.0) / 30.0, 0.0, 1.0)
+    fit_score = 0.5 if residual_cents is None else 1.0 / (1.0 + (residual_cents / 2.0) ** 2)
+    onset_score = np.clip((onset_db - 20.0) / 20.0, 0.0, 1.0)
+    return float((snr_score * fit_score * onset_score) ** (1.0 / 3.0))
@@ -0,0 +1,65 @@
+"""
+Ring buffer
+Audio samples addressed by their absolute position in a continuous stream
+"""
+
+import threading
+import time
+
+import numpy as np
+
+
+class RingBuffer:
+    """
+    Ring buffer of audio samples.
+
+    A single writer (the audio callback) appends blocks. Every sample keeps
+    the absolute position it had in the stream, so that readers can slice
+    any of the last capacity samples and wait for samples that have not
+    arrived yet.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.data = np.zeros(capacity, dtype=np.float32)
+        self.position = 0        # Number of samples written so far
+        self.write_time = None   # time.perf_counter() of the latest write
+        self.condition = threading.Condition()
+
+    def write(self, samples):
+        """Append a block of samples, overwriting the oldest ones"""
+        samples = np.asarray(samples, dtype=np.float32).ravel()
+        written = len(samples)
+        samples = samples[-self.capacity:]
+        n = len(samples)
+        start = (self.position + written - n) % self.capacity
+        first = min(n, self.capacity - start)
+        self.data[start:start + first] = samples[:first]
+        self.data[:n - first] = samples[first:]
+        with self.condition:
+            self.position += written
+            self.write_time = time.perf_counter()
+            self.condition.notify_all()
+
+    def wait_for(self, position, timeout=None):
+        """Wait until the sample before position has been written; False on timeout"""
+        with self.condition:
+            return self.condition.wait_for(lambda: self.position >= position, timeout)
+
+    def read(self, start, count, timeout=None):
+        """
+        Copy count samples starting at the absolute position start.
+
+        Waits for samples that have not been written yet.
+
+        Raises:
+            TimeoutError: If the samples do not arrive within timeout seconds
+            ValueError: If the samples have already been overwritten
+        """
+        if not self.wait_for(start + count, timeout):
+            raise TimeoutError('No audio data from the input stream')
+        index = np.arange(start, start + count) % self.capacity
+        samples = self.data[index]
+        if start < self.position - self.capacity:
+            raise ValueError('Audio data has been overwritten, the reader is too slow')
+        return samples
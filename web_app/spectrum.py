@@ -0,0 +1,134 @@
+"""
+Spectrum helpers
+Zoomed spectra for resolving partials far below the FFT bin width
+"""
+
+from functools import lru_cache
+
+import numpy as np
+from scipy import signal
+
+ANALYSIS_PARTIALS = 64      # Number of partials analyzed per key
+MIN_ANALYSIS_BAND = 2000.0  # Lowest band limit in Hz
+MAX_ANALYSIS_BAND = 10548.0 # Upper end of the log-binned spectrum in Hz
+
+
+@lru_cache(maxsize=32)
+def hann_window(length):
+    """
+    Hann window of the given length, cached per length.
+
+    The window lengths follow from the sample rate, so every rate in use
+    gets its own entries. The returned array is read-only.
+    """
+    window = signal.windows.hann(length)
+    window.flags.writeable = False
+    return window
+
+
+def zoom_spectrum(audio_windowed, sample_rate, frequencies):
+    """
+    Evaluate the Fourier transform of a (windowed) signal at arbitrary frequencies.
+
+    This is a batched Goertzel / direct DFT. The sample index is split as
+    n = a·L + b with L ≈ √N, so that e^(-iωn) = e^(-iωaL)·e^(-iωb). The inner
+    sum over b is one matrix product for all frequencies at once and only
+    F·(L + N/L) complex exponentials are needed instead of F·N.
+
+    Args:
+        audio_windowed: Signal (already windowed)
+        sample_rate: Sampling rate in Hz
+        frequencies: Frequencies in Hz at which the spectrum is evaluated
+
+    Returns:
+        np.array: Complex spectrum at the requested frequencies, in the same
+                  units as rfft of the signal
+    """
+    x = np.asarray(audio_windowed, dtype=float)
+    frequencies = np.asarray(frequencies, dtype=float)
+    N = len(x)
+    L = max(1, int(np.ceil(np.sqrt(N))))
+    A = -(-N // L)
+
+    blocks = np.zeros(A * L)
+    blocks[:N] = x
+    blocks = blocks.reshape(A, L)
+
+    omega = 2 * np.pi * frequencies.ravel() / sample_rate
+    angles = np.outer(np.arange(L), omega)
+    inner = blocks @ np.cos(angles) - 1j * (blocks @ np.sin(angles))
+    outer = np.exp(-1j * np.outer(np.arange(A) * L, omega))
+    return np.sum(inner * outer, axis=0).reshape(frequencies.shape)
+
+
+def zoom_bands(audio_windowed, sample_rate, center_frequencies, half_width, points_per_band):
+    """
+    Compute densely sampled magnitude spectra in narrow bands.
+
+    Args:
+        audio_windowed: Signal (already windowed)
+        sample_rate: Sampling rate in Hz
+        center_frequencies: Band centers in Hz
+        half_width: Half width of each band in Hz
+        points_per_band: Number of frequencies per band
+
+    Returns:
+        tuple: (frequencies, magnitudes), both of shape (bands, points_per_band)
+    """
+    centers = np.asarray(center_frequencies, dtype=float)
+    offsets = np.linspace(-half_width, half_width, points_per_band)
+    frequencies = centers[:, None] + offsets[None, :]
+    return frequencies, np.abs(zoom_spectrum(audio_windowed, sample_rate, frequencies))
+
+
+def refine_peaks(audio_windowed, sample_rate, peak_frequencies, zoom_factor=16):
+    """
+    Refine coarse FFT peaks by zooming into ±2 FFT bins around each of them.
+
+    The band is sampled zoom_factor times denser than the FFT bins, which
+    matches the resolution of an FFT zero-padded to zoom_factor·N samples
+    at a fraction of its cost.
+
+    Returns:
+        tuple: (frequencies, magnitudes) of the refined peaks
+    """
+    if len(peak_frequencies) == 0:
+        return np.zeros(0), np.zeros(0)
+    bin_width = sample_rate / len(audio_windowed)
+    frequencies, magnitudes = zoom_bands(audio_windowed, sample_rate, peak_frequencies,
+                                         2 * bin_width, 4 * zoom_factor + 1)
+    best = np.argmax(magnitudes, axis=1)
+    rows = np.arange(len(best))
+    return frequencies[rows, best], magnitudes[rows, best]
+
+
+def decimation_factor(key_frequency, sample_rate, max_factor=16):
+    """
+    Integer decimation factor for the analysis of a key.
+
+    The band needed for a key reaches up to its ANALYSIS_PARTIALS-th partial,
+    at least MIN_ANALYSIS_BAND and at most the top of the log-binned spectrum.
+    The factor is the largest one whose Nyquist frequency still lies 5%
+    above the band limit.
+    """
+    if not key_frequency or key_frequency <= 0:
+        return 1
+    band_limit = min(MAX_ANALYSIS_BAND, max(MIN_ANALYSIS_BAND, ANALYSIS_PARTIALS * key_frequency))
+    return int(np.clip(sample_rate // (2 * 1.05 * band_limit), 1, max_factor))
+
+
+def decimate_for_key(audio_data, sample_rate, key_frequency):
+    """
+    Low-pass filter and decimate a recording to the band needed for a key.
+
+    Bass keys need only a few kHz, so their FFTs shrink by up to the
+    decimation factor. Since the duration is kept, the frequency resolution
+    in Hz is unchanged.
+
+    Returns:
+        tuple: (audio_data, sample_rate) after polyphase decimation
+    """
+    factor = decimation_factor(key_frequency, sample_rate)
+    if factor == 1:
+        return audio_data, sample_rate
+    return signal.resample_poly(audio_data, 1, factor), sample_rate / factor
@@ -0,0 +1,142 @@
+"""
+Stroboscope
+Python port of modules/core/audio/recorder/stroboscope.cpp: demodulates the
+PCM stream at the expected partial frequencies for a stroboscopic tuning indicator
+"""
+
+import threading
+
+import numpy as np
+
+
+class Stroboscope:
+    """
+    Stroboscopic tuning indicator.
+
+    The PCM data is organized in frames of samples_per_frame samples. Each
+    frame is convolved with complex numbers rotating at the expected partial
+    frequencies, giving one complex number per partial that encodes the
+    intensity of the partial and its phase shift. A partial that is in tune
+    keeps a constant phase from frame to frame, a mistuned partial drifts.
+
+    Unlike the C++ version, which rotates the phases sample by sample, all
+    samples of a frame and all partials are processed in one matrix product
+    with a rotation table that is precomputed once per set of frequencies.
+    """
+
+    AMPLITUDE_DAMPING = 0.95  # Damping of the normalizing amplitude level per frame (0...1)
+    FRAME_DAMPING = 0.5       # Damping of the complex phases from frame to frame (0...1)
+
+    def __init__(self, sample_rate=44100):
+        self.sample_rate = sample_rate
+        self.active = False
+        self.samples_per_frame = sample_rate // 2
+        self.sample_counter = 0
+        self.max_amplitude = 1e-21
+        self.frequencies = np.zeros(0)
+        self.complex_phase = np.zeros(0, dtype=complex)
+        self.mean_complex_phase = np.zeros(0, dtype=complex)
+        self.previous_frame = None
+        self.rotation_cos = np.zeros((0, 0))
+        self.rotation_sin = np.zeros((0, 0))
+        self.lock = threading.Lock()
+
+    def start(self):
+        """Start the stroboscope"""
+        self.active = True
+
+    def stop(self):
+        """Stop the stroboscope"""
+        self.active = False
+
+    def set_frames_per_second(self, fps):
+        """Set the number of frames per second (setFramesPerSecond)"""
+        with self.lock:
+            self.samples_per_frame = int(self.sample_rate / fps)
+            self._update_rotation_table()
+
+    def set_frequencies(self, frequencies):
+        """Set the frequencies of the partials to be analyzed (setFrequencies)"""
+        with self.lock:
+            self.frequencies = np.asarray(frequencies, dtype=float)
+            self.complex_phase = np.ones(len(self.frequencies), dtype=complex)
+            self.mean_complex_phase = np.zeros(len(self.frequencies), dtype=complex)
+            self.previous_frame = None
+            self._update_rotation_table()
+
+    def _update_rotation_table(self):
+        """Precompute the rotation of each partial over the samples of a frame"""
+        omega = 2 * np.pi * self.frequencies / self.sample_rate
+        angles = np.outer(np.arange(1, self.samples_per_frame + 2), omega)
+        self.rotation_cos = np.cos(angles)
+        self.rotation_sin = np.sin(angles)
+
+    def push_raw_data(self, data):
+        """
+        Push raw PCM data to the stroboscope (pushRawData).
+
+        Args:
+            data: Array of PCM samples
+
+        Returns:
+            list: One array of normalized complex phases (one per partial)
+                  for every frame completed by this packet
+        """
+        frames = []
+        if not self.active:
+            return frames
+
+        with self.lock:
+            if len(self.frequencies) == 0:
+                return frames
+            data = np.asarray(data, dtype=float).ravel()
+
+            # Samples are ignored as long as nothing but silence has been heard
+            if self.max_amplitude < 1e-20:
+                audible = np.flatnonzero(np.abs(data) >= 1e-20)
+                data = data[audible[0]:] if len(audible) else data[:0]
+
+            while len(data) > 0:
+                # Samples up to and including the one closing the frame
+                n = min(len(data), self.sample_counter + 1)
+                segment, data = data[:n], data[n:]
+
+                # Running maximum as seen by each sample
+                amplitude = np.maximum.accumulate(np.maximum(np.abs(segment), self.max_amplitude))
+                self.max_amplitude = amplitude[-1]
+
+                weights = segment / amplitude
+                projection = weights @ self.rotation_cos[:n] + 1j * (weights @ self.rotation_sin[:n])
+                self.mean_complex_phase += projection * self.complex_phase
+                self.complex_phase *= self.rotation_cos[n - 1] + 1j * self.rotation_sin[n - 1]
+                self.sample_counter -= n
+
+                if self.sample_counter < 0:
+                    self.complex_phase /= np.abs(self.complex_phase)
+                    frames.append(self.mean_complex_phase / (0.5 * self.samples_per_frame / (1 - self.FRAME_DAMPING)))
+                    self.mean_complex_phase *= self.FRAME_DAMPING
+                    self.max_amplitude *= self.AMPLITUDE_DAMPING
+                    self.sample_counter = self.samples_per_frame
+
+        return frames
+
+    def readout(self, frame):
+        """
+        Convert a frame of complex phases into per-partial readouts.
+
+        The phase drift between consecutive frames is converted into the
+        deviation of the partial from its expected frequency in cents.
+
+        Returns:
+            list: {'frequency', 'amplitude', 'phase', 'drift_cents'} per partial
+        """
+        drift = np.zeros(len(frame))
+        if self.previous_frame is not None and len(self.previous_frame) == len(frame):
+            # The reference rotates with +f, so a sharp partial turns the phase backwards
+            phase_step = np.angle(frame * np.conj(self.previous_frame))
+            delta_f = -phase_step * self.sample_rate / (2 * np.pi * (self.samples_per_frame + 1))
+            drift = 1200 * np.log2(np.maximum(self.frequencies + delta_f, 1e-9) / self.frequencies)
+        self.previous_frame = frame
+
+        return [{'frequency': float(f), 'amplitude': float(a), 'phase': float(p), 'drift_cents': float(d)}
+                for f, a, p, d in zip(self.frequencies, np.abs(frame), np.angle(frame), drift)]
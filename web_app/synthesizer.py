@@ -0,0 +1,601 @@
+"""
+Synthesizer
+Python port of modules/core/audio/player/synthesizer.cpp: voices mixed in the callback of one output stream
+"""
+
+import os
+import re
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+
+import numpy as np
+import sounddevice as sd
+
+from auditory import inharmonic_partial_index
+from inharmonicity import synthetic_partial_ratios
+
+CUTOFF_VOLUME = 1e-5           # Released voices below this level are removed (Synthesizer::CutoffVolume)
+HARMONIC_AMPLITUDES = (1.0, 0.3, 0.15)
+PIANO_PARTIALS = 16            # Partials of a synthesized piano tone
+WAVETABLE_CACHE_SIZE = 64 * 2**20  # Memory cap of the wavetable cache in bytes
+MAX_WAVETABLE_DURATION = 6.0   # Length of the wavetables in seconds, longer tones continue from the oscillators
+DRONE_AMPLITUDES = (1.0, 0.5, 0.25, 0.125)
+HAMMER_KNOCK_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                 '..', 'modules', 'core', 'audio', 'player', 'hammerknock.h')
+
+
+@lru_cache(maxsize=1)
+def hammer_knock_fft():
+    """
+    Fourier data of the hammer knock (Synthesizer::mHammerKnockFFT).
+
+    Parsed once from hammerknock.h of the C++ player.
+
+    Returns:
+        np.array: (4, n) real and imaginary parts of the left and right channel,
+                  empty if the header cannot be found
+    """
+    try:
+        with open(HAMMER_KNOCK_FILE) as f:
+            text = f.read()
+    except OSError:
+        return np.zeros((4, 0))
+    lists = re.findall(r'\{([^{}]*)\}', text[text.index('mHammerKnockFFT'):])
+    return np.array([np.array(values.split(','), dtype=float) for values in lists[:4]])
+
+
+@lru_cache(maxsize=4)
+def hammer_knock(sample_rate):
+    """
+    One second of hammer noise at the given sample rate (Synthesizer::open).
+
+    The spectrum of both channels is transformed back with the scaling of the
+    C++ code, damped by exp(-(3t)^1.5) and mixed down to mono.
+
+    Returns:
+        np.array: Read-only float32 waveform, empty without the Fourier data
+    """
+    data = hammer_knock_fft()
+    size = min(sample_rate // 2 + 1, data.shape[1])
+    if size == 0:
+        return np.zeros(0, dtype=np.float32)
+    spectrum = np.zeros((2, sample_rate // 2 + 1), dtype=complex)
+    spectrum[:, :size] = data[0::2, :size] - 1j * data[1::2, :size]
+    wave = 0.15 * np.fft.irfft(spectrum, sample_rate).mean(axis=0)
+    wave *= np.exp(-(np.arange(sample_rate) * 3.0 / sample_rate) ** 1.5)
+    wave = wave.astype(np.float32)
+    wave.setflags(write=False)
+    return wave
+
+
+def partial_amplitudes(peaks, f1, B, num_partials=PIANO_PARTIALS):
+    """
+    Relative amplitudes of the partials 1 ... num_partials from recorded peaks.
+
+    Every peak is assigned to the nearest inharmonic partial of f1. Partials
+    without a peak are silent; without any peaks the amplitudes fall off as 1/n.
+
+    Args:
+        peaks: List of {'frequency', 'magnitude'} of the recording
+        f1: Recorded frequency of the key
+        B: Inharmonicity coefficient
+
+    Returns:
+        np.array: Amplitudes normalized to a maximum of one
+    """
+    amplitudes = np.zeros(num_partials)
+    if peaks and f1:
+        frequencies = np.array([peak['frequency'] for peak in peaks])
+        magnitudes = np.array([peak['magnitude'] for peak in peaks])
+        n = np.round(inharmonic_partial_index(frequencies, f1, B)).astype(int)
+        valid = (n >= 1) & (n <= num_partials)
+        np.maximum.at(amplitudes, n[valid] - 1, magnitudes[valid])
+    if np.max(amplitudes) <= 0:
+        return 1.0 / np.arange(1, num_partials + 1)
+    return amplitudes / np.max(amplitudes)
+
+
+def piano_envelope(key_number, key_of_a4=48):
+    """
+    Envelope mimicking the decay of a piano string (SoundGenerator::handleMidiKeypress).
+
+    Treble keys more than 22 keys above A4 have no dampers and ring out
+    with their decay rate.
+    """
+    decay = 1.0 / 6 if key_number <= 12 else key_number ** 1.43 / 210
+    release = decay if key_number - key_of_a4 >= 22 else 30.0
+    return Envelope(attack=40.0, decay=decay, sustain=0.0, release=release, hammer=1.0)
+
+
+class Envelope:
+    """
+    ADSR envelope of a voice (struct Envelope).
+
+    The attack rises linearly in 1/attack seconds, the decay approaches the
+    sustain level exponentially with rate decay, and after the release the
+    level falls exponentially with rate release. hammer is the intensity of
+    the hammer knock added at the start.
+    """
+
+    def __init__(self, attack=20.0, decay=0.0, sustain=1.0, release=20.0, hammer=0.0):
+        self.attack = attack
+        self.decay = decay
+        self.sustain = sustain
+        self.release = release
+        self.hammer = hammer
+
+    def level(self, t, out=None):
+        """Level at the increasing times t in seconds after the start, before the release, computed into out if given"""
+        attack_time = 1.0 / self.attack if self.attack > 0 else 0.0
+        out = np.empty(np.shape(t)) if out is None else out
+        np.subtract(t, attack_time, out=out)
+        np.maximum(out, 0.0, out=out)
+        out *= -self.decay
+        np.exp(out, out=out)
+        out *= 1.0 - self.sustain
+        out += self.sustain
+        if attack_time > 0 and t.flat[0] < attack_time:
+            out *= np.minimum(t / attack_time, 1.0)
+        return out
+
+    def duration(self, release_time=None):
+        """Seconds until the level has fallen below CUTOFF_VOLUME, inf if it never does"""
+        attack_time = 1.0 / self.attack if self.attack > 0 else 0.0
+        durations = [np.inf]
+        if self.decay > 0 and self.sustain < CUTOFF_VOLUME:
+            durations.append(attack_time + np.log(1.0 / CUTOFF_VOLUME) / self.decay)
+        if release_time is not None and self.release > 0:
+            level = float(self.level(np.array(release_time)))
+            durations.append(release_time + max(np.log(level / CUTOFF_VOLUME), 0.0) / self.release)
+        return min(durations)
+
+
+class WavetableCache:
+    """
+    Least recently used cache of rendered waveforms.
+
+    Tables are stored as read-only float32 arrays. When the total size
+    exceeds max_bytes, the least recently used tables are evicted. Missing
+    tables can be rendered on a background thread (prepare), so that the
+    caller does not wait for them.
+    """
+
+    def __init__(self, max_bytes=WAVETABLE_CACHE_SIZE):
+        self.max_bytes = max_bytes
+        self.tables = OrderedDict()
+        self.pending = {}  # key -> thread rendering the table
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def lookup(self, key):
+        """The table stored under key, None if it is missing"""
+        with self.lock:
+            table = self.tables.get(key)
+            if table is None:
+                self.misses += 1
+                return None
+            self.tables.move_to_end(key)
+            self.hits += 1
+            return table
+
+    def get(self, key, render):
+        """The table stored under key, computed by render() and stored if it is missing"""
+        table = self.lookup(key)
+        if table is None:
+            table = self._store(key, render())
+        return table
+
+    def prepare(self, key, render):
+        """Compute a missing table by render() on a background thread, unless it is already being computed"""
+        with self.lock:
+            if key in self.tables or key in self.pending:
+                return
+            thread = threading.Thread(target=self._render, args=(key, render), daemon=True)
+            self.pending[key] = thread
+        thread.start()
+
+    def wait(self, timeout=None):
+        """Wait for the tables being rendered in the background"""
+        with self.lock:
+            threads = list(self.pending.values())
+        for thread in threads:
+            thread.join(timeout)
+
+    def _render(self, key, render):
+        try:
+            self._store(key, render())
+        finally:
+            with self.lock:
+                self.pending.pop(key, None)
+
+    def _store(self, key, table):
+        table = np.asarray(table, dtype=np.float32)
+        table.setflags(write=False)
+        with self.lock:
+            if key not in self.tables:
+                self.tables[key] = table
+                self.nbytes += table.nbytes
+            table = self.tables[key]
+            while self.nbytes > self.max_bytes and len(self.tables) > 1:
+                _, evicted = self.tables.popitem(last=False)
+                self.nbytes -= evicted.nbytes
+        return table
+
+    def clear(self):
+        with self.lock:
+            self.tables.clear()
+            self.nbytes = 0
+
+
+class Voice:
+    """
+    A sounding key (struct Tone).
+
+    The waveform is a bank of partials with the given frequencies and
+    amplitudes, all computed at once as one matrix of phases. Phase and
+    envelope are closed functions of the clock, the number of samples played
+    so far, so that every block is computed without state carried from
+    sample to sample. A precomputed wavetable of the partials replaces the
+    oscillators as far as it reaches. An optional attack transient is added
+    unenveloped. Blocks are computed in scratch buffers of the voice, which
+    make_voice allocates for the block size of the stream, so that the
+    audio callback does not allocate arrays per block.
+    """
+
+    def __init__(self, key_number, frequencies, amplitudes, volume, envelope, release_at=None, attack=None,
+                 wavetable=None):
+        self.key_number = key_number
+        self.frequencies = np.asarray(frequencies, dtype=float)
+        self.amplitudes = np.asarray(amplitudes, dtype=float)
+        self.volume = volume
+        self.envelope = envelope
+        self.attack = attack           # Waveform of the attack transient, e.g. the hammer knock
+        self.wavetable = wavetable     # Precomputed sum of the partials from clock 0 on
+        self.clock = 0                 # Samples played, negative before a delayed start
+        self.release_at = release_at   # Clock of the release, None while the key is held
+        self.allocate(0)
+
+    def allocate(self, frames):
+        """Scratch buffers for blocks of up to frames samples"""
+        self.samples = np.arange(frames, dtype=float)
+        self.scratch = np.empty((3, frames))  # times, partials, envelope
+
+    def release(self, clock=None):
+        """Start the release now or at the given clock, unless it has started already"""
+        clock = self.clock if clock is None else clock
+        if self.release_at is None or clock < self.release_at:
+            self.release_at = max(clock, self.clock, 0)
+
+    def envelope_block(self, t, sample_rate, out=None):
+        """Envelope at the increasing times t (seconds), including the release, computed into out if given"""
+        level = self.envelope.level(t, out)
+        if self.release_at is None:
+            return level
+        t_release = self.release_at / sample_rate
+        released = level[np.searchsorted(t, t_release):]
+        np.subtract(t[len(t) - len(released):], t_release, out=released)
+        released *= -self.envelope.release
+        np.exp(released, out=released)
+        released *= self.envelope.level(np.array(t_release))
+        return level
+
+    def oscillate(self, t, work, out=None):
+        """
+        Sum of the partials at the times t in seconds.
+
+        Args:
+            t: Times in seconds
+            work: Preallocated contiguous buffer of at least len(t) × number of partials elements
+            out: Buffer of len(t) for the result, None to allocate it
+        """
+        # One contiguous row per partial: a broadcast product would allocate iteration buffers
+        phases = work.reshape(-1)[:len(self.frequencies) * len(t)].reshape(len(self.frequencies), len(t))
+        for row, frequency in zip(phases, self.frequencies):
+            np.multiply(t, 2 * np.pi * frequency, out=row)
+        np.sin(phases, out=phases)
+        return np.matmul(self.amplitudes, phases, out=out)
+
+    def tabulate(self, length, sample_rate, chunk_size=8192):
+        """Sum of the partials for the first length samples, computed in chunks"""
+        table = np.empty(length, dtype=np.float32)
+        work = np.empty((chunk_size, len(self.frequencies)))
+        for start in range(0, length, chunk_size):
+            t = np.arange(start, min(start + chunk_size, length)) / sample_rate
+            table[start:start + len(t)] = self.oscillate(t, work)
+        return table
+
+    def render(self, out, work, sample_rate):
+        """
+        Add the next len(out) samples of the voice to out.
+
+        A voice with a negative clock starts that many samples into the block.
+
+        Args:
+            out: Mix buffer
+            work: Preallocated contiguous buffer of at least len(out) × number of partials elements
+            sample_rate: Sampling rate in Hz
+
+        Returns:
+            bool: False when the voice has faded out and can be removed
+        """
+        delay = min(max(-self.clock, 0), len(out))
+        self.clock += delay
+        out = out[delay:]
+        frames = len(out)
+        if frames == 0:
+            return True
+        if frames > len(self.samples):
+            self.allocate(frames)
+        t, partials, envelope = self.scratch[:, :frames]
+        np.add(self.samples[:frames], self.clock, out=t)
+        t /= sample_rate
+        table = self.wavetable[self.clock:self.clock + frames] if self.wavetable is not None else ()
+        partials[:len(table)] = table
+        if len(table) < frames:
+            self.oscillate(t[len(table):], work, out=partials[len(table):])
+        self.envelope_block(t, sample_rate, out=envelope)
+        partials *= envelope
+        partials *= self.volume
+        out += partials
+        if self.attack is not None and self.clock < len(self.attack):
+            transient = self.attack[self.clock:self.clock + frames]
+            knock = np.multiply(transient, self.volume * self.envelope.hammer, out=partials[:len(transient)])
+            out[:len(transient)] += knock
+        self.clock += frames
+        return self.release_at is None or self.clock <= self.release_at or envelope[-1] >= CUTOFF_VOLUME
+
+
+class Drone:
+    """
+    Sustained reference tone that glides to a changing target.
+
+    Unlike a Voice, the drone carries the phase of each partial from block
+    to block, so that a change of frequency bends the tone without a jump
+    in the waveform. Frequencies approach the target exponentially in the
+    logarithmic domain with the time constant glide, the volume likewise,
+    which also fades the drone in and out.
+
+    The target is a single tuple that set() and stop() replace as a whole.
+    The audio callback reads it once per block, so updates from other
+    threads need no lock and never block the callback.
+    """
+
+    def __init__(self, amplitudes=DRONE_AMPLITUDES, glide=0.1):
+        self.amplitudes = np.asarray(amplitudes, dtype=float)
+        self.glide = glide
+        self.target = None      # (partial frequencies, volume), None when stopped
+        self.frequencies = None
+        self.phases = np.zeros(len(self.amplitudes))
+        self.volume = 0.0
+
+    @property
+    def active(self):
+        return self.target is not None or self.volume >= CUTOFF_VOLUME
+
+    def set(self, frequency, B=0.0, volume=0.2):
+        """Glide to the fundamental frequency with partials of inharmonicity B"""
+        self.target = (frequency * synthetic_partial_ratios([B], len(self.amplitudes))[0], volume)
+
+    def stop(self):
+        """Fade the drone out"""
+        self.target = None
+
+    def render(self, out, work, sample_rate):
+        """Add the next len(out) samples of the drone to out"""
+        target = self.target
+        if target is None and self.volume < CUTOFF_VOLUME:
+            self.volume = 0.0
+            return
+        frequencies, volume = target if target is not None else (self.frequencies, 0.0)
+        if self.frequencies is None or self.volume < CUTOFF_VOLUME:
+            self.frequencies = frequencies  # start at the target instead of gliding from silence
+
+        frames = len(out)
+        approach = np.exp(-np.arange(1, frames + 1) / (self.glide * sample_rate))
+        phases = work[:frames, :len(self.amplitudes)]
+        np.multiply.outer(approach, np.log(self.frequencies / frequencies), out=phases)
+        np.exp(phases, out=phases)
+        phases *= 2 * np.pi * frequencies / sample_rate
+        np.cumsum(phases, axis=0, out=phases)
+        phases += self.phases
+        self.phases = np.mod(phases[-1], 2 * np.pi)
+        self.frequencies = frequencies * (self.frequencies / frequencies) ** approach[-1]
+
+        np.sin(phases, out=phases)
+        audible = np.where(frequencies < sample_rate / 2, self.amplitudes, 0.0)
+        levels = volume + (self.volume - volume) * approach
+        out += levels * (phases @ audible)
+        self.volume = levels[-1]
+
+
+class Synthesizer:
+    """
+    Polyphonic synthesizer on one persistent output stream.
+
+    Voices are added and released from any thread. The stream callback
+    (Synthesizer::generateAudioSignal) renders all active voices into a
+    preallocated mix buffer and drops the ones that have faded out, so a
+    tone starts within one block of the request and overlapping tones add
+    up instead of cutting each other off. A Drone can sound on top of the
+    voices.
+    """
+
+    def __init__(self, sample_rate, block_size=256, max_partials=64, cache_size=WAVETABLE_CACHE_SIZE):
+        self.sample_rate = sample_rate
+        self.block_size = block_size
+        self.max_partials = max_partials
+        self.wavetables = WavetableCache(cache_size)
+        self.drone = Drone()
+        self.voices = []
+        self.lock = threading.Lock()
+        self.stream = None
+        self._allocate(block_size)
+
+    def _allocate(self, frames):
+        self.mix = np.zeros(frames)
+        self.work = np.empty((frames, self.max_partials))
+
+    @property
+    def running(self):
+        return self.stream is not None
+
+    def start(self):
+        """Open and start the output stream unless it is running already"""
+        with self.lock:
+            if self.stream is not None:
+                return
+            self.stream = sd.OutputStream(samplerate=self.sample_rate, channels=1, dtype='float32',
+                                          blocksize=self.block_size, latency='low',
+                                          callback=self._callback)
+            self.stream.start()
+
+    def stop(self):
+        """Silence all voices and close the stream"""
+        self.drone = Drone()
+        with self.lock:
+            self.voices = []
+            stream, self.stream = self.stream, None
+        if stream is not None:
+            stream.stop()
+            stream.close()
+
+    def set_sample_rate(self, sample_rate):
+        """Change the sample rate, reopening the stream if it is running"""
+        running = self.running
+        self.stop()
+        self.wavetables.clear()
+        self.sample_rate = sample_rate
+        if running:
+            self.start()
+
+    def make_voice(self, key_number, frequency, duration=2.0, volume=0.3,
+                   amplitudes=HARMONIC_AMPLITUDES, B=0.0, envelope=None, delay=0.0):
+        """
+        Create the voice of a tone.
+
+        The partials follow f_n = f·n·√((1 + B·n²)/(1 + B)), those above the
+        Nyquist frequency are left out. If the envelope has a hammer
+        intensity, the hammer knock is played at the start. The sum of the
+        partials is taken from the wavetable cache. On the first play of a
+        frequency and timbre the voice sounds from its oscillators, while
+        the table is rendered in the background for the following plays.
+
+        Args:
+            key_number: Identification of the voice
+            frequency: Fundamental frequency in Hz
+            duration: Seconds until the release, None to hold until release() is called
+            volume: Amplitude of the fundamental
+            amplitudes: Relative amplitudes of the partials 1, 2, ...
+            B: Inharmonicity coefficient, 0 for harmonic partials
+            envelope: Envelope, default a 50 ms attack and release
+            delay: Seconds from the addition of the voice until it starts
+
+        Returns:
+            Voice: The new voice
+        """
+        envelope = envelope or Envelope()
+        amplitudes = np.asarray(amplitudes, dtype=float)[:self.max_partials]
+        frequencies = frequency * synthetic_partial_ratios([B], len(amplitudes))[0]
+        audible = frequencies < self.sample_rate / 2
+        release_at = None if duration is None else int(duration * self.sample_rate)
+        attack = hammer_knock(self.sample_rate) if envelope.hammer > 0 else None
+        voice = Voice(key_number, frequencies[audible], amplitudes[audible], volume, envelope,
+                      release_at, attack)
+        voice.allocate(self.block_size)
+
+        # The partials do not depend on the envelope, so every tone of the same
+        # frequency and timbre shares one table of the longest duration, cut
+        # to the length the tone sounds
+        length = int(np.ceil(min(envelope.duration(duration), MAX_WAVETABLE_DURATION) * self.sample_rate))
+        key = (self.sample_rate, float(frequency), float(B), tuple(voice.amplitudes))
+        table = self.wavetables.lookup(key)
+        if table is None:
+            # Rendering the table takes tens of milliseconds, too long to wait for
+            table_length = int(MAX_WAVETABLE_DURATION * self.sample_rate)
+            self.wavetables.prepare(key, lambda: voice.tabulate(table_length, self.sample_rate))
+        else:
+            voice.wavetable = table[:length]
+        voice.clock = -int(round(delay * self.sample_rate))
+        return voice
+
+    def play_tone(self, key_number, frequency, **parameters):
+        """Start a tone with the parameters of make_voice (Synthesizer::playSound)"""
+        voice = self.make_voice(key_number, frequency, **parameters)
+        self.start()
+        return self.add(voice)
+
+    def set_drone(self, frequency, B=0.0, volume=0.2):
+        """Let the drone sound at, or glide to, the given frequency"""
+        if not self.running:
+            self.start()
+        self.drone.set(frequency, B, volume)
+
+    def stop_drone(self):
+        self.drone.stop()
+
+    def play_tones(self, tones):
+        """
+        Start several tones together, e.g. an interval or chord.
+
+        All voices are added at once, so their delays are exact to the sample.
+
+        Args:
+            tones: List of (key_number, frequency, parameters of make_voice)
+
+        Returns:
+            list: The new voices
+        """
+        voices = [self.make_voice(key_number, frequency, **parameters)
+                  for key_number, frequency, parameters in tones]
+        self.start()
+        return self.add_voices(voices)
+
+    def add(self, voice):
+        """Add a voice to the mix, releasing a voice already sounding for the same key"""
+        return self.add_voices([voice])[0]
+
+    def add_voices(self, voices):
+        """Add voices to the mix in one step, before the next block is rendered"""
+        keys = {voice.key_number for voice in voices}
+        with self.lock:
+            for other in self.voices:
+                if other.key_number in keys:
+                    other.release()
+            self.voices.extend(voices)
+        return voices
+
+    def release(self, key_number):
+        """Release all voices of a key (Synthesizer::releaseSound)"""
+        with self.lock:
+            for voice in self.voices:
+                if voice.key_number == key_number:
+                    voice.release()
+
+    def is_playing(self, key_number):
+        """Whether a voice of the key is sounding (Synthesizer::isPlaying)"""
+        with self.lock:
+            return any(voice.key_number == key_number for voice in self.voices)
+
+    def generate(self, frames):
+        """
+        Mix the next frames samples of all voices and the drone.
+
+        Returns:
+            np.array: View of the mix buffer, valid until the next call
+        """
+        if frames > len(self.mix):
+            self._allocate(frames)
+        mix = self.mix[:frames]
+        mix[:] = 0
+        with self.lock:
+            self.voices = [voice for voice in self.voices
+                           if voice.render(mix, self.work, self.sample_rate)]
+        self.drone.render(mix, self.work, self.sample_rate)
+        return mix
+
+    def _callback(self, outdata, frames, time_info, status):
+        """Audio callback: write the mix of all voices"""
+        np.clip(self.generate(frames), -1.0, 1.0, out=outdata[:, 0])
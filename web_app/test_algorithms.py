@@ -0,0 +1,82 @@
+"""
+Test script for the registry of tuning algorithms
+"""
+
+import subprocess
+import sys
+import types
+sys.path.insert(0, '.')
+from algorithms import ALGORITHMS, DEFAULT_ALGORITHM, RECOMMENDED_ALGORITHM, Algorithm, AlgorithmParameter, get_algorithm
+from progress import ProgressReporter
+
+def test_registered_algorithms_resolve():
+    # Requests without an algorithm keep getting equal temperament
+    assert DEFAULT_ALGORITHM == 'equal_temperament'
+    assert RECOMMENDED_ALGORITHM in ALGORITHMS
+    for algorithm in ALGORITHMS.values():
+        assert callable(algorithm.load()), algorithm.id
+        assert algorithm.information()['id'] == algorithm.id
+
+def test_engines_are_imported_on_first_run():
+    # Neither the registry nor the engines import the optimizer at start-up
+    code = "import algorithms, tuningcurves, progress, sys; print('scipy.optimize' in sys.modules)"
+    assert subprocess.run([sys.executable, '-c', code], capture_output=True, text=True).stdout.strip() == 'False'
+    algorithm = Algorithm('test', 'Test', '', 'test_algorithms:_engine')
+    assert not algorithm.loaded
+    assert algorithm.run('tuner', 'progress') == ('tuner', 'progress', 1.0)
+    assert algorithm.loaded
+
+def _engine(tuner, progress, factor=1.0):
+    return tuner, progress, factor
+
+def test_parameters_are_validated():
+    algorithm = Algorithm('test', 'Test', '', 'test_algorithms:_engine',
+                          [AlgorithmParameter('factor', 'Factor', 1.0, 0.0, 2.0)])
+    assert algorithm.parameter_values() == {'factor': 1.0}
+    assert algorithm.run('tuner', 'progress', {'factor': '1.5'}) == ('tuner', 'progress', 1.5)
+    for parameters in ({'factor': 3.0}, {'factor': 'x'}, {'other': 1.0}):
+        try:
+            algorithm.parameter_values(parameters)
+            assert False, f"{parameters} must be rejected"
+        except ValueError:
+            pass
+    iterations = AlgorithmParameter('iterations', 'Iterations', 50, 1, 1000)
+    assert iterations.validate('20') == 20 and type(iterations.validate(20.0)) is int
+    # Comparisons with NaN are always false, and int() would truncate or accept booleans
+    for value in (float('nan'), 'nan', float('inf'), '-inf', True, 2.9, '2.5', None):
+        for parameter in (algorithm.parameters[0], iterations):
+            try:
+                parameter.validate(value)
+                assert False, f"{value!r} must be rejected for {parameter.id}"
+            except ValueError:
+                pass
+    try:
+        get_algorithm('unknown')
+        assert False, "an unknown algorithm must be rejected"
+    except ValueError:
+        pass
+
+def test_simple_algorithms_emit_once():
+    keys = [{'theoretical_frequency': 440.0 * 2 ** ((i - 48) / 12), 'recorded_frequency': None,
+             'computed_frequency': None, 'tuning_deviation': 0.0} for i in range(88)]
+    keys[60]['recorded_frequency'] = 880.0 * 2 ** (10 / 1200)
+    keys[60]['inharmonicity'] = 1e-3
+    tuner = types.SimpleNamespace(piano_data={'keys': keys, 'key_of_a4': 48})
+    for algorithm_id in ('equal_temperament', 'copy_recording', 'stretch_tuning', 'inharmonicity'):
+        events = []
+        get_algorithm(algorithm_id).run(tuner, ProgressReporter(lambda *event: events.append(event)))
+        assert [(event, data['progress']) for event, data in events] == [('calculation_progress', 100)], algorithm_id
+        assert keys[0]['computed_frequency'] == keys[0]['tuning_frequency'] == 27.5
+        assert keys[0]['tuning_deviation'] == 0.0
+    # Stretched by 5000 cents per octave and unit of inharmonicity, recorded 10 cents sharp of ET
+    assert keys[60]['computed_frequency'] == round(880.0 * 2 ** (5 / 1200), 2)
+    assert abs(keys[60]['tuning_deviation'] - 5.0) < 0.01
+    get_algorithm('equal_temperament').run(tuner, ProgressReporter(lambda *event: None))
+    assert keys[60]['computed_frequency'] == 880.0 and keys[60]['tuning_deviation'] == 10.0
+
+if __name__ == '__main__':
+    test_registered_algorithms_resolve()
+    test_engines_are_imported_on_first_run()
+    test_parameters_are_validated()
+    test_simple_algorithms_emit_once()
+    print("All algorithm registry tests passed")
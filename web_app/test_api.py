@@ -0,0 +1,44 @@
+"""
+Test script for the validation of the HTTP endpoints
+"""
+
+import sys
+sys.path.insert(0, '.')
+from app import app, tuner, MAX_INTERVAL_DURATION, MAX_INTERVAL_ARPEGGIO, MAX_INTERVAL_KEYS
+
+def test_play_interval_rejects_invalid_keys():
+    client = app.test_client()
+    played = []
+    play_tones = tuner.synthesizer.play_tones
+    tuner.synthesizer.play_tones = played.append
+    try:
+        for key_numbers in (['a'], [48, 1.5], [48, 88], [-1], [True], 'abc', {'key': 48}):
+            response = client.post('/api/play_interval', json={'key_numbers': key_numbers})
+            assert response.status_code == 400, key_numbers
+            assert response.get_json()['success'] is False and response.get_json()['error']
+        # NaN fails every comparison, so it must not pass the bounds either
+        for limits in ({'duration': 'long'}, {'duration': 0}, {'duration': -1.0}, {'duration': 'nan'},
+                       {'duration': 'inf'}, {'duration': MAX_INTERVAL_DURATION + 1}, {'arpeggio': -0.1},
+                       {'arpeggio': 'nan'}, {'arpeggio': MAX_INTERVAL_ARPEGGIO + 1}):
+            response = client.post('/api/play_interval', json={'key_numbers': [48], **limits})
+            assert response.status_code == 400, limits
+        response = client.post('/api/play_interval', json={'key_numbers': list(range(MAX_INTERVAL_KEYS + 1))})
+        assert response.status_code == 400
+        assert not played
+
+        # Repeated keys are played once
+        response = client.post('/api/play_interval', json={'key_numbers': [48] * 20 + [55, 48], 'use_computed': False,
+                                                           'duration': MAX_INTERVAL_DURATION,
+                                                           'arpeggio': MAX_INTERVAL_ARPEGGIO})
+        assert response.status_code == 200 and len(response.get_json()['frequencies']) == 2
+        assert [key_number for key_number, _, _ in played.pop()] == [48, 55]
+
+        response = client.post('/api/play_interval', json={'key_numbers': [48, 55], 'use_computed': False})
+        assert response.status_code == 200 and response.get_json()['success']
+        assert [key_number for key_number, _, _ in played[0]] == [48, 55]
+    finally:
+        tuner.synthesizer.play_tones = play_tones
+
+if __name__ == '__main__':
+    test_play_interval_rejects_invalid_keys()
+    print("All API tests passed")
@@ -0,0 +1,53 @@
+"""
+Test script for the auditory preprocessing
+"""
+
+import numpy as np
+import sys
+sys.path.insert(0, '.')
+from auditory import (dba_filter, mollifier_matrix, clean_spectrum, cut_low_frequencies,
+                      convert_to_spla, preprocess_spectrum)
+from logspectrum import NUMBER_OF_BINS, frequency_to_index
+
+def test_dba_filter():
+    """A-weighting is about 0 dB at 1 kHz and strongly negative in the deep bass"""
+    dba = dba_filter()
+    assert len(dba) == NUMBER_OF_BINS
+    assert abs(dba[int(round(frequency_to_index(1000.0)))]) < 0.1
+    assert dba[0] < -40
+
+def test_mollifier_preserves_constant():
+    spectrum = mollifier_matrix() @ np.ones(NUMBER_OF_BINS)
+    assert np.allclose(spectrum, 1.0)
+
+def test_clean_spectrum_keeps_partials():
+    f1, B = 110.0, 0.0005
+    spectrum = clean_spectrum(np.ones(NUMBER_OF_BINS), f1, B)
+    partial = int(round(frequency_to_index(3 * f1 * np.sqrt((1 + 9 * B) / (1 + B)))))
+    between = int(round(frequency_to_index(2.5 * f1)))
+    assert spectrum[partial] > 0.99
+    assert spectrum[between] < 1e-6
+
+def test_cut_and_spla():
+    spectrum = cut_low_frequencies(np.ones(NUMBER_OF_BINS), 440.0)
+    assert spectrum[0] == 0 and spectrum[-1] == 1
+    assert np.all(convert_to_spla(np.full(NUMBER_OF_BINS, 1e-12)) == 0)
+
+def test_preprocess_spectrum():
+    """Only the lines at the partials survive the preprocessing"""
+    spectrum = np.full(NUMBER_OF_BINS, 1e-6)
+    for n in range(1, 6):
+        spectrum[int(round(frequency_to_index(n * 220.0)))] = 1.0 / n
+    result = preprocess_spectrum(spectrum, 220.0, 0.0)
+    assert result.shape == (NUMBER_OF_BINS,)
+    assert np.all(result >= 0)
+    assert result[int(round(frequency_to_index(440.0)))] > 100 * result[int(round(frequency_to_index(330.0)))]
+    assert np.all(preprocess_spectrum(spectrum, None, 0.0) == 0)
+
+if __name__ == '__main__':
+    test_dba_filter()
+    test_mollifier_preserves_constant()
+    test_clean_spectrum_keeps_partials()
+    test_cut_and_spla()
+    test_preprocess_spectrum()
+    print("Auditory preprocessing tests passed")
@@ -0,0 +1,92 @@
+"""
+Test script for the inharmonicity fit
+"""
+
+import numpy as np
+import sys
+sys.path.insert(0, '.')
+from inharmonicity import fit_inharmonicity, extrapolate_inharmonicity, expected_inharmonicity, synthetic_partial_ratios
+
+def partial_series(f0, B, partials):
+    """Partial frequencies f_n = n·f_0·√(1 + B·n²)"""
+    n = np.asarray(partials, dtype=float)
+    return n * f0 * np.sqrt(1 + B * n**2)
+
+def test_fit_recovers_all_keys():
+    """f_0 and B of several keys are recovered in one call"""
+    f0 = np.array([55.0, 220.0, 880.0])
+    B = np.array([0.0008, 0.0003, 0.0001])
+    peaks = np.array([partial_series(f, b, range(1, 6)) for f, b in zip(f0, B)])
+
+    fit = fit_inharmonicity(peaks, f0 * 1.003)
+    assert np.allclose(fit['f0'], f0)
+    assert np.allclose(fit['B'], B)
+    assert np.all(fit['residual'] < 1e-6)
+    assert list(fit['partials']) == [5, 5, 5]
+
+def test_strong_inharmonicity_assigns_high_partials():
+    """High partials that are sharper than half a harmonic are still assigned correctly"""
+    peaks = partial_series(30.0, 0.001, [1, 2, 8, 10, 12, 14])
+    fit = fit_inharmonicity([peaks], [30.0])
+    assert np.isclose(fit['B'][0], 0.001, rtol=1e-6)
+    assert fit['residual'][0] < 1e-6
+
+def test_missing_and_unfittable_keys_are_masked():
+    peaks = np.array([
+        [440.0, np.nan, 0.0, np.nan],                       # only one partial
+        list(partial_series(261.6, 0.0002, [1, 2, 3])) + [np.nan],
+        [np.nan] * 4,                                       # not recorded
+    ])
+    fit = fit_inharmonicity(peaks, [440.0, 261.6, np.nan])
+    assert list(np.ma.getmaskarray(fit['B'])) == [True, False, True]
+    assert np.isclose(fit['B'][1], 0.0002)
+
+def test_residual_reflects_noise():
+    """Noisy partials give a larger residual than clean ones"""
+    rng = np.random.default_rng(3)
+    clean = partial_series(110.0, 0.0004, range(1, 9))
+    noisy = clean * 2 ** (rng.normal(0, 2, len(clean)) / 1200)
+    fit = fit_inharmonicity([clean, noisy], [110.0, 110.0])
+    assert fit['residual'][0] < 1e-6 < 0.5 < fit['residual'][1]
+
+def test_extrapolation_from_few_keys():
+    """A log-linear treble law is recovered from a handful of measured keys"""
+    keys = np.arange(88)
+    true_B = 0.0004 * np.exp(0.05 * (keys - 48))
+    measured = np.full(88, np.nan)
+    recorded = [12, 24, 36, 40, 44, 48, 52, 56, 60, 66, 72, 80]
+    measured[recorded] = true_B[recorded]
+
+    B = extrapolate_inharmonicity(measured)
+    assert np.all(B > 0)
+    assert np.allclose(B[recorded], true_B[recorded])
+    assert np.allclose(B[57:], true_B[57:], rtol=1e-6)
+
+def test_extrapolation_rejects_treble_outliers():
+    keys = np.arange(88)
+    measured = 0.0004 * np.exp(0.05 * (keys - 48))
+    measured[70] *= 3
+    B = extrapolate_inharmonicity(measured)
+    assert np.isclose(B[70], measured[70] / 3, rtol=1e-6)
+
+def test_extrapolation_without_measurements():
+    """Without any measurement the expected inharmonicity is used"""
+    frequencies = 440.0 * 2 ** ((np.arange(88) - 48) / 12)
+    B = extrapolate_inharmonicity(np.full(88, np.nan))
+    assert np.allclose(B[:40], expected_inharmonicity(frequencies[:40]))
+
+def test_synthetic_partial_ratios():
+    ratios = synthetic_partial_ratios([0.0, 0.001], num_partials=3)
+    assert np.allclose(ratios[0], [1, 2, 3])
+    assert ratios[1, 0] == 1.0 and ratios[1, 2] > 3
+
+if __name__ == '__main__':
+    test_fit_recovers_all_keys()
+    test_strong_inharmonicity_assigns_high_partials()
+    test_missing_and_unfittable_keys_are_masked()
+    test_residual_reflects_noise()
+    test_extrapolation_from_few_keys()
+    test_extrapolation_rejects_treble_outliers()
+    test_extrapolation_without_measurements()
+    test_synthetic_partial_ratios()
+    print("Inharmonicity tests passed")
@@ -0,0 +1,58 @@
+"""
+Test script for the KeyRecognizer
+Synthesizes inharmonic piano-like tones and checks the recognized key
+"""
+
+import numpy as np
+import sys
+sys.path.insert(0, '.')
+from keyrecognizer import KeyRecognizer, coarse_grain_spectrum
+
+SAMPLE_RATE = 44100
+
+def synthesize_key(key_idx, B=0.0003, duration=0.5):
+    """Create a decaying tone with inharmonic partials for a key"""
+    t = np.arange(int(duration * SAMPLE_RATE)) / SAMPLE_RATE
+    f0 = 440.0 * 2 ** ((key_idx - 48) / 12)
+    wave = np.zeros_like(t)
+    for n in range(1, 12):
+        partial_freq = n * f0 * np.sqrt(1 + B * n**2)
+        if partial_freq < SAMPLE_RATE / 2:
+            wave += np.sin(2 * np.pi * partial_freq * t) / n
+    return wave * np.exp(-3 * t)
+
+def power_spectrum(wave):
+    return np.abs(np.fft.rfft(wave * np.hanning(len(wave)))) ** 2
+
+def test_coarse_grain_preserves_sum():
+    """Coarse graining over the full index range preserves the total content"""
+    X = np.random.default_rng(1).random(1000)
+    Y = coarse_grain_spectrum(X, 100, lambda y: 10.0 * y + 4.5)
+    assert np.isclose(np.sum(Y), np.sum(X))
+
+def test_recognize_keys():
+    """Keys across the keyboard are recognized from their spectrum alone"""
+    recognizer = KeyRecognizer()
+    for key_idx in [12, 24, 39, 48, 55, 67, 75, 87]:
+        key, frequency = recognizer.recognize_key(power_spectrum(synthesize_key(key_idx)), SAMPLE_RATE)
+        assert key == key_idx, f"key {key_idx} recognized as {key} ({frequency:.1f} Hz)"
+
+def test_forced_key():
+    """A forced key searches for the maximum near its own frequency"""
+    recognizer = KeyRecognizer()
+    key, frequency = recognizer.recognize_key(power_spectrum(synthesize_key(48)), SAMPLE_RATE,
+                                              selected_key=48, key_forced=True)
+    assert key == 48
+    assert abs(frequency - 440.0) < 3.0
+
+def test_silence():
+    """Silence is not recognized as a key"""
+    key, _ = KeyRecognizer().recognize_key(np.zeros(1000), SAMPLE_RATE)
+    assert key == -1
+
+if __name__ == '__main__':
+    test_coarse_grain_preserves_sum()
+    test_recognize_keys()
+    test_forced_key()
+    test_silence()
+    print("KeyRecognizer tests passed")
@@ -0,0 +1,108 @@
+"""
+Test script for the log-binned spectra
+"""
+
+import numpy as np
+import sys
+sys.path.insert(0, '.')
+from logspectrum import (NUMBER_OF_BINS, SpectrumAverage, log_binned_spectrum, log_binning_matrix,
+                         extract_peaks, noise_floor, index_to_frequency, frequency_to_index)
+from keyrecognizer import coarse_grain_spectrum
+
+SAMPLE_RATE = 44100
+
+def power_spectrum(audio):
+    return np.abs(np.fft.rfft(audio * np.hanning(len(audio))))**2
+
+def test_index_frequency_roundtrip():
+    assert np.isclose(index_to_frequency(frequency_to_index(440.0)), 440.0)
+    assert np.isclose(index_to_frequency(1200) / index_to_frequency(0), 2.0)
+
+def test_matrix_matches_coarse_graining():
+    """The sparse matrix reproduces MathTools::coarseGrainSpectrum"""
+    for fft_size in [1000, 88200]:
+        power = np.random.default_rng(fft_size).random(fft_size // 2 + 1)
+        b = fft_size / SAMPLE_RATE
+        expected = coarse_grain_spectrum(power, NUMBER_OF_BINS, lambda m: b * index_to_frequency(m))
+        matrix = log_binning_matrix(fft_size, SAMPLE_RATE, exponent=0)
+        assert matrix.shape == (NUMBER_OF_BINS, fft_size // 2 + 1)
+        assert np.allclose(matrix @ power, expected)
+    assert log_binning_matrix(1000, SAMPLE_RATE) is log_binning_matrix(1000, SAMPLE_RATE)
+
+def test_log_binned_spectrum_peaks():
+    """The partials of a tone appear as peaks at their frequencies"""
+    t = np.arange(SAMPLE_RATE) / SAMPLE_RATE
+    audio = np.sin(2 * np.pi * 440 * t) + 0.5 * np.sin(2 * np.pi * 1320 * t)
+    spectrum = log_binned_spectrum(power_spectrum(audio), SAMPLE_RATE, len(audio))
+    assert len(spectrum) == NUMBER_OF_BINS
+    assert np.isclose(np.sum(spectrum), 1.0)
+    frequencies, _ = extract_peaks(spectrum)
+    assert len(frequencies) == 2
+    assert np.all(np.abs(1200 * np.log2(frequencies / [440, 1320])) < 2)
+
+def test_running_mean():
+    average = SpectrumAverage()
+    spectra = np.random.default_rng(0).random((5, 100))
+    for spectrum in spectra:
+        result = average.add(spectrum)
+    assert average.count == 5
+    assert np.allclose(result, spectra.mean(axis=0))
+
+def test_average_matches_strikes_of_the_same_tuning():
+    t = np.arange(SAMPLE_RATE) / SAMPLE_RATE
+    spectra = {f: log_binned_spectrum(power_spectrum(np.sin(2 * np.pi * f * t)), SAMPLE_RATE, SAMPLE_RATE)
+               for f in (440.0, 440.5, 450.0)}
+    average = SpectrumAverage()
+    average.add(spectra[440.0])
+    average.frequency = 440.0
+    assert average.matches(spectra[440.5]) and not average.matches(spectra[450.0])
+    average.reset()
+    assert average.count == 0 and average.spectrum is None and average.matches(spectra[450.0])
+
+def test_averaging_suppresses_noise_peaks():
+    """A weak partial buried in noise is found in the average of several strikes"""
+    rng = np.random.default_rng(1)
+    t = np.arange(SAMPLE_RATE) / SAMPLE_RATE
+    tone = np.sin(2 * np.pi * 220 * t) + 0.03 * np.sin(2 * np.pi * 660 * t)
+    average = SpectrumAverage()
+    for _ in range(8):
+        audio = tone + 0.3 * rng.standard_normal(len(t))
+        single = log_binned_spectrum(power_spectrum(audio), SAMPLE_RATE, len(audio))
+        mean = average.add(single)
+    single_frequencies, _ = extract_peaks(single, threshold=0.001)
+    mean_frequencies, _ = extract_peaks(mean, threshold=0.001)
+    assert len(mean_frequencies) < len(single_frequencies)
+    assert np.any(np.abs(mean_frequencies - 660) < 1)
+
+def test_noise_floor():
+    """The floor follows a sloped noise spectrum and ignores isolated lines"""
+    spectrum = np.exp(-np.arange(NUMBER_OF_BINS) / 3000)
+    spectrum[::500] = 10.0
+    floor = noise_floor(spectrum)
+    m = np.arange(150, NUMBER_OF_BINS - 150)
+    m = m[m % 500 != 0]
+    assert np.allclose(floor[m], spectrum[m], rtol=0.05)
+
+def test_weak_partials_found_above_floor():
+    """Weak upper partials are found relative to the floor, not the strongest line"""
+    rng = np.random.default_rng(2)
+    t = np.arange(SAMPLE_RATE) / SAMPLE_RATE
+    n = np.arange(1, 11)
+    audio = np.sum(np.sin(2 * np.pi * np.outer(n * 200.0, t)) / n[:, None]**2, axis=0)
+    audio += 0.001 * rng.standard_normal(len(t))
+    spectrum = log_binned_spectrum(power_spectrum(audio), SAMPLE_RATE, len(audio))
+    assert len(extract_peaks(spectrum)[0]) < 10
+    frequencies, _ = extract_peaks(spectrum, threshold=1e-6, floor=noise_floor(spectrum))
+    assert len(frequencies) == 10
+    assert np.all(np.abs(frequencies - n * 200.0) < 1)
+
+if __name__ == '__main__':
+    test_index_frequency_roundtrip()
+    test_matrix_matches_coarse_graining()
+    test_log_binned_spectrum_peaks()
+    test_running_mean()
+    test_average_matches_strikes_of_the_same_tuning()
+    test_averaging_suppresses_noise_peaks()
+    test_noise_floor()
+    test_weak_partials_found_above_floor()
+    print("Log spectrum tests passed")
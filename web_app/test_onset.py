@@ -0,0 +1,55 @@
+"""
+Test script for the onset detection
+"""
+
+import numpy as np
+import sys
+sys.path.insert(0, '.')
+from onset import detect_onset, sustain_window, min_sustain_duration
+
+SAMPLE_RATE = 44100
+
+def key_stroke(strike_time, duration=3.0, noise=1e-3):
+    """Room noise followed by a decaying tone starting at strike_time"""
+    rng = np.random.default_rng(0)
+    t = np.arange(int(duration * SAMPLE_RATE)) / SAMPLE_RATE
+    tone = np.where(t >= strike_time, np.sin(2 * np.pi * 220 * t) * np.exp(-2 * (t - strike_time)), 0.0)
+    return 0.5 * tone + noise * rng.standard_normal(len(t))
+
+def test_onset_found_after_silence():
+    onset, strength = detect_onset(key_stroke(0.8), SAMPLE_RATE)
+    assert onset is not None
+    assert abs(onset / SAMPLE_RATE - 0.8) < 0.015
+    assert strength > 40
+
+def test_strike_at_start():
+    onset, _ = detect_onset(key_stroke(0.0), SAMPLE_RATE)
+    assert onset == 0
+
+def test_no_onset_in_noise():
+    onset, strength = detect_onset(key_stroke(10.0), SAMPLE_RATE)
+    assert onset is None
+    assert strength < 20
+
+def test_sustain_window():
+    audio = np.arange(3 * SAMPLE_RATE)
+    window = sustain_window(audio, SAMPLE_RATE, SAMPLE_RATE, attack_duration=0.1, sustain_duration=1.0)
+    assert window[0] == int(1.1 * SAMPLE_RATE)
+    assert len(window) == SAMPLE_RATE
+
+def test_sustain_window_after_late_onset():
+    audio = np.arange(3 * SAMPLE_RATE)
+    for onset in (2.9, 2.97, 2.995):
+        assert sustain_window(audio, SAMPLE_RATE, int(onset * SAMPLE_RATE),
+                              min_duration=min_sustain_duration(440.0)) is None
+    assert len(sustain_window(audio, SAMPLE_RATE, int(2.5 * SAMPLE_RATE), min_duration=0.2)) == int(0.45 * SAMPLE_RATE)
+    # The bass needs longer windows
+    assert min_sustain_duration(27.5) > 0.7 and min_sustain_duration(440.0) == 0.2
+
+if __name__ == '__main__':
+    test_onset_found_after_silence()
+    test_strike_at_start()
+    test_no_onset_in_noise()
+    test_sustain_window()
+    test_sustain_window_after_late_onset()
+    print("Onset tests passed")
@@ -0,0 +1,54 @@
+"""
+Test script for the overpull estimation
+"""
+
+import numpy as np
+import sys
+sys.path.insert(0, '.')
+from overpull import interaction_matrix, overpull, MAX_GAP
+
+def test_interaction_matrix():
+    for piano_type in ('grand', 'upright'):
+        R = interaction_matrix(88, 28, piano_type)
+        assert R.shape == (88, 88) and np.all(np.isfinite(R))
+        # On average raising all strings by one cent lets each fall by 0.22 cents
+        assert abs(R.sum(axis=1).mean() - 0.22) < 0.01
+        assert interaction_matrix(88, 28, piano_type) is R
+    try:
+        interaction_matrix(88, 28, 'harpsichord')
+        assert False, "unknown piano types must be rejected"
+    except ValueError:
+        pass
+
+def test_overpull_of_a_flat_piano():
+    R = interaction_matrix()
+    target = 440.0 * 2 ** ((np.arange(88) - 48) / 12)
+    current = target * 2 ** (-50 / 1200)  # 50 cents flat
+    cents = overpull(R, current, target)
+    assert np.allclose(cents, 50 * R.sum(axis=1))
+    assert np.all(cents > 0)
+
+def test_unmeasured_keys_are_represented_by_their_neighbours():
+    R = interaction_matrix()
+    target = 440.0 * 2 ** ((np.arange(88) - 48) / 12)
+    current = target * 2 ** (-30 / 1200)
+    sparse = np.full(88, np.nan)
+    sparse[::4] = current[::4]
+    # A uniform deviation gives the same total weight with every fourth key measured
+    assert np.allclose(overpull(R, sparse, target).mean(), overpull(R, current, target).mean(), rtol=0.05)
+
+def test_no_overpull_for_large_gaps_or_small_deviations():
+    R = interaction_matrix()
+    target = 440.0 * 2 ** ((np.arange(88) - 48) / 12)
+    current = target * 2 ** (-50 / 1200)
+    gapped = current.copy()
+    gapped[40:41 + MAX_GAP] = np.nan
+    assert not np.any(overpull(R, gapped, target))
+    assert not np.any(overpull(R, target * 2 ** (-3 / 1200), target))
+
+if __name__ == '__main__':
+    test_interaction_matrix()
+    test_overpull_of_a_flat_piano()
+    test_unmeasured_keys_are_represented_by_their_neighbours()
+    test_no_overpull_for_large_gaps_or_small_deviations()
+    print("All overpull tests passed")
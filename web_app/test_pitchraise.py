@@ -0,0 +1,50 @@
+"""
+Test script for the pitch-raise tuning curve
+"""
+
+import numpy as np
+import sys
+sys.path.insert(0, '.')
+from pitchraise import regression_inharmonicity, pitch_raise_curve
+
+def test_regression_per_bridge():
+    keys = np.arange(88)
+    true = np.where(keys < 28, np.exp(-8 + 0.05 * keys), np.exp(-10 + 0.06 * keys))
+    measured = np.full(88, np.nan)
+    measured[[3, 20, 40, 60, 80]] = true[[3, 20, 40, 60, 80]]
+    assert np.allclose(regression_inharmonicity(measured, 28), true)
+
+def test_regression_needs_both_bridges():
+    measured = np.full(88, np.nan)
+    measured[[40, 60]] = 1e-3
+    try:
+        regression_inharmonicity(measured, 28)
+        assert False, "a bridge without measurements must be rejected"
+    except ValueError:
+        pass
+
+def test_curve_without_inharmonicity_is_equal_temperament():
+    assert np.allclose(pitch_raise_curve(np.zeros(88)), 0)
+
+def test_curve_follows_the_octave_recurrences():
+    B = regression_inharmonicity(np.where(np.arange(88) % 10 == 0, 1e-3 * 2 ** ((np.arange(88) - 48) / 24), np.nan))
+    pitch = pitch_raise_curve(B)
+    cents = lambda k, n: 600.0 / np.log(2) * np.log((1 + n * n * B[k]) / (1 + B[k]))
+    assert pitch[48] == 0
+    for k in (61, 75, 87):
+        expected = 0.3 * (pitch[k - 12] + cents(k - 12, 4) - cents(k, 2)) + 0.7 * (pitch[k - 12] + cents(k - 12, 2))
+        assert abs(pitch[k] - expected) < 1e-9
+    for k in (0, 13, 35):
+        fraction = k / 36
+        expected = (fraction * (pitch[k + 12] + cents(k + 12, 2) - cents(k, 4))
+                    + (1 - fraction) * (pitch[k + 12] + cents(k + 12, 5) - cents(k, 10)))
+        assert abs(pitch[k] - expected) < 1e-9
+    # Stretched: the bass is flat and the treble sharp
+    assert pitch[0] < 0 < pitch[87]
+
+if __name__ == '__main__':
+    test_regression_per_bridge()
+    test_regression_needs_both_bridges()
+    test_curve_without_inharmonicity_is_equal_temperament()
+    test_curve_follows_the_octave_recurrences()
+    print("All pitch raise tests passed")
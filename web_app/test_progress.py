@@ -0,0 +1,71 @@
+"""
+Test script for the rate-limited progress reporter
+"""
+
+import sys
+import time
+sys.path.insert(0, '.')
+from progress import ProgressReporter
+
+class Clock:
+    def __init__(self):
+        self.time = 0.0
+    def __call__(self):
+        return self.time
+
+def test_updates_are_coalesced():
+    clock = Clock()
+    events = []
+    progress = ProgressReporter(lambda event, data: events.append(data), max_rate=10, clock=clock)
+    for i in range(88):
+        clock.time = i * 0.001
+        progress(i, f"key {i}")
+    assert [data['progress'] for data in events] == [0]
+    # The next update that is due carries the latest value
+    clock.time = 0.2
+    assert progress(90)
+    assert [data['progress'] for data in events] == [0, 90]
+    progress(95)
+    assert progress.flush()
+    assert [data['progress'] for data in events] == [0, 90, 95]
+
+def test_completion_is_always_delivered_once():
+    clock = Clock()
+    events = []
+    progress = ProgressReporter(lambda event, data: events.append((event, data)), max_rate=1, clock=clock)
+    progress(50)
+    assert progress.finish("done")
+    assert not progress.finish()
+    assert not progress(60)
+    assert events[-1] == ('calculation_progress', {'progress': 100.0, 'message': "done", 'eta': 0.0})
+    assert len(events) == 2
+
+def test_eta_from_observed_rate():
+    clock = Clock()
+    events = []
+    progress = ProgressReporter(lambda event, data: events.append(data), clock=clock)
+    progress(0)
+    assert events[-1]['eta'] is None
+    clock.time = 2.0
+    progress(25)
+    assert events[-1]['eta'] == 6.0
+
+def test_last_update_of_a_burst_is_delivered():
+    events = []
+    progress = ProgressReporter(lambda event, data: events.append(data), max_rate=20)
+    for i in range(0, 25, 5):
+        progress(i, f"{i}%")
+    assert [data['progress'] for data in events] == [0]
+    # Without a later call, as when a long step follows the burst
+    time.sleep(0.2)
+    assert [data['message'] for data in events] == ["0%", "20%"]
+    progress.finish()
+    time.sleep(0.1)
+    assert [data['progress'] for data in events] == [0, 20, 100]
+
+if __name__ == '__main__':
+    test_updates_are_coalesced()
+    test_completion_is_always_delivered_once()
+    test_eta_from_observed_rate()
+    test_last_update_of_a_burst_is_delivered()
+    print("All progress reporter tests passed")
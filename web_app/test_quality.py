@@ -0,0 +1,33 @@
+"""
+Test script for the recording quality score
+"""
+
+import numpy as np
+import sys
+sys.path.insert(0, '.')
+from quality import spectral_snr, recording_quality
+
+def test_clean_recording_scores_high():
+    assert recording_quality(50.0, 0.1, 60.0) > 0.99
+
+def test_single_bad_measure_rejects():
+    """Each of the three measures alone can make a recording unusable"""
+    assert recording_quality(5.0, 0.1, 60.0) == 0.0
+    assert recording_quality(50.0, 0.1, 15.0) == 0.0
+    assert recording_quality(50.0, 20.0, 60.0) < 0.3
+
+def test_unfitted_partials_are_neutral():
+    assert 0.5 < recording_quality(40.0, None, 40.0) < 1.0
+
+def test_spectral_snr():
+    spectrum = np.full(10800, 1e-6)
+    spectrum[5000] = 1e-2
+    assert abs(spectral_snr(spectrum) - 40.0) < 0.1
+    assert spectral_snr(np.zeros(10800)) == 0.0
+
+if __name__ == '__main__':
+    test_clean_recording_scores_high()
+    test_single_bad_measure_rejects()
+    test_unfitted_partials_are_neutral()
+    test_spectral_snr()
+    print("Quality tests passed")
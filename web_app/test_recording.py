@@ -0,0 +1,68 @@
+"""
+Test script for the analysis of recorded key strokes
+"""
+
+import numpy as np
+import sys
+sys.path.insert(0, '.')
+from app import app, socketio, tuner, store_recording
+
+def strike(frequency, onset=0.5, duration=3.0, B=4e-4, seed=0):
+    """Recording of a key stroke at onset seconds, with a little noise before it"""
+    sample_rate = tuner.sample_rate
+    t = np.arange(int(duration * sample_rate)) / sample_rate
+    rng = np.random.default_rng(seed)
+    audio = 1e-5 * rng.standard_normal(len(t))
+    sounding = t >= onset
+    ts = t[sounding] - onset
+    for n in range(1, 9):
+        audio[sounding] += np.sin(2 * np.pi * n * frequency * np.sqrt(1 + B * n * n) * ts) / n * np.exp(-ts)
+    return (0.3 * audio).astype(np.float32)
+
+def record(key_number, audio):
+    """Events emitted while storing a recording"""
+    client = socketio.test_client(app)
+    client.get_received()
+    store_recording(key_number, audio)
+    received = client.get_received()
+    client.disconnect()
+    return {event['name']: event['args'][0] for event in received}
+
+def test_retuned_key_starts_a_new_average():
+    tuner.spectrum_averages.clear()
+    for seed in range(2):
+        record(48, strike(430.0, seed=seed))
+    for seed in range(3):
+        events = record(48, strike(440.0, seed=seed))
+    completed = events['recording_completed']
+    assert completed['strikes'] == 3
+    assert abs(1200 * np.log2(completed['frequency'] / (440.0 * np.sqrt(1 + 4e-4)))) < 2
+    assert all(abs(1200 * np.log2(peak['frequency'] / 430.0)) > 10 for peak in tuner.get_key(48)['peaks'])
+
+def test_late_strike_is_rejected_before_analysis():
+    tuner.spectrum_averages.clear()
+    key = tuner.get_key(40)
+    key.update(recorded=False, recorded_frequency=None)
+    for onset in (2.9, 2.97, 2.995):
+        events = record(40, strike(440.0 * 2 ** (-8 / 12), onset=onset))
+        assert 'recording_error' in events and 'recording_completed' not in events, onset
+    assert not key['recorded'] and key['recorded_frequency'] is None and 40 not in tuner.spectrum_averages
+
+def test_strike_without_fundamental_is_not_recorded():
+    tuner.spectrum_averages.clear()
+    record(30, strike(440.0 * 2 ** (-18 / 12)))
+    noise = 1e-5 * np.random.default_rng(0).standard_normal(3 * tuner.sample_rate)
+    noise[tuner.sample_rate // 2:tuner.sample_rate // 2 + 5] = 0.5  # a click without any tone
+    completed = record(30, noise.astype(np.float32))['recording_completed']
+    assert completed['frequency'] is None and completed['quality'] == 0.0
+    key = tuner.get_key(30)
+    assert not key['recorded'] and key['quality'] == 0.0
+    # The next strike is not averaged with the failed one
+    assert 30 not in tuner.spectrum_averages
+    assert record(30, strike(440.0 * 2 ** (-18 / 12)))['recording_completed']['strikes'] == 1
+
+if __name__ == '__main__':
+    test_retuned_key_starts_a_new_average()
+    test_late_strike_is_rejected_before_analysis()
+    test_strike_without_fundamental_is_not_recorded()
+    print("All recording tests passed")
@@ -0,0 +1,51 @@
+"""
+Test script for the audio ring buffer
+"""
+
+import threading
+import time
+import numpy as np
+import sys
+sys.path.insert(0, '.')
+from ringbuffer import RingBuffer
+
+def test_read_across_wrap():
+    buffer = RingBuffer(10)
+    for block in np.arange(24).reshape(6, 4):
+        buffer.write(block)
+    assert buffer.position == 24
+    assert list(buffer.read(16, 8)) == list(range(16, 24))
+
+def test_overwritten_samples_raise():
+    buffer = RingBuffer(10)
+    buffer.write(np.arange(30))
+    try:
+        buffer.read(5, 5)
+        assert False, "overwritten samples must not be returned"
+    except ValueError:
+        pass
+
+def test_reader_waits_for_writer():
+    """A read of future samples returns as soon as the writer has delivered them"""
+    buffer = RingBuffer(1000)
+    def writer():
+        for i in range(5):
+            time.sleep(0.01)
+            buffer.write(np.full(100, i))
+    threading.Thread(target=writer).start()
+    samples = buffer.read(250, 200, timeout=2.0)
+    assert list(samples[:50]) == [2] * 50 and list(samples[-50:]) == [4] * 50
+
+def test_timeout():
+    try:
+        RingBuffer(100).read(0, 10, timeout=0.01)
+        assert False, "read without writer must time out"
+    except TimeoutError:
+        pass
+
+if __name__ == '__main__':
+    test_read_across_wrap()
+    test_overwritten_samples_raise()
+    test_reader_waits_for_writer()
+    test_timeout()
+    print("Ring buffer tests passed")
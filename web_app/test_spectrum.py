@@ -0,0 +1,62 @@
+"""
+Test script for the spectrum helpers
+"""
+
+import numpy as np
+import sys
+sys.path.insert(0, '.')
+from spectrum import zoom_spectrum, refine_peaks, decimation_factor, decimate_for_key, hann_window
+
+SAMPLE_RATE = 44100
+
+def test_zoom_spectrum_matches_dft():
+    """The batched evaluation equals a direct DFT at arbitrary frequencies"""
+    x = np.random.default_rng(0).standard_normal(5000)
+    frequencies = np.array([[100.3, 100.7], [2500.1, 7000.9]])
+    n = np.arange(len(x))
+    direct = np.exp(-2j * np.pi * np.outer(frequencies.ravel(), n) / SAMPLE_RATE) @ x
+    assert np.allclose(zoom_spectrum(x, SAMPLE_RATE, frequencies).ravel(), direct)
+
+def test_zoom_spectrum_matches_rfft_bins():
+    x = np.random.default_rng(1).standard_normal(4410)
+    bins = np.array([10, 11, 500])
+    assert np.allclose(zoom_spectrum(x, SAMPLE_RATE, bins * SAMPLE_RATE / len(x)), np.fft.rfft(x)[bins])
+
+def test_refine_peaks_resolves_between_bins():
+    """A partial between two FFT bins is located far more precisely than the bin width"""
+    t = np.arange(SAMPLE_RATE) / SAMPLE_RATE
+    true_frequency = 440.37
+    audio_windowed = np.sin(2 * np.pi * true_frequency * t) * np.hanning(len(t))
+    frequencies, magnitudes = refine_peaks(audio_windowed, SAMPLE_RATE, [440.0], zoom_factor=32)
+    assert abs(frequencies[0] - true_frequency) < 1.0 / 32
+    assert magnitudes[0] > 0
+
+def test_decimation_per_register():
+    """Bass keys are decimated, the treble keeps the full band of the log spectrum"""
+    assert decimation_factor(27.5, SAMPLE_RATE) == 10
+    assert decimation_factor(4186.0, SAMPLE_RATE) == 1
+    assert decimation_factor(None, SAMPLE_RATE) == 1
+    assert decimation_factor(27.5, 96000) == 16
+
+    t = np.arange(2 * SAMPLE_RATE) / SAMPLE_RATE
+    audio = np.sin(2 * np.pi * 55.3 * t) + np.sin(2 * np.pi * 8000 * t)
+    decimated, sample_rate = decimate_for_key(audio, SAMPLE_RATE, 55.0)
+    assert sample_rate == SAMPLE_RATE / 5 and len(decimated) == len(audio) // 5
+    spectrum = np.abs(np.fft.rfft(decimated * np.hanning(len(decimated))))
+    assert np.argmax(spectrum) == round(55.3 * 2)
+    alias = round((SAMPLE_RATE / 5 - 8000) * 2)
+    assert np.max(spectrum[alias - 3:alias + 4]) < 1e-3 * np.max(spectrum)
+
+def test_hann_window_cached_per_length():
+    window = hann_window(4800)
+    assert window is hann_window(4800)
+    assert np.allclose(window, np.hanning(4800))
+    assert not window.flags.writeable
+
+if __name__ == '__main__':
+    test_zoom_spectrum_matches_dft()
+    test_zoom_spectrum_matches_rfft_bins()
+    test_refine_peaks_resolves_between_bins()
+    test_decimation_per_register()
+    test_hann_window_cached_per_length()
+    print("Spectrum tests passed")
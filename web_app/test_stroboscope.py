@@ -0,0 +1,54 @@
+"""
+Test script for the Stroboscope
+Checks the per-partial phase drift readout for a slightly sharp tone
+"""
+
+import numpy as np
+import sys
+sys.path.insert(0, '.')
+from stroboscope import Stroboscope
+
+SAMPLE_RATE = 44100
+
+def run_stroboscope(partials, offset_cents, duration=2.0, packet_size=1100):
+    """Feed a tone offset_cents above the given partials and return the readouts"""
+    stroboscope = Stroboscope(SAMPLE_RATE)
+    stroboscope.set_frames_per_second(1000 / 150)
+    stroboscope.set_frequencies(partials)
+    stroboscope.start()
+
+    t = np.arange(int(duration * SAMPLE_RATE)) / SAMPLE_RATE
+    wave = sum(np.cos(2 * np.pi * f * 2 ** (offset_cents / 1200) * t) / (n + 1)
+               for n, f in enumerate(partials))
+
+    readouts = []
+    for start in range(0, len(wave), packet_size):
+        for frame in stroboscope.push_raw_data(wave[start:start + packet_size]):
+            readouts.append(stroboscope.readout(frame))
+    return readouts
+
+def test_frame_rate():
+    """One frame is produced per 1/fps seconds"""
+    readouts = run_stroboscope([440.0], 0.0, duration=1.5)
+    assert len(readouts) == 10
+
+def test_in_tune_has_no_drift():
+    readouts = run_stroboscope([440.0, 880.5, 1321.8], 0.0)
+    assert all(abs(p['drift_cents']) < 0.05 for p in readouts[-1])
+
+def test_sharp_tone_drifts_positive():
+    readouts = run_stroboscope([261.63, 523.5, 785.8], 2.0)
+    for partial in readouts[-1]:
+        assert abs(partial['drift_cents'] - 2.0) < 0.25
+
+def test_inactive_stroboscope():
+    stroboscope = Stroboscope(SAMPLE_RATE)
+    stroboscope.set_frequencies([440.0])
+    assert stroboscope.push_raw_data(np.ones(100000)) == []
+
+if __name__ == '__main__':
+    test_frame_rate()
+    test_in_tune_has_no_drift()
+    test_sharp_tone_drifts_positive()
+    test_inactive_stroboscope()
+    print("Stroboscope tests passed")
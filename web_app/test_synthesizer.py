@@ -0,0 +1,243 @@
+"""
+Test script for the synthesizer voice mixing
+"""
+
+import numpy as np
+import sys
+import tracemalloc
+sys.path.insert(0, '.')
+from synthesizer import (Synthesizer, Voice, Envelope, WavetableCache, CUTOFF_VOLUME, MAX_WAVETABLE_DURATION,
+                         hammer_knock, partial_amplitudes, piano_envelope)
+
+SAMPLE_RATE = 44100
+
+def render(synth, duration, block_size=256):
+    """Pull blocks from the synthesizer like the stream callback does"""
+    blocks = [synth.generate(block_size).copy() for _ in range(int(duration * SAMPLE_RATE) // block_size)]
+    return np.concatenate(blocks)
+
+def harmonic_voice(key_number, frequency, duration=None):
+    release_at = None if duration is None else int(duration * SAMPLE_RATE)
+    return Voice(key_number, [frequency], [1.0], 0.3, Envelope(), release_at)
+
+def test_tone_is_released_and_removed():
+    synth = Synthesizer(SAMPLE_RATE)
+    synth.add(harmonic_voice(49, 440.0, duration=0.5))
+    audio = render(synth, 2.0)
+    spectrum = np.abs(np.fft.rfft(audio[:SAMPLE_RATE // 2]))
+    assert abs(np.argmax(spectrum) * 2 - 440) <= 2
+    assert np.max(np.abs(audio[int(1.5 * SAMPLE_RATE):])) < CUTOFF_VOLUME
+    assert not synth.is_playing(49)
+
+def test_block_size_does_not_change_the_signal():
+    """Phase and envelope follow the sample clock, not the block boundaries"""
+    audio = []
+    for block_size in (256, 441):
+        synth = Synthesizer(SAMPLE_RATE)
+        synth.add(harmonic_voice(40, 261.6, duration=0.2))
+        audio.append(render(synth, 0.5, block_size)[:20000])
+    assert np.allclose(audio[0], audio[1])
+
+def test_voices_are_mixed():
+    synth = Synthesizer(SAMPLE_RATE)
+    synth.add(harmonic_voice(49, 440.0))
+    synth.add(harmonic_voice(56, 659.3))
+    audio = render(synth, 1.0)[SAMPLE_RATE // 10:]
+    spectrum = np.abs(np.fft.rfft(audio * np.hanning(len(audio))))
+    frequencies = np.fft.rfftfreq(len(audio), 1 / SAMPLE_RATE)
+    peaks = sorted(frequencies[np.argsort(spectrum)[-2:]])
+    assert abs(peaks[0] - 440.0) < 2 and abs(peaks[1] - 659.3) < 2
+    synth.release(49)
+    render(synth, 1.0)
+    assert not synth.is_playing(49) and synth.is_playing(56)
+
+def test_retrigger_releases_previous_voice():
+    synth = Synthesizer(SAMPLE_RATE)
+    first = synth.add(harmonic_voice(49, 440.0))
+    synth.add(harmonic_voice(49, 440.0))
+    assert first.release_at is not None
+    render(synth, 1.0)
+    assert len(synth.voices) == 1
+
+def test_inharmonic_partials():
+    """Partials of a piano voice are stretched by f_n = n·f·√((1 + B·n²)/(1 + B))"""
+    synth = Synthesizer(SAMPLE_RATE)
+    B = 1e-3
+    synth.add(synth.make_voice(20, 100.0, duration=None, amplitudes=[1.0] * 10, B=B))
+    audio = render(synth, 1.5)[SAMPLE_RATE // 2:]
+    spectrum = np.abs(np.fft.rfft(audio * np.hanning(len(audio))))
+    frequencies = np.fft.rfftfreq(len(audio), 1 / SAMPLE_RATE)
+    for n in (1, 5, 10):
+        expected = 100.0 * n * np.sqrt((1 + B * n * n) / (1 + B))
+        band = np.abs(frequencies - expected) < 20
+        assert abs(frequencies[band][np.argmax(spectrum[band])] - expected) < 1.5
+
+def test_partials_above_nyquist_are_dropped():
+    voice = Synthesizer(8000).make_voice(87, 3000.0, amplitudes=[1.0] * 5)
+    assert len(voice.frequencies) == 1
+
+def test_partial_amplitudes_from_peaks():
+    peaks = [{'frequency': 220.1, 'magnitude': 2.0}, {'frequency': 660.9, 'magnitude': 1.0}]
+    amplitudes = partial_amplitudes(peaks, 220.0, 3e-4, num_partials=4)
+    assert np.allclose(amplitudes, [1.0, 0.0, 0.5, 0.0])
+    assert np.allclose(partial_amplitudes([], None, 0.0, num_partials=2), [1.0, 0.5])
+
+def test_hammer_knock():
+    knock = hammer_knock(SAMPLE_RATE)
+    if len(knock) == 0:
+        return  # hammerknock.h of the C++ player not available
+    assert len(knock) == SAMPLE_RATE and knock.dtype == np.float32
+    assert np.max(np.abs(knock[:SAMPLE_RATE // 10])) > 100 * np.max(np.abs(knock[-SAMPLE_RATE // 10:]))
+
+    starts = []
+    for hammer in (1.0, 0.0):
+        envelope = piano_envelope(48)
+        envelope.hammer = hammer
+        synth = Synthesizer(SAMPLE_RATE)
+        synth.add(synth.make_voice(48, 440.0, envelope=envelope))
+        starts.append(render(synth, 0.05))
+    difference = starts[0] - starts[1]
+    assert np.allclose(difference, 0.3 * knock[:len(difference)], atol=1e-6)
+
+def test_wavetable_is_reused():
+    synth = Synthesizer(SAMPLE_RATE)
+    # The first play sounds from the oscillators while the table is rendered
+    assert synth.make_voice(49, 440.0).wavetable is None
+    synth.wavetables.wait()
+    first = synth.make_voice(49, 440.0)
+    second = synth.make_voice(49, 440.0)
+    assert second.wavetable.base is first.wavetable.base and second.wavetable.dtype == np.float32
+    assert synth.wavetables.hits == 2 and synth.wavetables.misses == 1
+    # Tones of other durations share the table, cut to their length
+    for duration in (0.5, 4.0, None):
+        voice = synth.make_voice(49, 440.0, duration=duration)
+        assert voice.wavetable.base is first.wavetable.base
+        sounding = min(voice.envelope.duration(duration), MAX_WAVETABLE_DURATION)
+        assert len(voice.wavetable) == int(np.ceil(sounding * SAMPLE_RATE))
+    assert len(synth.make_voice(49, 440.0, duration=0.5).wavetable) < len(first.wavetable)
+    assert synth.wavetables.hits == 6 and synth.wavetables.misses == 1
+    synth.make_voice(49, 440.0, B=1e-3)
+    synth.wavetables.wait()
+    assert synth.make_voice(49, 440.0, B=1e-3).wavetable.base is not first.wavetable.base
+    assert len(synth.wavetables.tables) == 2
+
+def test_wavetable_continues_with_oscillators():
+    """A tone held beyond its table sounds the same as one rendered from the oscillators"""
+    synth = Synthesizer(SAMPLE_RATE)
+    synth.make_voice(49, 440.0, duration=None)
+    synth.wavetables.wait()
+    voice = synth.make_voice(49, 440.0, duration=None)
+    voice.wavetable = voice.wavetable[:SAMPLE_RATE // 10 + 17]
+    reference = synth.make_voice(50, 440.0, duration=None)
+    reference.wavetable = None
+    synth.add(voice)
+    tabulated = render(synth, 0.3)
+    synth.voices = [reference]
+    assert np.allclose(tabulated, render(synth, 0.3), atol=1e-6)
+
+def test_voices_render_without_allocating_blocks():
+    """The stream callback works in the scratch buffers of the voices"""
+    synth = Synthesizer(SAMPLE_RATE, block_size=1024)
+    voices = [synth.add(synth.make_voice(30, 130.8, duration=1.5, amplitudes=[1.0] * 16, B=4e-4,
+                                         envelope=piano_envelope(30))),
+              synth.add(synth.make_voice(31, 138.6, duration=None))]
+    scratch = [voice.scratch for voice in voices]
+    synth.wavetables.wait()  # tracemalloc also counts the threads rendering the tables
+    render(synth, 1.2, 1024)  # past the hammer knock, the release follows at 1.5 s
+    tracemalloc.start()
+    try:
+        for _ in range(20):
+            synth.generate(1024)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    assert all(voice.scratch is buffers for voice, buffers in zip(voices, scratch))
+    assert synth.is_playing(30) and peak < 1024 * 8, peak
+
+def test_wavetable_cache_evicts_least_recently_used():
+    cache = WavetableCache(max_bytes=3 * 4000)
+    for key in 'abc':
+        cache.get(key, lambda: np.zeros(1000))
+    cache.get('a', lambda: np.ones(1000))
+    cache.get('d', lambda: np.zeros(1000))
+    assert list(cache.tables) == ['c', 'a', 'd'] and cache.nbytes == 3 * 4000
+    assert cache.get('a', lambda: np.ones(1000))[0] == 0
+
+def dominant_frequency(audio):
+    spectrum = np.abs(np.fft.rfft(audio * np.hanning(len(audio)), 8 * len(audio)))
+    return np.argmax(spectrum) * SAMPLE_RATE / (8 * len(audio))
+
+def test_drone_glides_without_jumps():
+    synth = Synthesizer(SAMPLE_RATE)
+    synth.drone.set(440.0)
+    before = render(synth, 0.5)
+    synth.drone.set(466.16)
+    after = render(synth, 1.0)
+    audio = np.concatenate([before, after])
+    # The steepest possible slope of the waveform bounds every step between samples
+    max_step = 2 * np.pi * 0.2 * np.sum(synth.drone.amplitudes * np.arange(1, 5) * 466.16) / SAMPLE_RATE
+    assert np.max(np.abs(np.diff(audio))) < max_step
+    assert abs(dominant_frequency(before[-SAMPLE_RATE // 4:]) - 440.0) < 0.5
+    assert abs(dominant_frequency(after[-SAMPLE_RATE // 4:]) - 466.16) < 0.5
+
+def test_drone_glide_does_not_depend_on_block_size():
+    audio = []
+    for block_size in (128, 512):  # both switch the target after 8704 samples
+        synth = Synthesizer(SAMPLE_RATE)
+        synth.drone.set(220.0, B=1e-3)
+        first = render(synth, 0.2, block_size)
+        synth.drone.set(233.08, B=1e-3)
+        audio.append(np.concatenate([first, render(synth, 0.3, block_size)])[:20000])
+    assert np.allclose(audio[0], audio[1], atol=1e-9)
+
+def test_drone_fades_out():
+    synth = Synthesizer(SAMPLE_RATE)
+    synth.drone.set(440.0)
+    render(synth, 0.5)
+    synth.drone.stop()
+    audio = render(synth, 3.0)
+    assert not synth.drone.active
+    assert np.max(np.abs(audio[-SAMPLE_RATE // 10:])) == 0
+
+def test_delayed_voices_start_sample_accurately():
+    """Voices added together keep their delays exactly, across block boundaries"""
+    synth = Synthesizer(SAMPLE_RATE)
+    delays = [0, 300, 1000]
+    voices = [synth.make_voice(key, 440.0, amplitudes=[1.0], envelope=Envelope(attack=1e9), delay=delay / SAMPLE_RATE)
+              for key, delay in zip((48, 52, 55), delays)]
+    synth.add_voices(voices)
+    audio = render(synth, 0.1)
+
+    single = Synthesizer(SAMPLE_RATE)
+    single.add(single.make_voice(48, 440.0, amplitudes=[1.0], envelope=Envelope(attack=1e9)))
+    reference = render(single, 0.1)
+    expected = sum(np.concatenate([np.zeros(delay), reference[:len(reference) - delay]]) for delay in delays)
+    assert np.allclose(audio, expected, atol=1e-6)
+
+def test_release_before_a_delayed_start_silences_the_voice():
+    synth = Synthesizer(SAMPLE_RATE)
+    voice = synth.add(synth.make_voice(48, 440.0, delay=0.5))
+    voice.release()
+    assert voice.release_at == 0
+    assert np.max(np.abs(render(synth, 1.0))) < 1e-3
+    assert not synth.voices
+
+if __name__ == '__main__':
+    test_tone_is_released_and_removed()
+    test_block_size_does_not_change_the_signal()
+    test_voices_are_mixed()
+    test_retrigger_releases_previous_voice()
+    test_inharmonic_partials()
+    test_partials_above_nyquist_are_dropped()
+    test_partial_amplitudes_from_peaks()
+    test_hammer_knock()
+    test_wavetable_is_reused()
+    test_wavetable_continues_with_oscillators()
+    test_voices_render_without_allocating_blocks()
+    test_wavetable_cache_evicts_least_recently_used()
+    test_drone_glides_without_jumps()
+    test_drone_glide_does_not_depend_on_block_size()
+    test_drone_fades_out()
+    test_delayed_voices_start_sample_accurately()
+    test_release_before_a_delayed_start_silences_the_voice()
+    print("All synthesizer tests passed")
@@ -0,0 +1,72 @@
+"""
+Test script for the live tuning loop
+"""
+
+import numpy as np
+import sys
+sys.path.insert(0, '.')
+from app import app, socketio, tuner, tuning_loop, tuning_window_size, TUNING_LATENCY_BUDGET_IN_MILLISECONDS
+
+class SineInput:
+    """Input stream of a sine tone that leaves tuning mode after a number of blocks"""
+    latency = 0.01
+
+    def __init__(self, frequency, sample_rate, num_blocks):
+        self.frequency = frequency
+        self.sample_rate = sample_rate
+        self.num_blocks = num_blocks
+
+    def blocks(self, block_size):
+        for i in range(self.num_blocks):
+            if i == self.num_blocks - 1:
+                tuner.mode = 'idle'
+            t = (i * block_size + np.arange(block_size)) / self.sample_rate
+            yield i * block_size, (0.1 * np.sin(2 * np.pi * self.frequency * t)).astype(np.float32)
+
+def run_tuning_loop(frequency, key_number=48, num_blocks=10):
+    client = socketio.test_client(app)
+    client.get_received()
+    audio_input = tuner.audio_input
+    tuner.audio_input = SineInput(frequency, tuner.sample_rate, num_blocks)
+    tuner.mode, tuner.selected_key, tuner.tuning_indicator = 'tuning', key_number, 'spectrum'
+    try:
+        tuning_loop()
+    finally:
+        tuner.audio_input = audio_input
+        tuner.mode, tuner.selected_key = 'idle', None
+    received = client.get_received()
+    client.disconnect()
+    return received
+
+def test_tuning_frames_are_delivered():
+    received = run_tuning_loop(441.0)
+    assert not [event for event in received if event['name'] == 'tuning_error'], received
+    frames = [event['args'][0] for event in received if event['name'] == 'tuning_frame']
+    assert frames
+    for frame in frames:
+        for field in ('frequency', 'deviation', 'latency_ms', 'window_ms'):
+            assert type(frame[field]) is float, field
+    # Once the window is filled with the tone
+    assert abs(frames[-1]['frequency'] - 441.0) < 0.01
+    assert abs(frames[-1]['deviation'] - 1200 * np.log2(441.0 / 440.0)) < 0.05
+
+def test_latency_includes_window_and_meets_budget():
+    frames = [event['args'][0] for event in run_tuning_loop(27.6, key_number=0, num_blocks=12)
+              if event['name'] == 'tuning_frame']
+    assert frames
+    for frame in frames:
+        assert frame['latency_ms'] > frame['window_ms'] / 2
+        assert frame['latency_ms'] <= TUNING_LATENCY_BUDGET_IN_MILLISECONDS and frame['within_budget']
+    assert abs(frames[-1]['frequency'] - 27.6) < 0.01
+
+def test_window_size():
+    # As long as the budget allows, but not shorter than eight periods
+    assert tuning_window_size(44100, 440.0, 0.02, 44100) == 36 * 441
+    assert tuning_window_size(44100, 27.5, 0.15, 44100) == 30 * 441
+    assert tuning_window_size(44100, 440.0, 0.0, 4410) == 4410
+
+if __name__ == '__main__':
+    test_tuning_frames_are_delivered()
+    test_latency_includes_window_and_meets_budget()
+    test_window_size()
+    print("All tuning loop tests passed")
@@ -0,0 +1,80 @@
+"""
+Tuning curves
+The tuning-curve algorithms of the web interface, registered in algorithms.py
+"""
+
+import numpy as np
+
+
+def entropy_minimization(tuner, progress, max_iterations=50):
+    """Entropy Minimization Algorithm (EPT method)"""
+    tuner.calculate_entropy_tuning_curve(max_iterations=max_iterations, progress=progress)
+
+
+def _frequencies(piano_data):
+    """Theoretical and recorded frequencies of all keys, NaN for keys that have not been recorded"""
+    keys = piano_data['keys']
+    theoretical = np.array([key['theoretical_frequency'] for key in keys])
+    recorded = np.array([key['recorded_frequency'] or np.nan for key in keys], dtype=float)
+    return theoretical, recorded
+
+
+def _store(piano_data, computed, deviation):
+    """Write the computed frequencies and the deviations in cents back to all keys"""
+    deviation = np.where(np.isnan(deviation), 0.0, deviation)
+    for key, key_computed, key_deviation in zip(piano_data['keys'], computed, deviation):
+        key['computed_frequency'] = float(key_computed)
+        key['tuning_frequency'] = float(key_computed)
+        key['tuning_deviation'] = round(float(key_deviation), 2)
+
+
+def equal_temperament(tuner, progress):
+    """Equal temperament: use theoretical frequencies"""
+    theoretical, recorded = _frequencies(tuner.piano_data)
+    _store(tuner.piano_data, theoretical, 1200 * np.log2(recorded / theoretical))
+    progress.finish()
+
+
+def copy_recording(tuner, progress):
+    """Copy recorded frequencies, the deviation is 0 since they are the target"""
+    theoretical, recorded = _frequencies(tuner.piano_data)
+    _store(tuner.piano_data, np.where(np.isnan(recorded), theoretical, recorded), np.zeros(len(recorded)))
+    progress.finish()
+
+
+def stretch_tuning(tuner, progress, stretch=0.0001):
+    """Simple stretch tuning (exaggerates deviations slightly) of the recorded keys"""
+    theoretical, recorded = _frequencies(tuner.piano_data)
+    distance = np.abs(np.arange(len(theoretical)) - tuner.piano_data['key_of_a4'])
+    computed = np.where(np.isnan(recorded), theoretical, theoretical * (1.0 + distance * stretch))
+    _store(tuner.piano_data, computed, 1200 * np.log2(computed / recorded))
+    progress.finish()
+
+
+def inharmonicity_tuning(tuner, progress, scale=5000.0):
+    """
+    Inharmonicity-based tuning: optimal stretch based on measured inharmonicity.
+
+    The stretch increases with the distance from A4 and the inharmonicity
+    coefficient, following the Railsback curve. This is a simplified model,
+    keys without inharmonicity data keep their theoretical frequency.
+    """
+    theoretical, recorded = _frequencies(tuner.piano_data)
+    B = np.array([key.get('inharmonicity') or 0.0 for key in tuner.piano_data['keys']])
+    octaves_from_a4 = (np.arange(len(theoretical)) - tuner.piano_data['key_of_a4']) / 12.0
+    stretch_cents = np.where(B > 0, octaves_from_a4 * B * scale, 0.0)
+    computed = theoretical * 2 ** (stretch_cents / 1200)
+    _store(tuner.piano_data, np.round(computed, 2), 1200 * np.log2(recorded / computed))
+    progress.finish()
+
+
+def pitch_raise(tuner, progress):
+    """Approximate curve from the regression of the measured inharmonicity"""
+    tuner.calculate_pitch_raise_curve()
+    progress.finish()
+
+
+def overpull_tuning(tuner, progress):
+    """Pitch raise: tune sharper by the fall the raise of the other keys will cause"""
+    tuner.compute_overpull()
+    progress.finish()